@@ -1,7 +1,7 @@
 import os
 import logging
-import time
 
+import imageio
 import tensorflow as tf
 
 from dataclasses import dataclass, asdict
@@ -11,18 +11,19 @@ import fsspec
 from flask import Flask, request, jsonify
 from traceback_with_variables import iter_tb_lines, ColorSchemes
 
+from cv_pipeliner.core.data import ImageData
 from cv_pipeliner.inference_models.detection.core import DetectionModel
 from cv_pipeliner.inference_models.classification.core import ClassificationModel
 from cv_pipeliner.inference_models.pipeline import PipelineModel
 from cv_pipeliner.inferencers.pipeline import PipelineInferencer
 from cv_pipeliner.utils.models_definitions import DetectionModelDefinition, ClassificationModelDefinition
+from cv_pipeliner.tracking.realtime_server import RealTimeServer
 
 from apps.config import get_cfg_defaults, merge_cfg_from_string
-from apps.backend.src.realtime_inferencer import RealTimeInferencer
 from apps.backend.src.model import (
     get_detection_models_definitions_from_config,
     get_classification_models_definitions_from_config,
-    inference, realtime_inference
+    inference
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -53,6 +54,7 @@ class CurrentPipelineDefinition:
     classification_model: ClassificationModel = None
     pipeline_model: PipelineModel = None
     pipeline_inferencer: PipelineInferencer = None
+    realtime_server: RealTimeServer = None
 
     def reload(self):
         if self.detection_model is not None and self.classification_model is not None:
@@ -62,15 +64,16 @@ class CurrentPipelineDefinition:
                 classification_model=self.classification_model
             )
             self.pipeline_inferencer = PipelineInferencer(self.pipeline_model)
+            # realtime sessions are reset with the models
+            if self.realtime_server is not None:
+                self.realtime_server.stop()
+            self.realtime_server = RealTimeServer(
+                detection_models=[self.detection_model],
+                classification_model=self.classification_model
+            )
+            self.realtime_server.start()
 CURRENT_PIPELINE_DEFINITION = CurrentPipelineDefinition()  # noqa: E305
 
-@dataclass  # noqa: E302
-class RealTimeInferencerData:
-    guid: str
-    realtime_inferencer: RealTimeInferencer
-    last_time: float
-GUID_TO_REALTIME_INFERENCER_DATA = {}  # noqa: E305
-
 
 @app.route('/', methods=['GET'])
 def default():
@@ -196,23 +199,16 @@ def predict() -> Dict:
 @app.route('/realtime_start/<guid>', methods=['POST'])
 def realtime_start(guid: str) -> Dict:
     if request.method == 'POST':
-        if guid in GUID_TO_REALTIME_INFERENCER_DATA:
+        if not CURRENT_PIPELINE_DEFINITION.realtime_server.start_session(
+            session_id=guid,
+            fps=float(request.form['fps']),
+            detection_delay=int(request.form['detection_delay'])
+        ):
             return jsonify(
                 success=False,
-                message='Realtime process with given guid is already started.'
+                message='Realtime process with given guid is already started or there are too many processes.'
             ), 400
         else:
-            GUID_TO_REALTIME_INFERENCER_DATA[guid] = RealTimeInferencerData(
-                guid=guid,
-                realtime_inferencer=RealTimeInferencer(
-                    detection_model_spec=CURRENT_PIPELINE_DEFINITION.detection_model_definition.model_spec,
-                    classification_model_spec=CURRENT_PIPELINE_DEFINITION.classification_model_definition.model_spec,  # noqa: E501
-                    fps=float(request.form['fps']),
-                    detection_delay=int(request.form['detection_delay']),
-                    logger=app.logger
-                ),
-                last_time=time.time()
-            )
             return jsonify(
                 success=True,
                 detection_model_definition=asdict(CURRENT_PIPELINE_DEFINITION.detection_model_definition),
@@ -222,39 +218,36 @@ def realtime_start(guid: str) -> Dict:
 
 @app.route('/realtime_predict/<guid>', methods=['POST'])
 def realtime_predict(guid: str) -> Dict:
-    if request.method == 'POST' and request.files.get('image', '') and guid in GUID_TO_REALTIME_INFERENCER_DATA:
-        GUID_TO_REALTIME_INFERENCER_DATA[guid].last_time = time.time()
-        json_res = realtime_inference(
-            realtime_inferencer=GUID_TO_REALTIME_INFERENCER_DATA[guid].realtime_inferencer,
-            image_bytes=request.files.get('image', ''),
-            detection_score_threshold=CURRENT_PIPELINE_DEFINITION.detection_model_definition.score_threshold,
-        )
-        return json_res
+    realtime_server = CURRENT_PIPELINE_DEFINITION.realtime_server
+    if request.method == 'POST' and request.files.get('image', '') and guid in realtime_server.sessions:
+        try:
+            pred_bboxes_data = realtime_server.predict_on_frame(
+                session_id=guid,
+                frame=imageio.imread(request.files.get('image', ''), pilmode='RGB'),
+                detection_score_threshold=CURRENT_PIPELINE_DEFINITION.detection_model_definition.score_threshold
+            )
+        except KeyError:  # evicted meanwhile
+            return jsonify(success=False, message='Realtime process with given guid is not started.'), 400
+        if pred_bboxes_data is None:
+            return jsonify(success=False, message='Previous frame is still processed, the frame is dropped.'), 429
+        return ImageData(bboxes_data=pred_bboxes_data).asdict()
     return jsonify(success=False, message='Realtime process with given guid is not started.'), 400
 
 
 @app.route('/realtime_end/<guid>', methods=['POST'])
 def realtime_end(guid: str) -> Dict:
     if request.method == 'POST':
-        if guid not in GUID_TO_REALTIME_INFERENCER_DATA:
+        if not CURRENT_PIPELINE_DEFINITION.realtime_server.end_session(guid):
             return jsonify(success=False, message='Realtime process with given guid is not started.'), 400
         else:
-            del GUID_TO_REALTIME_INFERENCER_DATA[guid].realtime_inferencer
-            del GUID_TO_REALTIME_INFERENCER_DATA[guid]
             return jsonify(success=True)
 
 
 @app.before_request
 def before_request():
-    global GUID_TO_REALTIME_INFERENCER_DATA, CONFIG, CONFIG_STR
-
-    current_time = time.time()
-    for guid in GUID_TO_REALTIME_INFERENCER_DATA:
-        if current_time - GUID_TO_REALTIME_INFERENCER_DATA[guid].last_time >= 3:
-            app.logger.info(f'Silent real time inferencer with {guid=} detected. Deleting...')
-            del GUID_TO_REALTIME_INFERENCER_DATA[guid].realtime_inferencer
-            del GUID_TO_REALTIME_INFERENCER_DATA[guid]
+    global CONFIG, CONFIG_STR
 
+    # silent realtime sessions are evicted by the realtime server itself
     with fsspec.open(CONFIG_FILE, 'r') as src:
         current_config_str = src.read()
 
@@ -1,21 +1,20 @@
-import time
 import logging
 from dataclasses import dataclass
 from typing import List, Tuple
-from multiprocessing import Process, Queue, Event
 
 import numpy as np
 
 from cv_pipeliner.core.data import ImageData, BboxData
 from cv_pipeliner.batch_generators.image_data import BatchGeneratorImageData
-from cv_pipeliner.batch_generators.bbox_data import BatchGeneratorBboxData
 from cv_pipeliner.inference_models.detection.core import DetectionModelSpec
 from cv_pipeliner.inferencers.detection import DetectionInferencer
 from cv_pipeliner.inference_models.classification.core import ClassificationModelSpec
-from cv_pipeliner.inferencers.classification import ClassificationInferencer
 
 from cv_pipeliner.tracking.opencv_tracker import OpenCVTracker
 from cv_pipeliner.tracking.sort_tracker import Sort
+from cv_pipeliner.tracking.classification_service import TrackClassificationService
+
+PENDING_LABEL = '...'  # label of tracks waiting for classification
 
 
 @dataclass
@@ -25,54 +24,6 @@ class FrameResult:
     ready_at_frame: int
 
 
-@dataclass
-class BboxDataTrackId:
-    bbox_data: BboxData
-    track_id: int
-
-
-def classification_inferencer_queue(
-    classification_model_spec: ClassificationInferencer,
-    bbox_data_track_id_queue: Queue,
-    ready_bbox_data_track_id_queue: Queue,
-    loading_status_event: Event,
-    status_event: Event,
-    batch_size: int,
-    time_sleep: float
-):
-    classification_model = classification_model_spec.load()
-    classification_inferencer = ClassificationInferencer(classification_model)
-    loading_status_event.set()
-    while not status_event.is_set():
-        if not bbox_data_track_id_queue.empty():
-            current_batch_size = 0
-            bboxes_data_tracks_ids = []
-            while current_batch_size < batch_size and not bbox_data_track_id_queue.empty():
-                bboxes_data_tracks_ids.append(bbox_data_track_id_queue.get(block=False))
-                current_batch_size += 1
-            bboxes_data_gen = BatchGeneratorBboxData(
-                data=[[bbox_data_track_id.bbox_data] for bbox_data_track_id in bboxes_data_tracks_ids],
-                batch_size=batch_size,
-                use_not_caught_elements_as_last_batch=True
-            )
-            pred_bboxes_data = classification_inferencer.predict(bboxes_data_gen)[0]
-            for pred_bbox_data, bbox_data_track_id in zip(pred_bboxes_data, bboxes_data_tracks_ids):
-                ready_bbox_data_track_id_queue.put(
-                    BboxDataTrackId(
-                        bbox_data=BboxData(
-                            xmin=bbox_data_track_id.bbox_data.xmin,
-                            ymin=bbox_data_track_id.bbox_data.ymin,
-                            xmax=bbox_data_track_id.bbox_data.xmax,
-                            ymax=bbox_data_track_id.bbox_data.ymax,
-                            label=pred_bbox_data.label
-                        ),
-                        track_id=bbox_data_track_id.track_id
-                    )
-                )
-        else:
-            time.sleep(time_sleep)
-
-
 class RealTimeInferencer:
     def __init__(
         self,
@@ -82,37 +33,23 @@ class RealTimeInferencer:
         detection_delay: int,
         logger: logging.Logger,
         batch_size: int = 4,
-        classification_time_sleep: float = 0.3
+        classification_latency_budget: float = 1.
     ):
         self.classification_model_spec = classification_model_spec
         self.batch_size = batch_size
-        self.classification_time_sleep = classification_time_sleep
         self.logger = logger
 
         self.logger.info("RealTimeInferencer: Loading detection model...")
         self.detection_model = detection_model_spec.load()
         self.detection_inferencer = DetectionInferencer(self.detection_model)
 
-        self.bbox_data_track_id_queue = Queue()
-        self.ready_bbox_data_track_id_queue = Queue()
-        self.loading_status_event = Event()
-        self.status_event = Event()
-        self.classification_inferencer_process = Process(
-            target=classification_inferencer_queue,
-            args=(
-                self.classification_model_spec,
-                self.bbox_data_track_id_queue,
-                self.ready_bbox_data_track_id_queue,
-                self.loading_status_event,
-                self.status_event,
-                self.batch_size,
-                self.classification_time_sleep
-            )
-        )
         self.logger.info("RealTimeInferencer: Loading classification model...")
-        self.classification_inferencer_process.start()
-        while not self.loading_status_event.is_set():
-            time.sleep(self.classification_time_sleep)
+        self.classification_service = TrackClassificationService(
+            classification_model=self.classification_model_spec.load(),
+            batch_size=self.batch_size,
+            latency_budget=classification_latency_budget
+        )
+        self.classification_service.start()
 
         self.fps = fps
         self.detection_delay = detection_delay
@@ -126,9 +63,7 @@ class RealTimeInferencer:
         self.current_ready_frames_queue: List[FrameResult] = []
 
     def __del__(self):
-        self.status_event.set()
-        self.classification_inferencer_process.join()
-        self.classification_inferencer_process.close()
+        self.classification_service.stop()
 
     def update_sort_tracker(
         self,
@@ -183,39 +118,59 @@ class RealTimeInferencer:
             bboxes=bboxes, scores=detection_scores
         )
 
-        current_tracks_ids = [frame_result.track_id for frame_result in self.current_ready_frames_queue]
-        current_not_tracked_items_idxs = [
+        frame_results_by_tracks_ids = {
+            frame_result.track_id: frame_result for frame_result in self.current_ready_frames_queue
+        }
+        # new tracks and tracks whose requests were expired by the classification service are (re-)submitted
+        current_not_classified_items_idxs = [
             idx for idx, tracked_id in enumerate(tracked_ids)
-            if tracked_id not in current_tracks_ids
+            if tracked_id not in frame_results_by_tracks_ids or (
+                frame_results_by_tracks_ids[tracked_id].label == PENDING_LABEL
+                and not self.classification_service.is_pending(tracked_id)
+            )
         ]
-        if len(current_not_tracked_items_idxs) > 0:
-            current_not_tracked_bboxes = tracked_bboxes[current_not_tracked_items_idxs]
-            current_not_tracked_ids = tracked_ids[current_not_tracked_items_idxs]
+        if len(current_not_classified_items_idxs) > 0:
+            current_not_classified_bboxes = tracked_bboxes[current_not_classified_items_idxs]
+            current_not_classified_ids = tracked_ids[current_not_classified_items_idxs]
             bboxes_data = [
                 BboxData(image=frame, xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax)
-                for (xmin, ymin, xmax, ymax) in current_not_tracked_bboxes
+                for (xmin, ymin, xmax, ymax) in current_not_classified_bboxes
             ]
-            for bbox_data, tracked_id in zip(bboxes_data, current_not_tracked_ids):
-                bbox_data_track_id = BboxDataTrackId(
-                    bbox_data=bbox_data,
-                    track_id=tracked_id
-                )
-                self.bbox_data_track_id_queue.put(bbox_data_track_id)
-                frame_result = FrameResult(
-                    label='...',
+            for bbox_data, tracked_id in zip(bboxes_data, current_not_classified_ids):
+                is_submitted = self.classification_service.submit(
                     track_id=tracked_id,
-                    ready_at_frame=self.current_frame_idx
+                    cropped_image=bbox_data.open_cropped_image(),
+                    frame_idx=self.current_frame_idx
                 )
-                self.current_ready_frames_queue.append(frame_result)
+                # rejected tracks (the queue is full) are submitted again on the next detection frame
+                if is_submitted and tracked_id not in frame_results_by_tracks_ids:
+                    frame_result = FrameResult(
+                        label=PENDING_LABEL,
+                        track_id=tracked_id,
+                        ready_at_frame=self.current_frame_idx
+                    )
+                    self.current_ready_frames_queue.append(frame_result)
 
         return tracked_bboxes, tracked_ids
 
+    def collect_classification_results(self):
+        '''
+        Sets labels of tracks classified by the classification service.
+        '''
+        frame_results_by_tracks_ids = {
+            frame_result.track_id: frame_result for frame_result in self.current_ready_frames_queue
+        }
+        for result in self.classification_service.get_ready_results():
+            if result.track_id in frame_results_by_tracks_ids:
+                frame_results_by_tracks_ids[result.track_id].label = result.label
+
     def predict_on_frame(
         self,
         frame: np.ndarray,
         detection_score_threshold: float,
         batch_size: int
     ) -> List[BboxData]:
+        self.collect_classification_results()
         if self.current_frame_idx % self.detection_delay_frames == 0:
             tracked_bboxes, tracked_ids = self.run_pipeline_on_frame(
                 frame=frame,
@@ -235,15 +190,6 @@ class RealTimeInferencer:
         ]
         ready_tracks_ids_at_the_moment_set = set(ready_tracks_ids_at_the_moment)
 
-        if not self.ready_bbox_data_track_id_queue.empty():
-            pred_bbox_data_track_id = self.ready_bbox_data_track_id_queue.get(block=False)
-            pred_bbox_data = pred_bbox_data_track_id.bbox_data
-            track_id = pred_bbox_data_track_id.track_id
-            if track_id in ready_tracks_ids_at_the_moment_set:
-                ready_frames_at_the_moment[
-                    ready_tracks_ids_at_the_moment.index(track_id)
-                ].label = pred_bbox_data.label
-
         bboxes_data = []
         for bbox, track_id in zip(tracked_bboxes, tracked_ids):
             if track_id not in ready_tracks_ids_at_the_moment_set:
@@ -0,0 +1,95 @@
+'''
+Inference server of the pipeline models from the config file:
+
+    python -m apps.inference_server --config config.yaml --port 5000
+
+See cv_pipeliner.inferencers.inference_server.InferenceServer for the endpoints. The pipeline model is chosen by
+model_index "{detection_model_index}:{classification_model_index}" (or "{detection_model_index}" for pipelines
+without classification), the first pipeline of the config is the default one.
+'''
+import argparse
+import os
+
+import fsspec
+import tensorflow as tf
+
+from cv_pipeliner.inference_models.pipeline import PipelineModelSpec
+from cv_pipeliner.inferencers.inference_server import InferenceServer, ServedPipelineModel
+
+from apps.config import get_cfg_defaults, merge_cfg_from_string, CfgNode
+from apps.model import (
+    get_detection_models_definitions_from_config,
+    get_classification_models_definitions_from_config,
+    get_pipeline_models_definitions_from_config
+)
+
+
+def set_gpu(cfg: CfgNode):
+    if cfg.backend.system.use_gpu:
+        gpus = tf.config.experimental.list_physical_devices('GPU')
+        if gpus:
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+    else:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+
+def get_served_models_from_config(cfg: CfgNode):
+    detection_models_definitions = get_detection_models_definitions_from_config(cfg)
+    classification_models_definitions = get_classification_models_definitions_from_config(cfg)
+    pipeline_models_definitions = get_pipeline_models_definitions_from_config(
+        cfg=cfg,
+        detection_models_definitions=detection_models_definitions,
+        classification_models_definitions=classification_models_definitions
+    )
+    served_models = []
+    for pipeline_model_definition in pipeline_models_definitions:
+        detection_model_definition = pipeline_model_definition.detection_model_definition
+        classification_model_definition = pipeline_model_definition.classification_model_definition
+        if classification_model_definition is not None:
+            model_index = f"{detection_model_definition.model_index}:{classification_model_definition.model_index}"
+        else:
+            model_index = detection_model_definition.model_index
+        served_models.append(ServedPipelineModel(
+            model_index=model_index,
+            model_spec=PipelineModelSpec(
+                detection_model_spec=detection_model_definition.model_spec,
+                classification_model_spec=(
+                    classification_model_definition.model_spec if classification_model_definition is not None
+                    else None
+                )
+            ),
+            description=pipeline_model_definition.description,
+            detection_score_threshold=detection_model_definition.score_threshold
+        ))
+    return served_models
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inference server of the pipeline models from the config file.')
+    parser.add_argument('--config', default=os.environ.get('CV_PIPELINER_APP_CONFIG'), help='YAML config file')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--max_batch_size', type=int, default=8)
+    parser.add_argument('--max_batch_delay', type=float, default=0.01, help='seconds')
+    parser.add_argument('--max_queue_size', type=int, default=256)
+    args = parser.parse_args()
+    assert args.config is not None, "Config file must be given by --config or CV_PIPELINER_APP_CONFIG"
+
+    with fsspec.open(args.config, 'r') as src:
+        cfg_str = src.read()
+    cfg = get_cfg_defaults()
+    merge_cfg_from_string(cfg, cfg_str)
+    set_gpu(cfg)
+
+    inference_server = InferenceServer(
+        served_models=get_served_models_from_config(cfg),
+        max_batch_size=args.max_batch_size,
+        max_batch_delay=args.max_batch_delay,
+        max_queue_size=args.max_queue_size
+    )
+    inference_server.run(host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
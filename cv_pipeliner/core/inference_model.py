@@ -1,5 +1,7 @@
 import abc
-from typing import Tuple, Type
+import asyncio
+import threading
+from typing import Callable, Tuple, Type
 
 
 class ModelSpec(abc.ABC):
@@ -39,7 +41,18 @@ class InferenceModel(abc.ABC):
 
     def __init__(self, model_spec: ModelSpec):
         self._model_spec = model_spec
-        pass
+        self._predict_lock = threading.Lock()
+
+    async def _run_in_thread(self, func: Callable, *args, **kwargs):
+        '''
+        Runs blocking func (e.g. predict of local model) in the default executor of the running loop,
+        so the loop is not blocked. Calls of one model are serialized as local models (e.g. TFLite interpreter)
+        are not guaranteed to be thread-safe.
+        '''
+        def run_locked():
+            with self._predict_lock:
+                return func(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(None, run_locked)
 
     @abc.abstractmethod
     def predict(self, input):
@@ -34,6 +34,17 @@ class ClassificationModel(InferenceModel):
     ) -> ClassificationOutput:
         pass
 
+    async def apredict(
+        self,
+        input: ClassificationInput,
+        top_n: int = 1
+    ) -> ClassificationOutput:
+        '''
+        Async variant of predict. By default predict runs in a thread, models of serving backends
+        override it with native async I/O.
+        '''
+        return await self._run_in_thread(self.predict, input, top_n=top_n)
+
     @abc.abstractmethod
     def preprocess_input(self, input):
         pass
@@ -0,0 +1,117 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple, Callable, Union, Type, Literal
+
+import numpy as np
+import fsspec
+
+from cv_pipeliner.inference_models.classification.core import (
+    ClassificationModelSpec, ClassificationModel, ClassificationInput, ClassificationOutput
+)
+from cv_pipeliner.utils.files import get_preprocess_input_from_script_file
+from cv_pipeliner.utils.onnxruntime_session import (
+    load_onnxruntime_session, get_input_dtype, run_onnxruntime_session
+)
+
+
+@dataclass
+class ONNXRuntime_ClassificationModelSpec(ClassificationModelSpec):
+    '''
+    Classification model exported to ONNX, run by ONNX Runtime (without TensorFlow).
+    The output of preprocess_input is run in batches of max_batch_size, the output (output_name or the first one)
+    is scores of class_names. See load_onnxruntime_session for providers and threads settings.
+    '''
+    input_size: Union[Tuple[int, int], List[int]]
+    preprocess_input: Union[Callable[[List[np.ndarray]], np.ndarray], str, Path]
+    class_names: Union[List[str], str, Path]
+    model_path: Union[str, Path]
+    input_name: str = None
+    output_name: str = None
+    max_batch_size: int = 32
+    providers: List[str] = field(default_factory=lambda: ['CPUExecutionProvider'])
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
+    execution_mode: Literal["sequential", "parallel"] = "sequential"
+    use_io_binding: bool = True
+
+    @property
+    def inference_model_cls(self) -> Type['ONNXRuntime_ClassificationModel']:
+        from cv_pipeliner.inference_models.classification.onnxruntime import ONNXRuntime_ClassificationModel
+        return ONNXRuntime_ClassificationModel
+
+
+class ONNXRuntime_ClassificationModel(ClassificationModel):
+    def __init__(self, model_spec: ONNXRuntime_ClassificationModelSpec):
+        super().__init__(model_spec)
+
+        if isinstance(model_spec.class_names, str) or isinstance(model_spec.class_names, Path):
+            with fsspec.open(model_spec.class_names, 'r', encoding='utf-8') as out:
+                self._class_names = json.load(out)
+        else:
+            self._class_names = model_spec.class_names
+        self.id_to_class_name = np.array([class_name for class_name in self._class_names])
+
+        self.session = load_onnxruntime_session(
+            model_path=model_spec.model_path,
+            providers=model_spec.providers,
+            intra_op_num_threads=model_spec.intra_op_num_threads,
+            inter_op_num_threads=model_spec.inter_op_num_threads,
+            execution_mode=model_spec.execution_mode
+        )
+        self.input_name = (
+            model_spec.input_name if model_spec.input_name is not None else self.session.get_inputs()[0].name
+        )
+        self.output_name = (
+            model_spec.output_name if model_spec.output_name is not None else self.session.get_outputs()[0].name
+        )
+        self.input_dtype = get_input_dtype(self.session, self.input_name)
+
+        if isinstance(model_spec.preprocess_input, str) or isinstance(model_spec.preprocess_input, Path):
+            self._preprocess_input = get_preprocess_input_from_script_file(
+                script_file=model_spec.preprocess_input
+            )
+        else:
+            self._preprocess_input = model_spec.preprocess_input
+
+    def _raw_predict(
+        self,
+        images: np.ndarray
+    ) -> np.ndarray:
+        if len(images) == 0:
+            return np.zeros((0, len(self._class_names)))
+        batch_size = self.model_spec.max_batch_size
+        raw_predictions_batches = []
+        for idx in range(0, len(images), batch_size):
+            images_batch = np.ascontiguousarray(images[idx:idx+batch_size], dtype=self.input_dtype)
+            raw_predictions_batch, = run_onnxruntime_session(
+                session=self.session,
+                inputs={self.input_name: images_batch},
+                output_names=[self.output_name],
+                use_io_binding=self.model_spec.use_io_binding
+            )
+            raw_predictions_batches.append(raw_predictions_batch)
+        return np.concatenate(raw_predictions_batches, axis=0)
+
+    def predict(
+        self,
+        input: ClassificationInput,
+        top_n: int = 1
+    ) -> ClassificationOutput:
+        predictions = self._raw_predict(input)
+        max_scores_top_n_idxs = (-predictions).argsort(axis=1)[:, :top_n]
+        pred_labels_top_n = self.id_to_class_name[max_scores_top_n_idxs]
+        pred_scores_top_n = np.take_along_axis(predictions, max_scores_top_n_idxs, axis=1)
+
+        return pred_labels_top_n, pred_scores_top_n
+
+    def preprocess_input(self, input: ClassificationInput):
+        return self._preprocess_input(input)
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        return self.model_spec.input_size
+
+    @property
+    def class_names(self) -> List[str]:
+        return self._class_names
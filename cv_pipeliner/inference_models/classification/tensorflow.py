@@ -1,13 +1,9 @@
-import base64
 import json
-import sys
-import importlib
 import tempfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple, Callable, Union, Type, Literal
+from typing import Dict, List, Tuple, Callable, Union, Type, Literal
 
-import requests
 import numpy as np
 import tensorflow as tf
 import fsspec
@@ -16,7 +12,8 @@ from pathy import Pathy
 from cv_pipeliner.inference_models.classification.core import (
     ClassificationModelSpec, ClassificationModel, ClassificationInput, ClassificationOutput
 )
-from cv_pipeliner.utils.files import copy_files_from_directory_to_temp_directory
+from cv_pipeliner.utils.files import copy_files_from_directory_to_temp_directory, get_preprocess_input_from_script_file
+from cv_pipeliner.utils.tf_serving import TFServingRESTClient, encode_image_jpeg
 
 
 @dataclass
@@ -47,26 +44,36 @@ class TensorFlow_ClassificationModelSpec_TFServing(ClassificationModelSpec):
         return Tensorflow_ClassificationModel
 
 
-class Tensorflow_ClassificationModel(ClassificationModel):
-    def _get_preprocess_input_from_script_file(
-        self,
-        script_file: Union[str, Path]
-    ) -> Callable[[List[np.ndarray]], np.ndarray]:
-        with fsspec.open(script_file, 'r') as src:
-            script_code = src.read()
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            tmpdirname = Path(tmpdirname)
-            module_folder = tmpdirname / 'module'
-            module_folder.mkdir()
-            script_file = module_folder / f'preprocess_input_{tmpdirname.name}.py'
-            with open(script_file, 'w') as out:
-                out.write(script_code)
-            sys.path.append(str(script_file.parent.absolute()))
-            module = importlib.import_module(script_file.stem)
-            importlib.reload(module)
-            sys.path.pop()
-        return module.preprocess_input
+@dataclass
+class TensorFlow_ClassificationModelSpec_TFServingGRPC(ClassificationModelSpec):
+    '''
+    Model served by TF Serving and called by gRPC (requires tensorflow-serving-api), address is like host:8500.
+    With input_type "tensor" the output of preprocess_input is sent as the raw tensor (e.g. uint8 images
+    if the served model preprocesses them itself), with "encoded_image_string_tensor" every image is sent
+    as JPEG of jpeg_quality. Batches of max_batch_size images are sent concurrently over n_channels channels.
+    output_name can be omitted for models with one output.
+    '''
+    address: str
+    model_name: str
+    input_name: str
+    input_size: Union[Tuple[int, int], List[int]]
+    preprocess_input: Union[Callable[[List[np.ndarray]], np.ndarray], str, Path]
+    class_names: Union[List[str], str, Path]
+    input_type: Literal["tensor", "encoded_image_string_tensor"] = "tensor"
+    jpeg_quality: int = 95
+    output_name: str = None
+    signature_name: str = 'serving_default'
+    max_batch_size: int = 32
+    n_channels: int = 2
+    timeout: float = 10.
 
+    @property
+    def inference_model_cls(self) -> Type['Tensorflow_ClassificationModel']:
+        from cv_pipeliner.inference_models.classification.tensorflow import Tensorflow_ClassificationModel
+        return Tensorflow_ClassificationModel
+
+
+class Tensorflow_ClassificationModel(ClassificationModel):
     def _load_tensorflow_classification_model_spec(
         self,
         model_spec: TensorFlow_ClassificationModelSpec
@@ -83,6 +90,7 @@ class Tensorflow_ClassificationModel(ClassificationModel):
                 temp_file = tempfile.NamedTemporaryFile()
                 with model_openfile as src:
                     temp_file.write(src.read())
+                temp_file.flush()
                 model_path = Pathy(temp_file.name)
                 temp_files_cleanup = temp_file.close
 
@@ -116,7 +124,8 @@ class Tensorflow_ClassificationModel(ClassificationModel):
         self,
         model_spec: Union[
             TensorFlow_ClassificationModelSpec,
-            TensorFlow_ClassificationModelSpec_TFServing
+            TensorFlow_ClassificationModelSpec_TFServing,
+            TensorFlow_ClassificationModelSpec_TFServingGRPC
         ]
     ):
         super().__init__(model_spec)
@@ -131,14 +140,30 @@ class Tensorflow_ClassificationModel(ClassificationModel):
             self._load_tensorflow_classification_model_spec(model_spec)
             self._raw_predict = self._raw_predict_tensorflow
         elif isinstance(model_spec, TensorFlow_ClassificationModelSpec_TFServing):
+            self.client = TFServingRESTClient(url=model_spec.url)
             self._raw_predict = self._raw_predict_kfserving
+        elif isinstance(model_spec, TensorFlow_ClassificationModelSpec_TFServingGRPC):
+            if model_spec.input_type not in ["tensor", "encoded_image_string_tensor"]:
+                raise ValueError(
+                    "input_type of TensorFlow_ClassificationModelSpec_TFServingGRPC can be tensor "
+                    "or encoded_image_string_tensor."
+                )
+            from cv_pipeliner.utils.tf_serving_grpc import TFServingGRPCClient
+            self.grpc_client = TFServingGRPCClient(
+                address=model_spec.address,
+                model_name=model_spec.model_name,
+                signature_name=model_spec.signature_name,
+                n_channels=model_spec.n_channels,
+                timeout=model_spec.timeout
+            )
+            self._raw_predict = self._raw_predict_grpc
         else:
             raise ValueError(
                 f"Tensorflow_ClassificationModel got unknown ClassificationModelSpec: {type(model_spec)}"
             )
 
         if isinstance(model_spec.preprocess_input, str) or isinstance(model_spec.preprocess_input, Path):
-            self._preprocess_input = self._get_preprocess_input_from_script_file(
+            self._preprocess_input = get_preprocess_input_from_script_file(
                 script_file=model_spec.preprocess_input
             )
         else:
@@ -171,38 +196,78 @@ class Tensorflow_ClassificationModel(ClassificationModel):
         self,
         images: np.ndarray
     ):
-        images_encoded = [tf.io.encode_jpeg(image, quality=100) for image in images]
-        images_encoded_b64 = [base64.b64encode(image.numpy()).decode('utf-8') for image in images_encoded]
-        response = requests.post(
-            url=self.model_spec.url,
-            data=json.dumps({
-                'instances': [
-                    {
-                        self.model_spec.input_name: {
-                            'b64': image
-                        }
-                    }
-                    for image in images_encoded_b64
-                ]
-            })
-        )
-        output_dict = json.loads(response.content)
-        if not response.ok:
-            if 'error' in output_dict:
-                error = output_dict['error']
+        if len(images) == 0:
+            return np.zeros((0, len(self._class_names)))
+        predictions = self.client.predict_images(images, input_name=self.model_spec.input_name)
+        raw_predictions_batch = np.array(predictions)
+
+        return raw_predictions_batch
+
+    async def _araw_predict_kfserving(
+        self,
+        images: np.ndarray
+    ):
+        if len(images) == 0:
+            return np.zeros((0, len(self._class_names)))
+        predictions = await self.client.apredict_images(images, input_name=self.model_spec.input_name)
+        raw_predictions_batch = np.array(predictions)
+
+        return raw_predictions_batch
+
+    def _get_grpc_inputs_list(
+        self,
+        images: np.ndarray
+    ) -> List[Dict[str, np.ndarray]]:
+        batch_size = self.model_spec.max_batch_size
+        inputs_list = []
+        for idx in range(0, len(images), batch_size):
+            images_batch = images[idx:idx+batch_size]
+            if self.model_spec.input_type == "tensor":
+                input_tensor = np.asarray(images_batch)
             else:
-                error = response.response
-            raise ValueError(error)
-        raw_predictions_batch = np.array(output_dict['predictions'])
+                input_tensor = np.array([
+                    encode_image_jpeg(image, jpeg_quality=self.model_spec.jpeg_quality) for image in images_batch
+                ], dtype=object)
+            inputs_list.append({self.model_spec.input_name: input_tensor})
+        return inputs_list
+
+    def _concatenate_grpc_outputs(
+        self,
+        outputs: List[Dict[str, np.ndarray]]
+    ) -> np.ndarray:
+        if self.model_spec.output_name is not None:
+            output_name = self.model_spec.output_name
+        else:
+            assert len(outputs[0]) == 1, f"output_name must be given for models with outputs {list(outputs[0])}"
+            output_name = list(outputs[0])[0]
+        raw_predictions_batch = np.concatenate([output[output_name] for output in outputs], axis=0)
 
         return raw_predictions_batch
 
-    def predict(
+    def _raw_predict_grpc(
+        self,
+        images: np.ndarray
+    ):
+        if len(images) == 0:
+            return np.zeros((0, len(self._class_names)))
+        outputs = self.grpc_client.predict_many(self._get_grpc_inputs_list(images))
+        return self._concatenate_grpc_outputs(outputs)
+
+    async def _araw_predict_grpc(
+        self,
+        images: np.ndarray
+    ):
+        if len(images) == 0:
+            return np.zeros((0, len(self._class_names)))
+        outputs = await self.grpc_client.apredict_many(self._get_grpc_inputs_list(images))
+        return self._concatenate_grpc_outputs(outputs)
+
+    def _postprocess_predictions(
         self,
         input: ClassificationInput,
-        top_n: int = 1
+        predictions: np.ndarray,
+        top_n: int
     ) -> ClassificationOutput:
-        predictions = self._raw_predict(input)
         max_scores_top_n_idxs = (-np.array(predictions)).argsort(axis=1)[:, :top_n]
         id_to_class_names_repeated = np.repeat(
             a=self.id_to_class_name[None, ...],
@@ -214,6 +279,27 @@ class Tensorflow_ClassificationModel(ClassificationModel):
 
         return pred_labels_top_n, pred_scores_top_n
 
+    def predict(
+        self,
+        input: ClassificationInput,
+        top_n: int = 1
+    ) -> ClassificationOutput:
+        predictions = self._raw_predict(input)
+        return self._postprocess_predictions(input, predictions, top_n)
+
+    async def apredict(
+        self,
+        input: ClassificationInput,
+        top_n: int = 1
+    ) -> ClassificationOutput:
+        if isinstance(self.model_spec, TensorFlow_ClassificationModelSpec_TFServing):
+            predictions = await self._araw_predict_kfserving(input)
+        elif isinstance(self.model_spec, TensorFlow_ClassificationModelSpec_TFServingGRPC):
+            predictions = await self._araw_predict_grpc(input)
+        else:
+            return await super().apredict(input, top_n=top_n)
+        return self._postprocess_predictions(input, predictions, top_n)
+
     def preprocess_input(self, input: ClassificationInput):
         return self._preprocess_input(input)
 
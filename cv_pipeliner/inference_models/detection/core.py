@@ -45,6 +45,19 @@ class DetectionModel(InferenceModel):
     ) -> DetectionOutput:
         pass
 
+    async def apredict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = None
+    ) -> DetectionOutput:
+        '''
+        Async variant of predict. By default predict runs in a thread, models of serving backends
+        override it with native async I/O.
+        '''
+        kwargs = {} if classification_top_n is None else {'classification_top_n': classification_top_n}
+        return await self._run_in_thread(self.predict, input, score_threshold=score_threshold, **kwargs)
+
     @abc.abstractmethod
     def preprocess_input(self, input):
         pass
@@ -1,21 +1,21 @@
-import json
 import tempfile
-import base64
 from dataclasses import dataclass
-from typing import List, Tuple, Union, Type, Literal
+from typing import Dict, List, Tuple, Union, Type, Literal
 from pathlib import Path
 
 import tensorflow as tf
 import numpy as np
 import fsspec
-import requests
 from pathy import Pathy
 
 from cv_pipeliner.inference_models.detection.core import (
     DetectionModelSpec, DetectionModel, DetectionInput, DetectionOutput
 )
-from cv_pipeliner.utils.images import denormalize_bboxes
+from cv_pipeliner.inference_models.detection.postprocessing import (
+    DetectionPostprocessing, load_class_names, postprocess_detection_predictions
+)
 from cv_pipeliner.utils.files import copy_files_from_directory_to_temp_directory
+from cv_pipeliner.utils.tf_serving import TFServingRESTClient, encode_image_jpeg
 
 
 @dataclass
@@ -23,6 +23,7 @@ class ObjectDetectionAPI_ModelSpec(DetectionModelSpec):
     config_path: Union[str, Path]
     checkpoint_path: Union[str, Path]
     class_names: Union[None, List[str]] = None
+    postprocessing: DetectionPostprocessing = None
 
     @property
     def inference_model_cls(self) -> Type['ObjectDetectionAPI_DetectionModel']:
@@ -35,6 +36,7 @@ class ObjectDetectionAPI_pb_ModelSpec(DetectionModelSpec):
     saved_model_dir: Union[str, Path]
     input_type: Literal["image_tensor", "float_image_tensor", "encoded_image_string_tensor"]
     class_names: Union[None, List[str]] = None
+    postprocessing: DetectionPostprocessing = None
 
     @property
     def inference_model_cls(self) -> Type['ObjectDetectionAPI_DetectionModel']:
@@ -48,6 +50,7 @@ class ObjectDetectionAPI_TFLite_ModelSpec(DetectionModelSpec):
     scores_output_index: int
     classes_output_index: Union[None, int] = None
     class_names: Union[None, List[str]] = None
+    postprocessing: DetectionPostprocessing = None
 
     @property
     def inference_model_cls(self) -> Type['ObjectDetectionAPI_DetectionModel']:
@@ -57,9 +60,43 @@ class ObjectDetectionAPI_TFLite_ModelSpec(DetectionModelSpec):
 
 @dataclass
 class ObjectDetectionAPI_KFServing(DetectionModelSpec):
+    '''
+    Images of one predict call are sent in batches of max_batch_size with at most max_in_flight
+    concurrent requests over kept-alive connections (see TFServingRESTClient).
+    '''
     url: str
     input_name: str
     class_names: Union[None, List[str]] = None
+    max_batch_size: int = 16
+    max_in_flight: int = 4
+    timeout: float = 10.
+    max_retries: int = 3
+    jpeg_quality: int = 100
+    postprocessing: DetectionPostprocessing = None
+
+    @property
+    def inference_model_cls(self) -> Type['ObjectDetectionAPI_DetectionModel']:
+        from cv_pipeliner.inference_models.detection.object_detection_api import ObjectDetectionAPI_DetectionModel
+        return ObjectDetectionAPI_DetectionModel
+
+
+@dataclass
+class ObjectDetectionAPI_TFServingGRPC(DetectionModelSpec):
+    '''
+    Model served by TF Serving and called by gRPC (requires tensorflow-serving-api), address is like host:8500.
+    With input_type "image_tensor" images are sent as raw uint8 tensors, with "encoded_image_string_tensor"
+    as JPEG of jpeg_quality. Images of one predict call are sent concurrently over n_channels channels.
+    '''
+    address: str
+    model_name: str
+    input_name: str = 'input_tensor'
+    input_type: Literal["image_tensor", "encoded_image_string_tensor"] = "image_tensor"
+    jpeg_quality: int = 95
+    signature_name: str = 'serving_default'
+    class_names: Union[None, List[str]] = None
+    n_channels: int = 2
+    timeout: float = 10.
+    postprocessing: DetectionPostprocessing = None
 
     @property
     def inference_model_cls(self) -> Type['ObjectDetectionAPI_DetectionModel']:
@@ -146,25 +183,17 @@ class ObjectDetectionAPI_DetectionModel(DetectionModel):
             ObjectDetectionAPI_ModelSpec,
             ObjectDetectionAPI_pb_ModelSpec,
             ObjectDetectionAPI_TFLite_ModelSpec,
-            ObjectDetectionAPI_KFServing
+            ObjectDetectionAPI_KFServing,
+            ObjectDetectionAPI_TFServingGRPC
         ],
     ):
         super().__init__(model_spec)
 
-        if model_spec.class_names is not None:
-            if isinstance(model_spec.class_names, str) or isinstance(model_spec.class_names, Path):
-                with fsspec.open(model_spec.class_names, 'r', encoding='utf-8') as out:
-                    self.class_names = np.array(json.load(out))
-            else:
-                self.class_names = np.array(model_spec.class_names)
-
-            if isinstance(model_spec, ObjectDetectionAPI_ModelSpec):
-                self.class_names_coef = 0  # saved_model.pb returns from 0
-            else:
-                self.class_names_coef = -1  # saved_model.pb returns from 1
+        self.class_names = load_class_names(model_spec.class_names)
+        if isinstance(model_spec, ObjectDetectionAPI_ModelSpec):
+            self.class_names_coef = 0  # checkpoint returns classes from 0
         else:
-            self.class_names = None
-            self.coef = -1
+            self.class_names_coef = -1  # saved_model.pb returns classes from 1
 
         if isinstance(model_spec, ObjectDetectionAPI_ModelSpec):
             self._load_object_detection_api(model_spec)
@@ -177,7 +206,29 @@ class ObjectDetectionAPI_DetectionModel(DetectionModel):
             self._raw_predict_single_image = self._raw_predict_single_image_tflite
         elif isinstance(model_spec, ObjectDetectionAPI_KFServing):
             self.input_dtype = tf.string
+            self.client = TFServingRESTClient(
+                url=model_spec.url,
+                max_batch_size=model_spec.max_batch_size,
+                max_in_flight=model_spec.max_in_flight,
+                timeout=model_spec.timeout,
+                max_retries=model_spec.max_retries
+            )
             self._raw_predict_single_image = self._raw_predict_single_image_kfserving
+        elif isinstance(model_spec, ObjectDetectionAPI_TFServingGRPC):
+            if model_spec.input_type not in ["image_tensor", "encoded_image_string_tensor"]:
+                raise ValueError(
+                    "input_type of ObjectDetectionAPI_TFServingGRPC can be image_tensor "
+                    "or encoded_image_string_tensor."
+                )
+            from cv_pipeliner.utils.tf_serving_grpc import TFServingGRPCClient
+            self.grpc_client = TFServingGRPCClient(
+                address=model_spec.address,
+                model_name=model_spec.model_name,
+                signature_name=model_spec.signature_name,
+                n_channels=model_spec.n_channels,
+                timeout=model_spec.timeout
+            )
+            self._raw_predict_single_image = self._raw_predict_single_image_grpc
         else:
             raise ValueError(
                 f"ObjectDetectionAPI_Model got unknown DetectionModelSpec: {type(model_spec)}"
@@ -224,88 +275,93 @@ class ObjectDetectionAPI_DetectionModel(DetectionModel):
 
         return raw_bboxes, raw_scores, raw_classes
 
+    def _parse_kfserving_predictions(
+        self,
+        predictions: List[Dict]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        raw_predictions = []
+        for detection_output_dict in predictions:
+            raw_bboxes = detection_output_dict["detection_boxes"]  # (ymin, xmin, ymax, xmax)
+            raw_bboxes = np.array(raw_bboxes).reshape(-1, 4)[:, [1, 0, 3, 2]]  # (xmin, ymin, xmax, ymax)
+            raw_scores = np.array(detection_output_dict["detection_scores"])
+            raw_classes = np.array(detection_output_dict["detection_classes"])
+            raw_predictions.append((raw_bboxes, raw_scores, raw_classes))
+
+        return raw_predictions
+
+    def _raw_predict_images_kfserving(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        predictions = self.client.predict_images(
+            images=images,
+            input_name=self.model_spec.input_name,
+            jpeg_quality=self.model_spec.jpeg_quality
+        )
+        return self._parse_kfserving_predictions(predictions)
+
+    async def _araw_predict_images_kfserving(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        predictions = await self.client.apredict_images(
+            images=images,
+            input_name=self.model_spec.input_name,
+            jpeg_quality=self.model_spec.jpeg_quality
+        )
+        return self._parse_kfserving_predictions(predictions)
+
     def _raw_predict_single_image_kfserving(
         self,
         image: np.ndarray
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-        input_tensor = tf.io.encode_jpeg(image, quality=100)
-        input_tensor_b64 = base64.b64encode(input_tensor.numpy()).decode('utf-8')
-        response = requests.post(
-            url=self.model_spec.url,
-            data=json.dumps({
-                'inputs': {
-                    self.model_spec.input_name: {
-                        'b64': input_tensor_b64
-                    }
-                }
-            })
-        )
-        detection_output_dict = json.loads(response.content)
-        if not response.ok:
-            if 'error' in detection_output_dict:
-                error = detection_output_dict['error']
-            else:
-                error = response.response
-            raise ValueError(error)
-        detection_output_dict = detection_output_dict['outputs']
-        raw_bboxes = detection_output_dict["detection_boxes"][0]  # (ymin, xmin, ymax, xmax)
-        raw_bboxes = np.array(raw_bboxes)[:, [1, 0, 3, 2]]  # (xmin, ymin, xmax, ymax)
-        raw_scores = detection_output_dict["detection_scores"][0]
-        raw_scores = np.array(raw_scores)
-        raw_classes = detection_output_dict["detection_classes"][0]
-        raw_classes = np.array(raw_classes)
-
-        return raw_bboxes, raw_scores, raw_classes
+        return self._raw_predict_images_kfserving([image])[0]
 
-    def _postprocess_prediction(
+    def _get_grpc_inputs(
         self,
-        raw_bboxes: np.ndarray,
-        raw_scores: np.ndarray,
-        raw_classes: np.ndarray,
-        score_threshold: float,
-        height: int,
-        width: int,
-        classification_top_n: int
-    ) -> Tuple[List[Tuple[int, int, int, int]], List[float], List[List[str]], List[List[float]]]:
-
-        raw_bboxes = denormalize_bboxes(raw_bboxes, width, height)
-        mask = raw_scores > score_threshold
-        bboxes = raw_bboxes[mask]
-        scores = raw_scores[mask]
-        classes = raw_classes[mask]
-
-        correct_non_repeated_bboxes_idxs = []
-        bboxes_set = set()
-        for idx, bbox in enumerate(bboxes):
-            xmin, ymin, xmax, ymax = bbox
-            if xmax - xmin > 0 and ymax - ymin > 0 and (xmin, ymin, xmax, ymax) not in bboxes_set:
-                bboxes_set.add((xmin, ymin, xmax, ymax))
-                correct_non_repeated_bboxes_idxs.append(idx)
-
-        bboxes = bboxes[correct_non_repeated_bboxes_idxs]
-        scores = scores[correct_non_repeated_bboxes_idxs]
-        classes = classes[correct_non_repeated_bboxes_idxs]
-        classes_scores = scores.copy()
-        if self.class_names is not None:
-            class_names_top_n = np.array([
-                [class_name for i in range(classification_top_n)]
-                for class_name in self.class_names[(classes.astype(np.int32) + self.class_names_coef)]
-            ])
-            classes_scores_top_n = np.array([
-                [score for _ in range(classification_top_n)]
-                for score in classes_scores
-            ])
+        image: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        if self.model_spec.input_type == "image_tensor":
+            input_tensor = np.asarray(image, dtype=np.uint8)[None, ...]
         else:
-            class_names_top_n = np.array([
-                [None for _ in range(classification_top_n)]
-                for _ in classes
-            ])
-            classes_scores_top_n = np.array([
-                [score for _ in range(classification_top_n)]
-                for score in classes_scores
-            ])
+            input_tensor = np.array(
+                [encode_image_jpeg(image, jpeg_quality=self.model_spec.jpeg_quality)], dtype=object
+            )
+        return {self.model_spec.input_name: input_tensor}
 
-        return bboxes, scores, class_names_top_n, classes_scores_top_n
+    def _parse_grpc_outputs(
+        self,
+        outputs: List[Dict[str, np.ndarray]]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        raw_predictions = []
+        for detection_output_dict in outputs:
+            raw_bboxes = detection_output_dict["detection_boxes"][0]  # (ymin, xmin, ymax, xmax)
+            raw_bboxes = np.array(raw_bboxes).reshape(-1, 4)[:, [1, 0, 3, 2]]  # (xmin, ymin, xmax, ymax)
+            raw_scores = np.array(detection_output_dict["detection_scores"][0])
+            raw_classes = np.array(detection_output_dict["detection_classes"][0])
+            raw_predictions.append((raw_bboxes, raw_scores, raw_classes))
+
+        return raw_predictions
+
+    def _raw_predict_images_grpc(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        outputs = self.grpc_client.predict_many([self._get_grpc_inputs(image) for image in images])
+        return self._parse_grpc_outputs(outputs)
+
+    async def _araw_predict_images_grpc(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        outputs = await self.grpc_client.apredict_many([self._get_grpc_inputs(image) for image in images])
+        return self._parse_grpc_outputs(outputs)
+
+    def _raw_predict_single_image_grpc(
+        self,
+        image: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._raw_predict_images_grpc([image])[0]
 
     def predict(
         self,
@@ -313,27 +369,47 @@ class ObjectDetectionAPI_DetectionModel(DetectionModel):
         score_threshold: float,
         classification_top_n: int = 1
     ) -> DetectionOutput:
-        n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k = [], [], [], []
-
-        for image in input:
-            height, width, _ = image.shape
-            raw_bboxes, raw_scores, raw_classes = self._raw_predict_single_image(image)
-            bboxes, scores, class_names_top_k, classes_scores_top_k = self._postprocess_prediction(
-                raw_bboxes=raw_bboxes,
-                raw_scores=raw_scores,
-                raw_classes=raw_classes,
-                score_threshold=score_threshold,
-                height=height,
-                width=width,
-                classification_top_n=classification_top_n
-            )
-
-            n_pred_bboxes.append(bboxes)
-            n_pred_scores.append(scores)
-            n_pred_class_names_top_k.append(class_names_top_k)
-            n_pred_scores_top_k.append(classes_scores_top_k)
+        if isinstance(self.model_spec, ObjectDetectionAPI_KFServing):
+            # all images are sent at once in batched concurrent requests
+            raw_predictions = self._raw_predict_images_kfserving(input)
+        elif isinstance(self.model_spec, ObjectDetectionAPI_TFServingGRPC):
+            # all images are in flight at once
+            raw_predictions = self._raw_predict_images_grpc(input)
+        else:
+            raw_predictions = (self._raw_predict_single_image(image) for image in input)
+
+        return postprocess_detection_predictions(
+            input=input,
+            raw_predictions=raw_predictions,
+            score_threshold=score_threshold,
+            classification_top_n=classification_top_n,
+            class_names=self.class_names,
+            class_names_coef=self.class_names_coef,
+            postprocessing=self.model_spec.postprocessing
+        )
 
-        return n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k
+    async def apredict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = 1
+    ) -> DetectionOutput:
+        if isinstance(self.model_spec, ObjectDetectionAPI_KFServing):
+            raw_predictions = await self._araw_predict_images_kfserving(input)
+        elif isinstance(self.model_spec, ObjectDetectionAPI_TFServingGRPC):
+            raw_predictions = await self._araw_predict_images_grpc(input)
+        else:
+            return await super().apredict(input, score_threshold, classification_top_n)
+
+        return postprocess_detection_predictions(
+            input=input,
+            raw_predictions=raw_predictions,
+            score_threshold=score_threshold,
+            classification_top_n=classification_top_n,
+            class_names=self.class_names,
+            class_names_coef=self.class_names_coef,
+            postprocessing=self.model_spec.postprocessing
+        )
 
     def preprocess_input(self, input: DetectionInput):
         return input
@@ -0,0 +1,136 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple, Union, Type, Literal
+
+import cv2
+import numpy as np
+
+from cv_pipeliner.inference_models.detection.core import (
+    DetectionModelSpec, DetectionModel, DetectionInput, DetectionOutput
+)
+from cv_pipeliner.inference_models.detection.postprocessing import (
+    DetectionPostprocessing, load_class_names, postprocess_detection_predictions
+)
+from cv_pipeliner.utils.onnxruntime_session import (
+    load_onnxruntime_session, get_input_dtype, run_onnxruntime_session
+)
+
+
+@dataclass
+class ONNXRuntime_DetectionModelSpec(DetectionModelSpec):
+    '''
+    Detection model exported to ONNX with outputs of Object Detection API (e.g. by tf2onnx), run by ONNX Runtime
+    (without TensorFlow): normalized bboxes (ymin, xmin, ymax, xmax), scores and classes (from 1) of the batch.
+
+    If input_size (height, width) is given, images are resized to it, otherwise images of the same shape are
+    batched together (for models with dynamic image size). Batches have at most max_batch_size images.
+    See load_onnxruntime_session for providers and threads settings.
+    '''
+    model_path: Union[str, Path]
+    input_name: str = None
+    bboxes_output_name: str = 'detection_boxes'
+    scores_output_name: str = 'detection_scores'
+    classes_output_name: Union[None, str] = 'detection_classes'
+    input_size: Union[None, Tuple[int, int], List[int]] = None
+    max_batch_size: int = 8
+    class_names: Union[None, List[str], str, Path] = None
+    providers: List[str] = field(default_factory=lambda: ['CPUExecutionProvider'])
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
+    execution_mode: Literal["sequential", "parallel"] = "sequential"
+    use_io_binding: bool = True
+    postprocessing: DetectionPostprocessing = None
+
+    @property
+    def inference_model_cls(self) -> Type['ONNXRuntime_DetectionModel']:
+        from cv_pipeliner.inference_models.detection.onnxruntime import ONNXRuntime_DetectionModel
+        return ONNXRuntime_DetectionModel
+
+
+class ONNXRuntime_DetectionModel(DetectionModel):
+    def __init__(self, model_spec: ONNXRuntime_DetectionModelSpec):
+        super().__init__(model_spec)
+        self.class_names = load_class_names(model_spec.class_names)
+
+        self.session = load_onnxruntime_session(
+            model_path=model_spec.model_path,
+            providers=model_spec.providers,
+            intra_op_num_threads=model_spec.intra_op_num_threads,
+            inter_op_num_threads=model_spec.inter_op_num_threads,
+            execution_mode=model_spec.execution_mode
+        )
+        self.input_name = (
+            model_spec.input_name if model_spec.input_name is not None else self.session.get_inputs()[0].name
+        )
+        self.input_dtype = get_input_dtype(self.session, self.input_name)
+        self.output_names = [model_spec.bboxes_output_name, model_spec.scores_output_name]
+        if model_spec.classes_output_name is not None:
+            self.output_names.append(model_spec.classes_output_name)
+
+    def _raw_predict_batch(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        '''
+        Images of the batch must have the same shape.
+        '''
+        outputs = run_onnxruntime_session(
+            session=self.session,
+            inputs={self.input_name: np.ascontiguousarray(images, dtype=self.input_dtype)},
+            output_names=self.output_names,
+            use_io_binding=self.model_spec.use_io_binding
+        )
+        raw_bboxes_batch = np.array(outputs[0]).reshape(len(images), -1, 4)[:, :, [1, 0, 3, 2]]
+        raw_scores_batch = np.array(outputs[1]).reshape(len(images), -1)
+        if len(outputs) > 2:
+            raw_classes_batch = np.array(outputs[2]).reshape(len(images), -1)
+        else:
+            raw_classes_batch = np.ones_like(raw_scores_batch)
+        return list(zip(raw_bboxes_batch, raw_scores_batch, raw_classes_batch))
+
+    def _raw_predict_images(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        if self.model_spec.input_size is not None:
+            height, width = self.model_spec.input_size
+            images = [
+                cv2.resize(image, (width, height)) if image.shape[:2] != (height, width) else image
+                for image in images
+            ]
+        shape_to_idxs = defaultdict(list)
+        for idx, image in enumerate(images):
+            shape_to_idxs[image.shape].append(idx)
+        raw_predictions = [None] * len(images)
+        batch_size = self.model_spec.max_batch_size
+        for idxs in shape_to_idxs.values():
+            for batch_idxs in [idxs[i:i+batch_size] for i in range(0, len(idxs), batch_size)]:
+                raw_predictions_batch = self._raw_predict_batch([images[idx] for idx in batch_idxs])
+                for idx, raw_prediction in zip(batch_idxs, raw_predictions_batch):
+                    raw_predictions[idx] = raw_prediction
+        return raw_predictions
+
+    def predict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = 1
+    ) -> DetectionOutput:
+        return postprocess_detection_predictions(
+            input=input,
+            raw_predictions=self._raw_predict_images(input),
+            score_threshold=score_threshold,
+            classification_top_n=classification_top_n,
+            class_names=self.class_names,
+            postprocessing=self.model_spec.postprocessing
+        )
+
+    def preprocess_input(self, input: DetectionInput):
+        return input
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        if self.model_spec.input_size is not None:
+            return tuple(self.model_spec.input_size)
+        return (None, None)
@@ -0,0 +1,148 @@
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple, Union, Type
+
+import cv2
+import numpy as np
+import fsspec
+
+from cv_pipeliner.inference_models.detection.core import (
+    DetectionModelSpec, DetectionModel, DetectionInput, DetectionOutput
+)
+from cv_pipeliner.inference_models.detection.postprocessing import (
+    DetectionPostprocessing, load_class_names, postprocess_detection_predictions
+)
+
+
+@dataclass
+class OpenCVDNN_DetectionModelSpec(DetectionModelSpec):
+    '''
+    Detection model run by OpenCV DNN module on CPU (without TensorFlow): any format supported by cv2.dnn.readNet
+    (ONNX, Caffe, TensorFlow frozen graph with config_path, Darknet, ...) with SSD-like output "DetectionOutput"
+    of shape [..., 7]: rows (image_id, class, score, xmin, ymin, xmax, ymax) with normalized coordinates
+    and classes from 1 (0 is the background).
+
+    Images are resized to input_size (height, width) and converted to blobs by cv2.dnn.blobFromImages
+    with scale, mean and swap_rb (images are RGB, so swap_rb=True for models trained on BGR images).
+    Batches have at most max_batch_size images (use 1 for models with the fixed batch size).
+    '''
+    model_path: Union[str, Path]
+    input_size: Union[Tuple[int, int], List[int]] = (300, 300)
+    config_path: Union[None, str, Path] = None
+    output_name: str = None
+    scale: float = 1.
+    mean: Tuple[float, float, float] = (0., 0., 0.)
+    swap_rb: bool = False
+    max_batch_size: int = 8
+    class_names: Union[None, List[str], str, Path] = None
+    preferable_backend: int = cv2.dnn.DNN_BACKEND_OPENCV
+    preferable_target: int = cv2.dnn.DNN_TARGET_CPU
+    postprocessing: DetectionPostprocessing = None
+
+    @property
+    def inference_model_cls(self) -> Type['OpenCVDNN_DetectionModel']:
+        from cv_pipeliner.inference_models.detection.opencv_dnn import OpenCVDNN_DetectionModel
+        return OpenCVDNN_DetectionModel
+
+
+def _copy_to_temp_file(path: Union[str, Path]) -> tempfile.NamedTemporaryFile:
+    '''
+    cv2.dnn.readNet gets the framework by the extension of the file, so it is kept.
+    '''
+    temp_file = tempfile.NamedTemporaryFile(suffix=Path(str(path)).suffix)
+    with fsspec.open(str(path), 'rb') as src:
+        temp_file.write(src.read())
+    temp_file.flush()
+    return temp_file
+
+
+def split_detection_output(
+    detection_output: np.ndarray,
+    batch_size: int
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    '''
+    Splits "DetectionOutput" rows (image_id, class, score, xmin, ymin, xmax, ymax) of the batch
+    to raw bboxes (xmin, ymin, xmax, ymax), scores and classes of every image.
+    Rows with image_id out of the batch (e.g. -1 of padding) are ignored.
+    '''
+    detections = np.asarray(detection_output, dtype=np.float32).reshape(-1, 7)
+    images_ids = detections[:, 0].astype(np.int32)
+    raw_predictions = []
+    for image_id in range(batch_size):
+        image_detections = detections[images_ids == image_id]
+        raw_predictions.append((
+            np.clip(image_detections[:, 3:7], 0., 1.),
+            image_detections[:, 2],
+            image_detections[:, 1]
+        ))
+    return raw_predictions
+
+
+class OpenCVDNN_DetectionModel(DetectionModel):
+    def __init__(self, model_spec: OpenCVDNN_DetectionModelSpec):
+        super().__init__(model_spec)
+        self.class_names = load_class_names(model_spec.class_names)
+
+        model_file = _copy_to_temp_file(model_spec.model_path)
+        if model_spec.config_path is not None:
+            config_file = _copy_to_temp_file(model_spec.config_path)
+            self.net = cv2.dnn.readNet(model_file.name, config_file.name)
+            config_file.close()
+        else:
+            self.net = cv2.dnn.readNet(model_file.name)
+        model_file.close()
+        self.net.setPreferableBackend(model_spec.preferable_backend)
+        self.net.setPreferableTarget(model_spec.preferable_target)
+
+    def _raw_predict_batch(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        height, width = self.model_spec.input_size
+        blob = cv2.dnn.blobFromImages(
+            images,
+            scalefactor=self.model_spec.scale,
+            size=(width, height),
+            mean=self.model_spec.mean,
+            swapRB=self.model_spec.swap_rb,
+            crop=False
+        )
+        self.net.setInput(blob)
+        if self.model_spec.output_name is not None:
+            detection_output = self.net.forward(self.model_spec.output_name)
+        else:
+            detection_output = self.net.forward()
+        return split_detection_output(detection_output, len(images))
+
+    def _raw_predict_images(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        raw_predictions = []
+        batch_size = self.model_spec.max_batch_size
+        for i in range(0, len(images), batch_size):
+            raw_predictions.extend(self._raw_predict_batch(images[i:i+batch_size]))
+        return raw_predictions
+
+    def predict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = 1
+    ) -> DetectionOutput:
+        return postprocess_detection_predictions(
+            input=input,
+            raw_predictions=self._raw_predict_images(input),
+            score_threshold=score_threshold,
+            classification_top_n=classification_top_n,
+            class_names=self.class_names,
+            postprocessing=self.model_spec.postprocessing
+        )
+
+    def preprocess_input(self, input: DetectionInput):
+        return input
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        return tuple(self.model_spec.input_size)
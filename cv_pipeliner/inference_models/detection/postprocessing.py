@@ -0,0 +1,198 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Literal, Tuple, Union
+
+import numpy as np
+import fsspec
+
+from cv_pipeliner.inference_models.detection.core import DetectionInput, DetectionOutput
+from cv_pipeliner.utils.images import denormalize_bboxes
+
+
+@dataclass
+class DetectionPostprocessing:
+    '''
+    Postprocessing of detection backends after the score filtering and the removal of repeated bboxes.
+    With nms_iou_threshold bboxes are suppressed by NMS ("hard") or their scores are decayed by soft-NMS
+    ("linear" or "gaussian" with soft_nms_sigma), the suppression is made only between bboxes of the same class
+    unless class_agnostic. At most max_detections bboxes with the highest scores are kept.
+    '''
+    nms_iou_threshold: float = None
+    nms_method: Literal["hard", "linear", "gaussian"] = "hard"
+    soft_nms_sigma: float = 0.5
+    class_agnostic: bool = False
+    max_detections: int = None
+
+    def __post_init__(self):
+        if self.nms_method not in ["hard", "linear", "gaussian"]:
+            raise ValueError("nms_method can be hard, linear or gaussian.")
+
+
+def get_ious(
+    bbox: np.ndarray,
+    bboxes: np.ndarray
+) -> np.ndarray:
+    '''
+    IoU of bbox with every of bboxes (xmin, ymin, xmax, ymax).
+    '''
+    bbox, bboxes = np.asarray(bbox, dtype=np.float64), np.asarray(bboxes, dtype=np.float64)
+    intersection_width = np.maximum(0., np.minimum(bbox[2], bboxes[:, 2]) - np.maximum(bbox[0], bboxes[:, 0]))
+    intersection_height = np.maximum(0., np.minimum(bbox[3], bboxes[:, 3]) - np.maximum(bbox[1], bboxes[:, 1]))
+    intersection = intersection_width * intersection_height
+    bbox_area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    bboxes_areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+    return intersection / np.maximum(bbox_area + bboxes_areas - intersection, 1e-9)
+
+
+def non_max_suppression(
+    bboxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float,
+    classes: np.ndarray = None,
+    method: Literal["hard", "linear", "gaussian"] = "hard",
+    sigma: float = 0.5,
+    score_threshold: float = 0.,
+    max_detections: int = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Greedy NMS / soft-NMS: the bbox with the highest score is kept, overlaps of the rest bboxes with it are
+    counted at once and their scores are decayed: to 0 if IoU > iou_threshold ("hard"), by (1 - IoU)
+    if IoU > iou_threshold ("linear") or by exp(-IoU^2 / sigma) ("gaussian"). Bboxes with scores not higher
+    than score_threshold are dropped. If classes are given, only bboxes of the same class suppress each other.
+
+    Returns indexes of kept bboxes sorted by their scores and the scores after the decay.
+    '''
+    scores = np.array(scores, dtype=np.float64)
+    idxs = np.where(scores > score_threshold)[0]
+    keep_idxs = []
+    while len(idxs) > 0 and (max_detections is None or len(keep_idxs) < max_detections):
+        top = np.argmax(scores[idxs])
+        idx = idxs[top]
+        keep_idxs.append(idx)
+        idxs = np.delete(idxs, top)
+        ious = get_ious(bboxes[idx], bboxes[idxs])
+        if classes is not None:
+            ious[classes[idxs] != classes[idx]] = 0.
+        if method == "hard":
+            decay = np.where(ious > iou_threshold, 0., 1.)
+        elif method == "linear":
+            decay = np.where(ious > iou_threshold, 1. - ious, 1.)
+        elif method == "gaussian":
+            decay = np.exp(-(ious ** 2) / sigma)
+        else:
+            raise ValueError("method can be hard, linear or gaussian.")
+        scores[idxs] *= decay
+        idxs = idxs[scores[idxs] > score_threshold]
+    keep_idxs = np.array(keep_idxs, dtype=np.int64)
+    return keep_idxs, scores[keep_idxs]
+
+
+def postprocess_detection_prediction(
+    raw_bboxes: np.ndarray,
+    raw_scores: np.ndarray,
+    raw_classes: np.ndarray,
+    score_threshold: float,
+    height: int,
+    width: int,
+    classification_top_n: int,
+    class_names: np.ndarray = None,
+    class_names_coef: int = -1,
+    postprocessing: DetectionPostprocessing = None
+) -> Tuple[List[Tuple[int, int, int, int]], List[float], List[List[str]], List[List[float]]]:
+    '''
+    Postprocessing of the prediction of one image shared by detection backends:
+    raw_bboxes are normalized (xmin, ymin, xmax, ymax), bboxes with scores lower than score_threshold,
+    empty and repeated bboxes are removed, then postprocessing is applied (see DetectionPostprocessing).
+    Classes are converted to class_names[class + class_names_coef].
+    '''
+    raw_bboxes = denormalize_bboxes(np.asarray(raw_bboxes).reshape(-1, 4), width, height)
+    mask = raw_scores > score_threshold
+    bboxes = raw_bboxes[mask]
+    scores = raw_scores[mask]
+    classes = raw_classes[mask]
+
+    # the first of repeated bboxes is kept
+    correct_mask = (bboxes[:, 2] - bboxes[:, 0] > 0) & (bboxes[:, 3] - bboxes[:, 1] > 0)
+    correct_idxs = np.where(correct_mask)[0]
+    _, first_idxs = np.unique(bboxes[correct_idxs].reshape(-1, 4), axis=0, return_index=True)
+    correct_non_repeated_bboxes_idxs = correct_idxs[np.sort(first_idxs)]
+
+    bboxes = bboxes[correct_non_repeated_bboxes_idxs]
+    scores = scores[correct_non_repeated_bboxes_idxs]
+    classes = classes[correct_non_repeated_bboxes_idxs]
+    if postprocessing is not None:
+        if postprocessing.nms_iou_threshold is not None:
+            keep_idxs, scores = non_max_suppression(
+                bboxes=bboxes,
+                scores=scores,
+                iou_threshold=postprocessing.nms_iou_threshold,
+                classes=classes if not postprocessing.class_agnostic else None,
+                method=postprocessing.nms_method,
+                sigma=postprocessing.soft_nms_sigma,
+                score_threshold=score_threshold,
+                max_detections=postprocessing.max_detections
+            )
+        else:
+            keep_idxs = np.argsort(-scores, kind='stable')[:postprocessing.max_detections]
+            scores = scores[keep_idxs]
+        bboxes = bboxes[keep_idxs]
+        classes = classes[keep_idxs]
+
+    # top_n arrays are read-only views
+    n_bboxes = len(classes)
+    if class_names is not None:
+        class_names = np.asarray(class_names)[classes.astype(np.int32) + class_names_coef]
+        class_names_top_n = np.broadcast_to(class_names[:, None], (n_bboxes, classification_top_n))
+    else:
+        class_names_top_n = np.broadcast_to(np.array(None, dtype=object), (n_bboxes, classification_top_n))
+    classes_scores_top_n = np.broadcast_to(scores[:, None], (n_bboxes, classification_top_n))
+
+    return bboxes, scores, class_names_top_n, classes_scores_top_n
+
+
+def load_class_names(class_names: Union[None, List[str], str, Path]) -> np.ndarray:
+    '''
+    Class names of detection model specs: the list or the path to json with the list (None is kept).
+    '''
+    if class_names is None:
+        return None
+    if isinstance(class_names, str) or isinstance(class_names, Path):
+        with fsspec.open(class_names, 'r', encoding='utf-8') as out:
+            return np.array(json.load(out))
+    return np.array(class_names)
+
+
+def postprocess_detection_predictions(
+    input: DetectionInput,
+    raw_predictions: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    score_threshold: float,
+    classification_top_n: int,
+    class_names: np.ndarray = None,
+    class_names_coef: int = -1,
+    postprocessing: DetectionPostprocessing = None
+) -> DetectionOutput:
+    '''
+    postprocess_detection_prediction for every image of the input and its raw (bboxes, scores, classes).
+    '''
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k = [], [], [], []
+    for image, (raw_bboxes, raw_scores, raw_classes) in zip(input, raw_predictions):
+        height, width = image.shape[:2]
+        bboxes, scores, class_names_top_k, classes_scores_top_k = postprocess_detection_prediction(
+            raw_bboxes=raw_bboxes,
+            raw_scores=raw_scores,
+            raw_classes=raw_classes,
+            score_threshold=score_threshold,
+            height=height,
+            width=width,
+            classification_top_n=classification_top_n,
+            class_names=class_names,
+            class_names_coef=class_names_coef,
+            postprocessing=postprocessing
+        )
+        n_pred_bboxes.append(bboxes)
+        n_pred_scores.append(scores)
+        n_pred_class_names_top_k.append(class_names_top_k)
+        n_pred_scores_top_k.append(classes_scores_top_k)
+
+    return n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k
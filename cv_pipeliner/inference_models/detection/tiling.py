@@ -0,0 +1,228 @@
+from dataclasses import dataclass
+from typing import List, Tuple, Type, Union
+
+import numpy as np
+
+from cv_pipeliner.inference_models.detection.core import (
+    DetectionModelSpec, DetectionModel, DetectionInput, DetectionOutput
+)
+
+
+@dataclass
+class Tiling_DetectionModelSpec(DetectionModelSpec):
+    '''
+    Sliced inference of detection_model_spec for large images with small objects: the image is cut
+    to tiles of tile_size (height, width) overlapping by tile_overlap (the fraction of tile_size),
+    tiles of all images are predicted in batches of batch_size, bboxes are moved to the image coordinates
+    and bboxes of the same object found on neighbouring tiles are merged (see merge_tiles_bboxes).
+    With include_full_image the whole image is predicted too (for objects larger than tiles).
+    '''
+    detection_model_spec: DetectionModelSpec
+    tile_size: Union[Tuple[int, int], List[int]] = (640, 640)
+    tile_overlap: float = 0.2
+    batch_size: int = 8
+    merge_threshold: float = 0.5
+    class_agnostic_merge: bool = False
+    include_full_image: bool = False
+
+    @property
+    def inference_model_cls(self) -> Type['Tiling_DetectionModel']:
+        from cv_pipeliner.inference_models.detection.tiling import Tiling_DetectionModel
+        return Tiling_DetectionModel
+
+
+def _get_tiles_starts(length: int, tile_length: int, stride: int) -> np.ndarray:
+    if length <= tile_length:
+        return np.array([0])
+    # the last tile is aligned to the end of the image
+    return np.append(np.arange(0, length - tile_length, stride), length - tile_length)
+
+
+def get_tiles(
+    height: int,
+    width: int,
+    tile_size: Tuple[int, int],
+    tile_overlap: float
+) -> np.ndarray:
+    '''
+    Tiles (xmin, ymin, xmax, ymax) covering the image row by row, tiles are cut by the image borders.
+    '''
+    assert 0 <= tile_overlap < 1
+    tile_height, tile_width = tile_size
+    tiles_ymins = _get_tiles_starts(height, tile_height, max(int(tile_height * (1 - tile_overlap)), 1))
+    tiles_xmins = _get_tiles_starts(width, tile_width, max(int(tile_width * (1 - tile_overlap)), 1))
+    ymins, xmins = np.meshgrid(tiles_ymins, tiles_xmins, indexing='ij')
+    ymins, xmins = ymins.reshape(-1), xmins.reshape(-1)
+    return np.stack(
+        [xmins, ymins, np.minimum(xmins + tile_width, width), np.minimum(ymins + tile_height, height)],
+        axis=1
+    )
+
+
+def merge_tiles_bboxes(
+    bboxes: np.ndarray,
+    scores: np.ndarray,
+    tiles_idxs: np.ndarray,
+    merge_threshold: float,
+    classes: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Greedy merge of bboxes predicted on overlapping tiles: the bbox with the highest score absorbs bboxes
+    of other tiles whose intersection over the smaller area with it is higher than merge_threshold
+    (a part of the object cut by the tile border lies inside the whole object). The merged bbox is their union
+    and it absorbs the rest parts of the object until nothing is matched. Bboxes of one tile are not merged
+    with each other. If classes are given, only bboxes of the same class are merged.
+
+    Returns indexes of kept bboxes sorted by their scores and merged bboxes.
+    '''
+    bboxes = np.asarray(bboxes).reshape(-1, 4)
+    areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+    idxs = np.argsort(-np.asarray(scores), kind='stable')
+    keep_idxs, merged_bboxes = [], []
+    while len(idxs) > 0:
+        idx, idxs = idxs[0], idxs[1:]
+        merged_bbox, merged_tiles_idxs = bboxes[idx], [tiles_idxs[idx]]
+        if classes is not None:
+            candidates_idxs = idxs[classes[idxs] == classes[idx]]
+        else:
+            candidates_idxs = idxs
+        while len(candidates_idxs) > 0:
+            candidates_bboxes = bboxes[candidates_idxs]
+            xmin, ymin, xmax, ymax = merged_bbox
+            intersection_width = np.maximum(
+                0, np.minimum(xmax, candidates_bboxes[:, 2]) - np.maximum(xmin, candidates_bboxes[:, 0])
+            )
+            intersection_height = np.maximum(
+                0, np.minimum(ymax, candidates_bboxes[:, 3]) - np.maximum(ymin, candidates_bboxes[:, 1])
+            )
+            merged_area = (xmax - xmin) * (ymax - ymin)
+            intersection_over_smaller = intersection_width * intersection_height / np.maximum(
+                np.minimum(merged_area, areas[candidates_idxs]), 1e-9
+            )
+            matched = (
+                (intersection_over_smaller > merge_threshold)
+                & ~np.isin(tiles_idxs[candidates_idxs], merged_tiles_idxs)
+            )
+            if not matched.any():
+                break
+            matched_bboxes = np.concatenate([merged_bbox[None, :], candidates_bboxes[matched]], axis=0)
+            merged_bbox = np.concatenate([matched_bboxes[:, :2].min(axis=0), matched_bboxes[:, 2:].max(axis=0)])
+            merged_tiles_idxs.extend(tiles_idxs[candidates_idxs[matched]])
+            idxs = np.setdiff1d(idxs, candidates_idxs[matched], assume_unique=True)
+            candidates_idxs = candidates_idxs[~matched]
+        keep_idxs.append(idx)
+        merged_bboxes.append(merged_bbox)
+
+    return np.array(keep_idxs, dtype=np.int64), np.array(merged_bboxes, dtype=bboxes.dtype).reshape(-1, 4)
+
+
+class Tiling_DetectionModel(DetectionModel):
+    def __init__(self, model_spec: Tiling_DetectionModelSpec):
+        super().__init__(model_spec)
+        self.detection_model = model_spec.detection_model_spec.load()
+
+    def _predict_tiles(
+        self,
+        tiles_images: List[np.ndarray],
+        score_threshold: float,
+        classification_top_n: int
+    ) -> DetectionOutput:
+        n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k = [], [], [], []
+        batch_size = self.model_spec.batch_size
+        for i in range(0, len(tiles_images), batch_size):
+            (
+                n_pred_bboxes_batch, n_pred_scores_batch, n_pred_class_names_top_k_batch, n_pred_scores_top_k_batch
+            ) = self.detection_model.predict(
+                input=self.detection_model.preprocess_input(tiles_images[i:i+batch_size]),
+                score_threshold=score_threshold,
+                classification_top_n=classification_top_n
+            )
+            n_pred_bboxes.extend(n_pred_bboxes_batch)
+            n_pred_scores.extend(n_pred_scores_batch)
+            if n_pred_class_names_top_k_batch is not None:
+                n_pred_class_names_top_k.extend(n_pred_class_names_top_k_batch)
+                n_pred_scores_top_k.extend(n_pred_scores_top_k_batch)
+        if len(n_pred_class_names_top_k) != len(n_pred_bboxes):
+            n_pred_class_names_top_k, n_pred_scores_top_k = None, None
+
+        return n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k
+
+    def predict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = 1
+    ) -> DetectionOutput:
+        images_tiles = [
+            get_tiles(*image.shape[:2], self.model_spec.tile_size, self.model_spec.tile_overlap) for image in input
+        ]
+        if self.model_spec.include_full_image:
+            images_tiles = [
+                np.concatenate([tiles, [[0, 0, image.shape[1], image.shape[0]]]], axis=0)
+                for image, tiles in zip(input, images_tiles)
+            ]
+        tiles_images = [
+            image[ymin:ymax, xmin:xmax]
+            for image, tiles in zip(input, images_tiles)
+            for xmin, ymin, xmax, ymax in tiles
+        ]
+        (
+            n_tiles_pred_bboxes, n_tiles_pred_scores, n_tiles_pred_class_names_top_k, n_tiles_pred_scores_top_k
+        ) = self._predict_tiles(tiles_images, score_threshold, classification_top_n)
+
+        n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k = [], [], [], []
+        tile_idx = 0
+        for tiles in images_tiles:
+            image_tiles_slice = slice(tile_idx, tile_idx + len(tiles))
+            tile_idx += len(tiles)
+            tiles_pred_bboxes = [
+                np.asarray(pred_bboxes, dtype=np.int64).reshape(-1, 4)
+                for pred_bboxes in n_tiles_pred_bboxes[image_tiles_slice]
+            ]
+            # bboxes of all tiles are moved to the image coordinates at once
+            tiles_n_bboxes = [len(pred_bboxes) for pred_bboxes in tiles_pred_bboxes]
+            tiles_idxs = np.repeat(np.arange(len(tiles)), tiles_n_bboxes)
+            bboxes = np.concatenate(tiles_pred_bboxes, axis=0) + np.tile(tiles[tiles_idxs, :2], 2)
+            scores = np.concatenate([
+                np.asarray(pred_scores, dtype=np.float64).reshape(-1)
+                for pred_scores in n_tiles_pred_scores[image_tiles_slice]
+            ])
+            if n_tiles_pred_class_names_top_k is not None:
+                class_names_top_k = [
+                    pred_class_names_top_k
+                    for tile_pred_class_names_top_k in n_tiles_pred_class_names_top_k[image_tiles_slice]
+                    for pred_class_names_top_k in tile_pred_class_names_top_k
+                ]
+                scores_top_k = [
+                    pred_scores_top_k
+                    for tile_pred_scores_top_k in n_tiles_pred_scores_top_k[image_tiles_slice]
+                    for pred_scores_top_k in tile_pred_scores_top_k
+                ]
+                classes = np.array([pred_class_names_top_k[0] for pred_class_names_top_k in class_names_top_k])
+            else:
+                classes = None
+
+            keep_idxs, bboxes = merge_tiles_bboxes(
+                bboxes=bboxes,
+                scores=scores,
+                tiles_idxs=tiles_idxs,
+                merge_threshold=self.model_spec.merge_threshold,
+                classes=classes if not self.model_spec.class_agnostic_merge else None
+            )
+            n_pred_bboxes.append(bboxes)
+            n_pred_scores.append(scores[keep_idxs])
+            if n_tiles_pred_class_names_top_k is not None:
+                n_pred_class_names_top_k.append([class_names_top_k[idx] for idx in keep_idxs])
+                n_pred_scores_top_k.append([scores_top_k[idx] for idx in keep_idxs])
+
+        if n_tiles_pred_class_names_top_k is None:
+            n_pred_class_names_top_k, n_pred_scores_top_k = None, None
+
+        return n_pred_bboxes, n_pred_scores, n_pred_class_names_top_k, n_pred_scores_top_k
+
+    def preprocess_input(self, input: DetectionInput):
+        return input
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        return (None, None)
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Tuple, Type, Union
 from dataclasses import dataclass
 import numpy as np
@@ -134,6 +135,62 @@ class PipelineModel(InferenceModel):
             n_pred_classification_scores_top_n
         )
 
+    async def apredict(
+        self,
+        input: PipelineInput,
+        detection_score_threshold: float,
+        classification_top_n: int = 1,
+        classification_batch_size: int = 16
+    ) -> PipelineOutput:
+        '''
+        Async variant of predict: classification batches of all images are predicted concurrently
+        (see apredict of the models).
+        '''
+        detection_input = self.detection_model.preprocess_input(input)
+        (
+            n_pred_bboxes, n_pred_detection_scores,
+            n_pred_class_names_top_k, n_pred_classification_scores_top_k
+        ) = await self.detection_model.apredict(
+            detection_input,
+            score_threshold=detection_score_threshold,
+            classification_top_n=classification_top_n
+        )
+        if self.classification_model is None:
+            # Detector is the pipeline itself
+            return (
+                n_pred_bboxes,
+                n_pred_detection_scores,
+                n_pred_class_names_top_k,
+                n_pred_classification_scores_top_k
+            )
+
+        shapes = [len(pred_bboxes) for pred_bboxes in n_pred_bboxes]
+        classification_coroutines = []
+        for image, pred_bboxes in zip(input, n_pred_bboxes):
+            if len(pred_bboxes) == 0:
+                continue
+            pred_bboxes_batches = np.array_split(pred_bboxes, max(1, len(pred_bboxes) // classification_batch_size))
+            for pred_bboxes_batch in pred_bboxes_batches:
+                pred_cropped_images_batch = cut_bboxes_from_image(image, pred_bboxes_batch)
+                classification_input_batch = self.classification_model.preprocess_input(pred_cropped_images_batch)
+                classification_coroutines.append(
+                    self.classification_model.apredict(input=classification_input_batch, top_n=classification_top_n)
+                )
+        pred_labels_top_n, pred_classification_scores_top_n = [], []
+        for pred_labels_top_n_batch, pred_classification_scores_top_n_batch in await asyncio.gather(
+            *classification_coroutines
+        ):
+            pred_labels_top_n.extend(pred_labels_top_n_batch)
+            pred_classification_scores_top_n.extend(pred_classification_scores_top_n_batch)
+        n_pred_labels_top_n = self._split_chunks(pred_labels_top_n, shapes)
+        n_pred_classification_scores_top_n = self._split_chunks(pred_classification_scores_top_n, shapes)
+        return (
+            n_pred_bboxes,
+            n_pred_detection_scores,
+            n_pred_labels_top_n,
+            n_pred_classification_scores_top_n
+        )
+
     def preprocess_input(self, input):
         return input
 
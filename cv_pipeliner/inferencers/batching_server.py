@@ -0,0 +1,246 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+import numpy as np
+
+from cv_pipeliner.core.data import ImageData
+from cv_pipeliner.inference_models.pipeline import PipelineModel
+from cv_pipeliner.inferencers.pipeline import PipelineInferencer
+from cv_pipeliner.logging import logger
+from cv_pipeliner.utils.streaming import collect_micro_batch
+
+
+@dataclass
+class PipelineBatchingRequest:
+    image_data: ImageData
+    image: np.ndarray
+    detection_score_threshold: float
+    classification_top_n: int
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class PipelineBatchingServerStats:
+    n_submitted: int = 0
+    n_rejected: int = 0
+    n_failed: int = 0
+    n_predicted: int = 0
+    n_batches: int = 0
+    total_latency: float = 0.
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.n_predicted / max(self.n_batches, 1e-6)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / max(self.n_predicted, 1e-6)
+
+
+class PipelineBatchingServer:
+    '''
+    Dynamic micro-batching of single-image requests to one PipelineModel.
+
+    Requests of concurrent callers are queued, the worker thread collects the batch until it has max_batch_size
+    images or the oldest request has waited for max_batch_delay seconds, runs PipelineModel.predict on the whole
+    batch and sets the futures of the requests with ImageData (as PipelineInferencer.predict returns).
+    The batch is predicted with the lowest detection_score_threshold and the highest classification_top_n
+    of its requests, then predictions are filtered for every request.
+
+    Requests are accepted only while the server is started (see start/stop or the context manager).
+    '''
+    def __init__(
+        self,
+        model: PipelineModel,
+        max_batch_size: int = 8,
+        max_batch_delay: float = 0.01,
+        max_queue_size: int = 256,
+        classification_batch_size: int = 16
+    ):
+        assert isinstance(model, PipelineModel)
+        assert max_batch_size > 0 and max_batch_delay >= 0
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.classification_batch_size = classification_batch_size
+
+        self.requests_queue = queue.Queue(maxsize=max_queue_size)
+        self.stats = PipelineBatchingServerStats()
+        self._inferencer = PipelineInferencer(model)
+        self._stats_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._stop_event.set()
+        self._thread = None
+
+    def __enter__(self) -> 'PipelineBatchingServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='pipeline_batching_server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Stops the worker after already collected batch. Futures of not predicted requests are cancelled.
+        '''
+        if self._thread is None:
+            return
+        with self._submit_lock:
+            self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        while True:
+            try:
+                request = self.requests_queue.get_nowait()
+            except queue.Empty:
+                break
+            request.future.cancel()
+
+    def submit(
+        self,
+        image: Union[np.ndarray, ImageData],
+        detection_score_threshold: float,
+        classification_top_n: int = 1
+    ) -> Optional[Future]:
+        '''
+        Adds the image to the queue without blocking, returns the future of ImageData
+        or None if the queue is full or the server is not started. Images of ImageData are opened
+        in the calling thread.
+        '''
+        image_data = image if isinstance(image, ImageData) else ImageData(image=image)
+        request = PipelineBatchingRequest(
+            image_data=image_data,
+            image=image_data.open_image(),
+            detection_score_threshold=detection_score_threshold,
+            classification_top_n=classification_top_n
+        )
+        # the stop event is checked under the lock, so no request is queued after stop drains the queue
+        with self._submit_lock:
+            is_accepted = not self._stop_event.is_set()
+            if is_accepted:
+                try:
+                    self.requests_queue.put_nowait(request)
+                except queue.Full:
+                    is_accepted = False
+        with self._stats_lock:
+            if not is_accepted:
+                self.stats.n_rejected += 1
+                return None
+            self.stats.n_submitted += 1
+        return request.future
+
+    def predict(
+        self,
+        image: Union[np.ndarray, ImageData],
+        detection_score_threshold: float,
+        classification_top_n: int = 1,
+        timeout: float = None
+    ) -> Optional[ImageData]:
+        '''
+        Blocking variant of submit. Returns None if the queue is full or the server is not started.
+        '''
+        future = self.submit(image, detection_score_threshold, classification_top_n)
+        if future is None:
+            return None
+        return future.result(timeout=timeout)
+
+    async def apredict(
+        self,
+        image: Union[np.ndarray, ImageData],
+        detection_score_threshold: float,
+        classification_top_n: int = 1
+    ) -> Optional[ImageData]:
+        '''
+        Async variant of predict.
+        '''
+        future = self.submit(image, detection_score_threshold, classification_top_n)
+        if future is None:
+            return None
+        return await asyncio.wrap_future(future)
+
+    def _collect_batch(self) -> List[PipelineBatchingRequest]:
+        return collect_micro_batch(
+            queue_=self.requests_queue,
+            stop_event=self._stop_event,
+            max_batch_size=self.max_batch_size,
+            max_batch_delay=self.max_batch_delay
+        )
+
+    def _predict_batch(self, batch: List[PipelineBatchingRequest]) -> List[ImageData]:
+        detection_score_threshold = min(request.detection_score_threshold for request in batch)
+        classification_top_n = max(request.classification_top_n for request in batch)
+        input = self.model.preprocess_input([request.image for request in batch])
+        (
+            n_pred_bboxes,
+            n_pred_detection_scores,
+            n_pred_labels_top_n,
+            n_pred_classification_scores_top_n
+        ) = self.model.predict(
+            input=input,
+            detection_score_threshold=detection_score_threshold,
+            classification_top_n=classification_top_n,
+            classification_batch_size=self.classification_batch_size
+        )
+        # predictions of the batch are filtered by the arguments of every request
+        n_pred_bboxes, n_pred_detection_scores = list(n_pred_bboxes), list(n_pred_detection_scores)
+        n_pred_labels_top_n = list(n_pred_labels_top_n)
+        n_pred_classification_scores_top_n = list(n_pred_classification_scores_top_n)
+        for idx, request in enumerate(batch):
+            if request.detection_score_threshold > detection_score_threshold:
+                keep = np.array(n_pred_detection_scores[idx], dtype=float) > request.detection_score_threshold
+            else:
+                keep = np.ones(len(n_pred_bboxes[idx]), dtype=bool)
+            idxs, top_n = np.where(keep)[0], request.classification_top_n
+            n_pred_bboxes[idx] = [n_pred_bboxes[idx][i] for i in idxs]
+            n_pred_detection_scores[idx] = [n_pred_detection_scores[idx][i] for i in idxs]
+            n_pred_labels_top_n[idx] = [n_pred_labels_top_n[idx][i][:top_n] for i in idxs]
+            n_pred_classification_scores_top_n[idx] = [n_pred_classification_scores_top_n[idx][i][:top_n] for i in idxs]
+        return self._inferencer._postprocess_predictions(
+            images_data=[request.image_data for request in batch],
+            n_pred_bboxes=n_pred_bboxes,
+            n_pred_detection_scores=n_pred_detection_scores,
+            n_pred_labels_top_n=n_pred_labels_top_n,
+            n_pred_classification_scores_top_n=n_pred_classification_scores_top_n,
+            open_images_in_images_data=False,
+            open_cropped_images_in_bboxes_data=False
+        )
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            # requests cancelled by callers are not predicted
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                pred_images_data = self._predict_batch(batch)
+            except Exception as e:
+                logger.exception("PipelineBatchingServer: failed to predict the batch")
+                for request in batch:
+                    request.future.set_exception(e)
+                with self._stats_lock:
+                    self.stats.n_failed += len(batch)
+                continue
+            finished_at = time.perf_counter()
+            for request, pred_image_data in zip(batch, pred_images_data):
+                request.future.set_result(pred_image_data)
+            with self._stats_lock:
+                self.stats.n_predicted += len(batch)
+                self.stats.n_batches += 1
+                self.stats.total_latency += sum(finished_at - request.submitted_at for request in batch)
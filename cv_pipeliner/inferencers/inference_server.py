@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, List
+
+from aiohttp import web
+
+from cv_pipeliner.inference_models.pipeline import PipelineModelSpec
+from cv_pipeliner.inferencers.batching_server import PipelineBatchingServer
+from cv_pipeliner.utils.images import open_image
+from cv_pipeliner.logging import logger
+
+
+@dataclass
+class ServedPipelineModel:
+    model_index: str
+    model_spec: PipelineModelSpec
+    description: str = ''
+    detection_score_threshold: float = 0.3
+
+
+class InferenceServer:
+    '''
+    HTTP inference server of PipelineModels (aiohttp).
+
+    Every served model is loaded once at startup (in the background thread) and stays resident, requests
+    to one model are micro-batched by its PipelineBatchingServer. Endpoints:
+        GET /health — the server is alive;
+        GET /ready — 200 when all models are loaded, 503 otherwise;
+        GET /models — served models;
+        POST /predict?model_index=...&detection_score_threshold=...&classification_top_n=... with the image
+        (multipart field "image" or the raw body) — ImageData.asdict() of predictions. The first served model
+        is used by default, 429 is returned when the queue of the model is full.
+    '''
+    def __init__(
+        self,
+        served_models: List[ServedPipelineModel],
+        max_batch_size: int = 8,
+        max_batch_delay: float = 0.01,
+        max_queue_size: int = 256,
+        classification_batch_size: int = 16
+    ):
+        assert len(served_models) > 0
+        models_indexes = [served_model.model_index for served_model in served_models]
+        assert len(set(models_indexes)) == len(models_indexes), f"Models indexes must be different: {models_indexes}"
+        self.served_models = {served_model.model_index: served_model for served_model in served_models}
+        self.default_model_index = models_indexes[0]
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_queue_size = max_queue_size
+        self.classification_batch_size = classification_batch_size
+
+        self.batching_servers: Dict[str, PipelineBatchingServer] = {}
+        self.load_error = None
+        self._load_thread = None
+
+    @property
+    def is_ready(self) -> bool:
+        return len(self.batching_servers) == len(self.served_models)
+
+    def load_models(self):
+        '''
+        Loads served models one by one, a model becomes available as soon as it is loaded.
+        '''
+        for model_index, served_model in self.served_models.items():
+            if model_index in self.batching_servers:
+                continue
+            logger.info(f"InferenceServer: loading model '{model_index}'...")
+            try:
+                pipeline_model = served_model.model_spec.load()
+            except Exception as e:
+                logger.exception(f"InferenceServer: failed to load model '{model_index}'")
+                self.load_error = f"Failed to load model '{model_index}': {e!r}"
+                return
+            batching_server = PipelineBatchingServer(
+                model=pipeline_model,
+                max_batch_size=self.max_batch_size,
+                max_batch_delay=self.max_batch_delay,
+                max_queue_size=self.max_queue_size,
+                classification_batch_size=self.classification_batch_size
+            )
+            batching_server.start()
+            # the dict is only extended, so handlers never see partially loaded models
+            self.batching_servers[model_index] = batching_server
+            logger.info(f"InferenceServer: model '{model_index}' is loaded.")
+
+    def stop(self):
+        if self._load_thread is not None:
+            self._load_thread.join()
+            self._load_thread = None
+        for batching_server in self.batching_servers.values():
+            batching_server.stop()
+
+    async def _on_startup(self, app: web.Application):
+        self._load_thread = threading.Thread(target=self.load_models, name='inference_server_loader', daemon=True)
+        self._load_thread.start()
+
+    async def _on_cleanup(self, app: web.Application):
+        await asyncio.get_running_loop().run_in_executor(None, self.stop)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({'success': True})
+
+    async def ready(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                'success': self.is_ready,
+                'loaded_models': list(self.batching_servers),
+                'error': self.load_error
+            },
+            status=200 if self.is_ready else 503
+        )
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'default_model_index': self.default_model_index,
+            'models': [
+                {
+                    'model_index': served_model.model_index,
+                    'description': served_model.description,
+                    'detection_score_threshold': served_model.detection_score_threshold,
+                    'loaded': served_model.model_index in self.batching_servers
+                }
+                for served_model in self.served_models.values()
+            ]
+        })
+
+    async def predict(self, request: web.Request) -> web.Response:
+        model_index = request.query.get('model_index', self.default_model_index)
+        if model_index not in self.served_models:
+            return web.json_response(
+                {'success': False, 'message': f"Model with index '{model_index}' is not served."}, status=404
+            )
+        if model_index not in self.batching_servers:
+            return web.json_response(
+                {'success': False, 'message': f"Model with index '{model_index}' is not loaded yet."}, status=503
+            )
+        try:
+            detection_score_threshold = float(request.query.get(
+                'detection_score_threshold', self.served_models[model_index].detection_score_threshold
+            ))
+            classification_top_n = int(request.query.get('classification_top_n', 1))
+        except ValueError as e:
+            return web.json_response({'success': False, 'message': str(e)}, status=400)
+
+        if request.content_type.startswith('multipart/'):
+            image_field = (await request.post()).get('image')
+            image_bytes = image_field.file.read() if isinstance(image_field, web.FileField) else None
+        else:
+            image_bytes = await request.read()
+        if not image_bytes:
+            return web.json_response({'success': False, 'message': 'Image is missing.'}, status=400)
+        try:
+            image = await asyncio.get_running_loop().run_in_executor(None, open_image, image_bytes, True)
+        except Exception as e:
+            return web.json_response({'success': False, 'message': f"Failed to decode the image: {e}"}, status=400)
+
+        pred_image_data = await self.batching_servers[model_index].apredict(
+            image,
+            detection_score_threshold=detection_score_threshold,
+            classification_top_n=classification_top_n
+        )
+        if pred_image_data is None:
+            return web.json_response({'success': False, 'message': 'Server is overloaded.'}, status=429)
+        return web.json_response(pred_image_data.asdict())
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.add_routes([
+            web.get('/health', self.health),
+            web.get('/ready', self.ready),
+            web.get('/models', self.models),
+            web.post('/predict', self.predict)
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    def run(self, host: str = '0.0.0.0', port: int = 5000):
+        web.run_app(self.make_app(), host=host, port=port)
@@ -4,8 +4,6 @@ import os
 from pathlib import Path
 from datetime import datetime
 
-from tensorflow import get_logger as tf_get_logger
-
 LOGS_DIRECTORY = Path(__file__).parent / '__logs__'
 
 logger = logging.getLogger('cv-pipeliner')
@@ -30,6 +28,8 @@ if os.environ.get('CV_PIPELINER_LOGGING', False):
     logger.addHandler(stream_handler)
     logger.propagate = False
 
+    # TensorFlow is imported only for its logger, so backends without TensorFlow don't import it
+    from tensorflow import get_logger as tf_get_logger
     tf_logger = tf_get_logger()
     tf_logger.addHandler(file_handler)
     tf_logger.propagate = False
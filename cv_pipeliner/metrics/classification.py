@@ -2,7 +2,7 @@ from typing import List, Dict, Tuple
 
 import pandas as pd
 import numpy as np
-from sklearn.metrics import multilabel_confusion_matrix
+from scipy.sparse import coo_matrix
 
 from cv_pipeliner.core.data import BboxData
 
@@ -164,8 +164,10 @@ def get_mean_expected_steps(
     ):
         idxs_by_label = (pred_labels_top_n == label)
         pred_scores_top_n_by_label = pred_scores_top_n[idxs_by_label]
-        idxs_sorted = np.argsort((-1) * pred_scores_top_n_by_label)
-        true_labels_sorted = true_labels[idxs_sorted]
+        # rows of bboxes with the label in their top_n: positions in the filtered scores are not rows
+        rows_by_label = np.where(idxs_by_label)[0]
+        idxs_sorted = np.argsort((-1) * pred_scores_top_n_by_label, kind='stable')
+        true_labels_sorted = true_labels[rows_by_label[idxs_sorted]]
         steps = np.where(label == true_labels_sorted)[0]
         nth_step_penalty = step_penalty if len(np.where(label == true_labels)[0]) > 0 else None
         steps = min(step_penalty, np.min(steps) + 1) if len(steps) > 0 else nth_step_penalty
@@ -175,6 +177,217 @@ def get_mean_expected_steps(
     return mean_expected_steps
 
 
+def get_labels_ids(
+    labels: np.ndarray,
+    class_names: List[str]
+) -> np.ndarray:
+    '''
+    Encodes labels (of any shape) to ids of class_names. Labels not from class_names get id -1.
+    '''
+    labels = np.array(labels, dtype=object)
+    labels_ids = pd.Categorical(labels.ravel(), categories=class_names).codes.astype(np.int64)
+    return labels_ids.reshape(labels.shape)
+
+
+def get_precisions_and_recalls_top_n(
+    true_labels_ids: np.ndarray,
+    pred_labels_ids_top_n: np.ndarray,
+    n_classes: int,
+    top_n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Vectorized version of get_precision_and_recall_top_n for all classes at once.
+
+    true_labels_ids has shape (N,), pred_labels_ids_top_n has shape (N, top_n') with top_n' >= top_n.
+    Returns precisions@top_n and recalls@top_n with shape (n_classes,).
+    '''
+    true_labels_ids = np.asarray(true_labels_ids, dtype=np.int64)
+    pred_labels_ids_top_n = np.asarray(pred_labels_ids_top_n, dtype=np.int64).reshape(len(true_labels_ids), -1)
+    pred_labels_ids_top_n = pred_labels_ids_top_n[:, :top_n]
+
+    # Every label is recommended once per bbox even if it is repeated in labels_top_n
+    pred_labels_ids_top_n_sorted = np.sort(pred_labels_ids_top_n, axis=1)
+    is_recommended = np.ones(pred_labels_ids_top_n_sorted.shape, dtype=bool)
+    is_recommended[:, 1:] = pred_labels_ids_top_n_sorted[:, 1:] != pred_labels_ids_top_n_sorted[:, :-1]
+    is_recommended &= (pred_labels_ids_top_n_sorted >= 0)
+    recommended_items = np.bincount(
+        pred_labels_ids_top_n_sorted[is_recommended], minlength=n_classes
+    )[:n_classes]
+    relevant_items = np.bincount(true_labels_ids[true_labels_ids >= 0], minlength=n_classes)[:n_classes]
+    is_recommended_relevant = (
+        np.any(pred_labels_ids_top_n == true_labels_ids[:, None], axis=1) & (true_labels_ids >= 0)
+    )
+    recommended_relevant_items = np.bincount(
+        true_labels_ids[is_recommended_relevant], minlength=n_classes
+    )[:n_classes]
+
+    precisions_top_n = recommended_relevant_items / np.maximum(recommended_items, 1e-6)
+    recalls_top_n = recommended_relevant_items / np.maximum(relevant_items, 1e-6)
+
+    return precisions_top_n, recalls_top_n
+
+
+def get_mean_expected_steps_by_classes(
+    images_ids: np.ndarray,
+    true_labels_ids: np.ndarray,
+    pred_labels_ids_top_n: np.ndarray,
+    pred_scores_top_n: np.ndarray,
+    n_classes: int,
+    step_penalty: int
+) -> np.ndarray:
+    '''
+    Vectorized version of get_mean_expected_steps for all classes at once.
+
+    Bboxes of all images are flattened: images_ids and true_labels_ids have shape (N,),
+    pred_labels_ids_top_n and pred_scores_top_n have shape (N, top_n).
+    For every image and class from its true labels, the bboxes of the image are sorted by the score of the class,
+    and the step is the position of the first bbox with this true class (capped by step_penalty).
+    Returns mean steps over images with shape (n_classes,), NaN for classes without true bboxes.
+    '''
+    images_ids = np.asarray(images_ids, dtype=np.int64)
+    true_labels_ids = np.asarray(true_labels_ids, dtype=np.int64)
+    pred_labels_ids_top_n = np.asarray(pred_labels_ids_top_n, dtype=np.int64).reshape(len(true_labels_ids), -1)
+    pred_scores_top_n = np.asarray(pred_scores_top_n, dtype=np.float64).reshape(len(true_labels_ids), -1)
+    n_labels_ids = max(n_classes, pred_labels_ids_top_n.max(initial=-1) + 1, true_labels_ids.max(initial=-1) + 1)
+
+    # (image, class) pairs from true labels -- mean is counted over them
+    is_true_known = true_labels_ids >= 0
+    pairs_keys = np.unique(images_ids[is_true_known] * n_labels_ids + true_labels_ids[is_true_known])
+    pairs_steps = np.full(len(pairs_keys), step_penalty, dtype=np.float64)
+
+    # Sort all (bbox, class) entries by (image, class, -score, bbox) and find rank of every entry inside its group
+    rows = np.repeat(np.arange(len(true_labels_ids)), pred_labels_ids_top_n.shape[1])
+    labels_ids = pred_labels_ids_top_n.ravel()
+    scores = pred_scores_top_n.ravel()
+    is_known = labels_ids >= 0
+    rows, labels_ids, scores = rows[is_known], labels_ids[is_known], scores[is_known]
+    idxs_sorted = np.lexsort((rows, -scores, labels_ids, images_ids[rows]))
+    rows, labels_ids = rows[idxs_sorted], labels_ids[idxs_sorted]
+    keys = images_ids[rows] * n_labels_ids + labels_ids
+    is_group_start = np.ones(len(keys), dtype=bool)
+    is_group_start[1:] = keys[1:] != keys[:-1]
+    groups_starts = np.maximum.accumulate(np.where(is_group_start, np.arange(len(keys)), 0))
+    ranks = np.arange(len(keys)) - groups_starts
+
+    is_true_entry = labels_ids == true_labels_ids[rows]
+    np.minimum.at(
+        pairs_steps,
+        np.searchsorted(pairs_keys, keys[is_true_entry]),
+        ranks[is_true_entry] + 1
+    )
+
+    pairs_labels_ids = pairs_keys % n_labels_ids
+    sum_steps = np.bincount(pairs_labels_ids, weights=pairs_steps, minlength=n_labels_ids)[:n_classes]
+    count_steps = np.bincount(pairs_labels_ids, minlength=n_labels_ids)[:n_classes]
+    mean_expected_steps = np.full(n_classes, np.nan)
+    np.divide(sum_steps, count_steps, out=mean_expected_steps, where=count_steps > 0)
+    return mean_expected_steps
+
+
+def get_sparse_confusion_matrix(
+    true_labels_ids: np.ndarray,
+    pred_labels_ids: np.ndarray,
+    n_classes: int
+) -> coo_matrix:
+    '''
+    Returns confusion matrix with shape (n_classes, n_classes) in COO format: rows are true labels ids,
+    columns are pred labels ids. Only non-zero cells are stored, so memory is O(number of distinct pairs).
+    Pairs with label id -1 (unknown label) are skipped.
+    '''
+    true_labels_ids = np.asarray(true_labels_ids, dtype=np.int64)
+    pred_labels_ids = np.asarray(pred_labels_ids, dtype=np.int64)
+    assert len(true_labels_ids) == len(pred_labels_ids)
+    is_known = (true_labels_ids >= 0) & (pred_labels_ids >= 0)
+    keys, counts = np.unique(
+        true_labels_ids[is_known] * n_classes + pred_labels_ids[is_known],
+        return_counts=True
+    )
+    return coo_matrix(
+        (counts, (keys // n_classes, keys % n_classes)),
+        shape=(n_classes, n_classes)
+    )
+
+
+def get_classes_metrics_from_confusion_matrix(
+    confusion_matrix: coo_matrix
+) -> Dict[str, np.ndarray]:
+    '''
+    Returns per-class support, TP, FP, FN, precision, recall and f1_score (arrays with shape (n_classes,))
+    from the confusion matrix (see get_sparse_confusion_matrix).
+    '''
+    confusion_matrix = coo_matrix(confusion_matrix)
+    n_classes = confusion_matrix.shape[0]
+    rows, cols, counts = confusion_matrix.row, confusion_matrix.col, confusion_matrix.data
+    support = np.bincount(rows, weights=counts, minlength=n_classes).astype(np.int64)
+    n_preds = np.bincount(cols, weights=counts, minlength=n_classes).astype(np.int64)
+    is_diagonal = (rows == cols)
+    TP = np.bincount(rows[is_diagonal], weights=counts[is_diagonal], minlength=n_classes).astype(np.int64)
+    FP = n_preds - TP
+    FN = support - TP
+    precision = TP / np.maximum(TP + FP, 1e-6)
+    recall = TP / np.maximum(TP + FN, 1e-6)
+    f1_score = 2 * precision * recall / np.maximum(precision + recall, 1e-6)
+    return {
+        'support': support,
+        'TP': TP,
+        'FP': FP,
+        'FN': FN,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1_score
+    }
+
+
+df_top_confused_classes_columns = [
+    'true_label', 'pred_label', 'count', 'fraction_of_true_label', 'fraction_of_pred_label'
+]
+
+
+def get_df_top_confused_classes(
+    n_true_bboxes_data: List[List[BboxData]],
+    n_pred_bboxes_data: List[List[BboxData]],
+    top_k: int = 20,
+    confusion_matrix: coo_matrix = None,
+    class_names: List[str] = None
+) -> pd.DataFrame:
+    '''
+    Returns top_k most frequent errors (true_label, pred_label) sorted by count.
+
+    fraction_of_true_label is the part of true bboxes with true_label that are predicted as pred_label,
+    fraction_of_pred_label is the part of bboxes predicted as pred_label that have true_label.
+    Precomputed confusion_matrix with its class_names can be given instead of bboxes data.
+    '''
+    if confusion_matrix is None:
+        true_labels = np.array([bbox_data.label for bboxes_data in n_true_bboxes_data for bbox_data in bboxes_data])
+        pred_labels = np.array([bbox_data.label for bboxes_data in n_pred_bboxes_data for bbox_data in bboxes_data])
+        assert len(true_labels) == len(pred_labels)
+        class_names = np.unique(np.concatenate([true_labels, pred_labels])).tolist()
+        confusion_matrix = get_sparse_confusion_matrix(
+            true_labels_ids=get_labels_ids(true_labels, class_names),
+            pred_labels_ids=get_labels_ids(pred_labels, class_names),
+            n_classes=len(class_names)
+        )
+    assert class_names is not None
+    confusion_matrix = coo_matrix(confusion_matrix)
+    n_classes = confusion_matrix.shape[0]
+    rows, cols, counts = confusion_matrix.row, confusion_matrix.col, confusion_matrix.data
+    support = np.bincount(rows, weights=counts, minlength=n_classes)
+    n_preds = np.bincount(cols, weights=counts, minlength=n_classes)
+    is_error = (rows != cols) & (counts > 0)
+    rows, cols, counts = rows[is_error], cols[is_error], counts[is_error]
+    idxs_top_k = np.lexsort((cols, rows, -counts))[:top_k]
+    rows, cols, counts = rows[idxs_top_k], cols[idxs_top_k], counts[idxs_top_k]
+    class_names = np.array(class_names, dtype=object)
+    df_top_confused_classes = pd.DataFrame({
+        'true_label': class_names[rows],
+        'pred_label': class_names[cols],
+        'count': counts.astype(np.int64),
+        'fraction_of_true_label': counts / np.maximum(support[rows], 1e-6),
+        'fraction_of_pred_label': counts / np.maximum(n_preds[cols], 1e-6)
+    }, columns=df_top_confused_classes_columns)
+    return df_top_confused_classes
+
+
 def get_df_classification_metrics(
     n_true_bboxes_data: List[List[BboxData]],
     n_pred_bboxes_data: List[List[BboxData]],
@@ -191,70 +404,59 @@ def get_df_classification_metrics(
     assert len(true_bboxes_data) == len(pred_bboxes_data)
     true_labels = np.array([bbox_data.label for bbox_data in true_bboxes_data])
     pred_labels = np.array([bbox_data.label for bbox_data in pred_bboxes_data])
-    pred_labels_top_n = np.array([bbox_data.labels_top_n for bbox_data in pred_bboxes_data])
     min_tops_n_from_pred_bboxes_data = min([bbox_data.top_n for bbox_data in pred_bboxes_data])
     assert max(tops_n) <= min_tops_n_from_pred_bboxes_data
-    n_true_labels = [
-        np.array([true_bbox_data.label for true_bbox_data in true_bboxes_data])
-        for true_bboxes_data in n_true_bboxes_data
-    ]
-    n_pred_labels_top_n = [
-        np.array([
-            pred_bbox_data.labels_top_n
-            for pred_bbox_data in pred_bboxes_data
-        ])
-        for pred_bboxes_data in n_pred_bboxes_data
-    ]
-    n_pred_scores_top_n = [
-        np.array([
-            pred_bbox_data.classification_scores_top_n
-            for pred_bbox_data in pred_bboxes_data
-        ])
-        for pred_bboxes_data in n_pred_bboxes_data
-    ]
+    pred_labels_top_n = np.array([
+        bbox_data.labels_top_n[:min_tops_n_from_pred_bboxes_data] for bbox_data in pred_bboxes_data
+    ], dtype=object).reshape(len(pred_bboxes_data), min_tops_n_from_pred_bboxes_data)
+    pred_scores_top_n = np.array([
+        bbox_data.classification_scores_top_n[:min_tops_n_from_pred_bboxes_data] for bbox_data in pred_bboxes_data
+    ], dtype=np.float64).reshape(len(pred_bboxes_data), min_tops_n_from_pred_bboxes_data)
+    images_ids = np.repeat(
+        np.arange(len(n_true_bboxes_data)),
+        [len(true_bboxes_data) for true_bboxes_data in n_true_bboxes_data]
+    )
 
     all_class_names = np.unique(np.concatenate([true_labels, pred_labels])).tolist()
     class_names_without_pseudo_classes = list(set(all_class_names) - set(pseudo_class_names))
-    MMM = multilabel_confusion_matrix(
-        y_true=true_labels,
-        y_pred=pred_labels,
-        labels=all_class_names
+    # Labels from top_n that are not in all_class_names are encoded too (after all_class_names)
+    labels_class_names = all_class_names + sorted(
+        set(pred_labels_top_n.ravel().tolist()) - set(all_class_names), key=str
+    )
+    true_labels_ids = get_labels_ids(true_labels, labels_class_names)
+    pred_labels_ids_top_n = get_labels_ids(pred_labels_top_n, labels_class_names)
+    pred_labels_ids = get_labels_ids(pred_labels, labels_class_names)
+    classes_metrics = get_classes_metrics_from_confusion_matrix(
+        confusion_matrix=get_sparse_confusion_matrix(
+            true_labels_ids=true_labels_ids,
+            pred_labels_ids=pred_labels_ids,
+            n_classes=len(all_class_names)
+        )
     )
+    precisions_top_n, recalls_top_n = {}, {}
+    for top_n in tops_n:
+        if top_n == 1:
+            continue
+        precisions_top_n[top_n], recalls_top_n[top_n] = get_precisions_and_recalls_top_n(
+            true_labels_ids=true_labels_ids,
+            pred_labels_ids_top_n=pred_labels_ids_top_n,
+            n_classes=len(all_class_names),
+            top_n=top_n
+        )
     classification_metrics = {}
     for idx, class_name in enumerate(all_class_names):
-        support_by_class_name = np.sum(true_labels == class_name)
-        TP_by_class_name = MMM[idx, 1, 1]
-        FP_by_class_name = MMM[idx, 0, 1]
-        FN_by_class_name = MMM[idx, 1, 0]
-        precision_by_class_name = TP_by_class_name / max(TP_by_class_name + FP_by_class_name, 1e-6)
-        recall_by_class_name = TP_by_class_name / max(TP_by_class_name + FN_by_class_name, 1e-6)
-        f1_score_by_class_name = 2 * precision_by_class_name * recall_by_class_name / (
-            max(precision_by_class_name + recall_by_class_name, 1e-6)
-        )
         classification_metrics[class_name] = {
-            'support': support_by_class_name,
-            'TP': TP_by_class_name,
-            'FP': FP_by_class_name,
-            'FN': FN_by_class_name,
-            'precision': precision_by_class_name,
-            'recall': recall_by_class_name,
-            'f1_score': f1_score_by_class_name
+            key: classes_metrics[key][idx]
+            for key in ['support', 'TP', 'FP', 'FN', 'precision', 'recall', 'f1_score']
         }
-        if max(tops_n) > 1:
-            for top_n in tops_n:
-                if top_n == 1:
-                    continue
-                precision_top_n, recall_top_n = get_precision_and_recall_top_n(
-                    true_labels=true_labels,
-                    pred_labels_top_n=pred_labels_top_n,
-                    label=class_name,
-                    top_n=top_n
-                )
-                classification_metrics[class_name][f'precision@{top_n}'] = precision_top_n
-                classification_metrics[class_name][f'recall@{top_n}'] = recall_top_n
-                classification_metrics[class_name][f'f1_score@{top_n}'] = (
-                    2 * precision_top_n * recall_top_n
-                ) / max(precision_top_n + recall_top_n, 1e-6)
+        for top_n in precisions_top_n:
+            precision_top_n = precisions_top_n[top_n][idx]
+            recall_top_n = recalls_top_n[top_n][idx]
+            classification_metrics[class_name][f'precision@{top_n}'] = precision_top_n
+            classification_metrics[class_name][f'recall@{top_n}'] = recall_top_n
+            classification_metrics[class_name][f'f1_score@{top_n}'] = (
+                2 * precision_top_n * recall_top_n
+            ) / max(precision_top_n + recall_top_n, 1e-6)
 
     if known_class_names is not None:
         len_known_class_names = len(known_class_names)
@@ -262,14 +464,16 @@ def get_df_classification_metrics(
         known_class_names = list(set(all_class_names).intersection(set(known_class_names)))
         known_class_names_without_pseudo_classes = list(set(known_class_names) - set(pseudo_class_names))
         if count_mean_expected_steps:
-            for class_name in all_class_names:
-                classification_metrics[class_name]['mean_expected_steps'] = get_mean_expected_steps(
-                    n_true_labels=n_true_labels,
-                    n_pred_labels_top_n=n_pred_labels_top_n,
-                    n_pred_scores_top_n=n_pred_scores_top_n,
-                    label=class_name,
-                    step_penalty=step_penalty
-                )
+            mean_expected_steps = get_mean_expected_steps_by_classes(
+                images_ids=images_ids,
+                true_labels_ids=true_labels_ids,
+                pred_labels_ids_top_n=pred_labels_ids_top_n,
+                pred_scores_top_n=pred_scores_top_n,
+                n_classes=len(all_class_names),
+                step_penalty=step_penalty
+            )
+            for idx, class_name in enumerate(all_class_names):
+                classification_metrics[class_name]['mean_expected_steps'] = mean_expected_steps[idx]
         _add_metrics_to_dict(
             classification_metrics=classification_metrics,
             labels=known_class_names,
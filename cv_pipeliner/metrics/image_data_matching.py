@@ -1,10 +1,11 @@
-from dataclasses import dataclass
-from typing import Literal, List
+from dataclasses import dataclass, replace
+from typing import Dict, Literal, List, Tuple
 
 import numpy as np
 
 from cv_pipeliner.core.data import BboxData, ImageData
 from cv_pipeliner.logging import logger
+from cv_pipeliner.utils.bboxes_index import BboxesIndex
 
 
 def intersection_over_union(bbox_data1: BboxData, bbox_data2: BboxData) -> float:
@@ -152,6 +153,25 @@ class ImageDataMatching:
             )
         else:
             self.bboxes_data_matchings = bboxes_data_matchings
+        self._bboxes_indexes = {
+            tag: BboxesIndex([
+                (bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax)
+                if bbox_data is not None else (np.nan, np.nan, np.nan, np.nan)
+                for bbox_data in self._get_tag_bboxes_data(tag)
+            ])
+            for tag in ['true', 'pred']
+        }
+
+    def _get_tag_bboxes_data(
+        self,
+        tag: Literal['true', 'pred']
+    ) -> List[BboxData]:
+        if tag == 'true':
+            return [bbox_data_matching.true_bbox_data for bbox_data_matching in self.bboxes_data_matchings]
+        elif tag == 'pred':
+            return [bbox_data_matching.pred_bbox_data for bbox_data_matching in self.bboxes_data_matchings]
+        else:
+            raise ValueError(f"Unknown tag: {tag}")
 
     def _get_bboxes_data_matchings(
         self,
@@ -299,30 +319,174 @@ class ImageDataMatching:
         tag: Literal['true', 'pred']
     ) -> BboxDataMatching:
         xmin, ymin, xmax, ymax = bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax
-        if tag == 'true':
-            bboxes_data_coords_from_matchings = [
-                (
-                    bbox_data_matching.true_bbox_data.xmin,
-                    bbox_data_matching.true_bbox_data.ymin,
-                    bbox_data_matching.true_bbox_data.xmax,
-                    bbox_data_matching.true_bbox_data.ymax
-                )
-                if bbox_data_matching.true_bbox_data is not None
-                else (-1, -1, -1, 1)
-                for bbox_data_matching in self.bboxes_data_matchings
-            ]
-        elif tag == 'pred':
-            bboxes_data_coords_from_matchings = [
-                (
-                    bbox_data_matching.pred_bbox_data.xmin,
-                    bbox_data_matching.pred_bbox_data.ymin,
-                    bbox_data_matching.pred_bbox_data.xmax,
-                    bbox_data_matching.pred_bbox_data.ymax
-                )
-                if bbox_data_matching.pred_bbox_data is not None
-                else (-1, -1, -1, 1)
-                for bbox_data_matching in self.bboxes_data_matchings
-            ]
-        bbox_data_matching_index = bboxes_data_coords_from_matchings.index((xmin, ymin, xmax, ymax))
+        bbox_data_matching_index = self._bboxes_indexes[tag].find_by_coords((xmin, ymin, xmax, ymax))
+        if bbox_data_matching_index is None:
+            raise ValueError(f"There is no {tag} bbox with coords {(xmin, ymin, xmax, ymax)} in the matching.")
 
         return self.bboxes_data_matchings[bbox_data_matching_index]
+
+    def find_bboxes_data_matchings_in_region(
+        self,
+        region: Tuple[int, int, int, int],
+        tag: Literal['true', 'pred'],
+        how: Literal['intersects', 'inside'] = 'intersects'
+    ) -> List[BboxDataMatching]:
+        '''
+        Returns matchings whose tag bbox intersects the region (xmin, ymin, xmax, ymax) or is inside of it.
+        '''
+        return [
+            self.bboxes_data_matchings[idx]
+            for idx in self._bboxes_indexes[tag].query_region(region, how=how)
+        ]
+
+    def find_bboxes_data_matchings_by_point(
+        self,
+        x: int,
+        y: int,
+        tag: Literal['true', 'pred']
+    ) -> List[BboxDataMatching]:
+        '''
+        Returns matchings whose tag bbox contains the point (x, y), e.g. all bboxes under cursor.
+        '''
+        return [
+            self.bboxes_data_matchings[idx]
+            for idx in self._bboxes_indexes[tag].query_point(x, y)
+        ]
+
+
+@dataclass
+class BboxesDataMatchingsTable:
+    '''
+    A columnar table of bboxes_data_matchings of several ImageDataMatching (one row per BboxDataMatching).
+
+    Filters return masked views sharing the same columns, so counting metrics on a subset of labels
+    neither creates new matchings nor recomputes IoU.
+    '''
+    true_labels: np.ndarray
+    pred_labels: np.ndarray
+    has_true_bbox: np.ndarray
+    has_pred_bbox: np.ndarray
+    ious: np.ndarray
+    extra_bbox_labels: np.ndarray
+    mask: np.ndarray = None
+
+    def __post_init__(self):
+        if self.mask is None:
+            self.mask = np.ones(len(self.true_labels), dtype=bool)
+
+    @classmethod
+    def from_images_data_matchings(
+        cls,
+        images_data_matchings: List[ImageDataMatching]
+    ) -> 'BboxesDataMatchingsTable':
+        bboxes_data_matchings = [
+            bbox_data_matching
+            for image_data_matching in images_data_matchings
+            for bbox_data_matching in image_data_matching.bboxes_data_matchings
+        ]
+        for bbox_data_matching in bboxes_data_matchings:
+            assert bbox_data_matching.true_bbox_data is not None or bbox_data_matching.pred_bbox_data is not None
+            for bbox_data in [bbox_data_matching.true_bbox_data, bbox_data_matching.pred_bbox_data]:
+                if bbox_data is not None:
+                    bbox_data.assert_label_is_valid()
+        return cls(
+            true_labels=np.array([
+                bbox_data_matching.true_bbox_data.label if bbox_data_matching.true_bbox_data is not None else None
+                for bbox_data_matching in bboxes_data_matchings
+            ], dtype=object),
+            pred_labels=np.array([
+                bbox_data_matching.pred_bbox_data.label if bbox_data_matching.pred_bbox_data is not None else None
+                for bbox_data_matching in bboxes_data_matchings
+            ], dtype=object),
+            has_true_bbox=np.array([
+                bbox_data_matching.true_bbox_data is not None for bbox_data_matching in bboxes_data_matchings
+            ], dtype=bool),
+            has_pred_bbox=np.array([
+                bbox_data_matching.pred_bbox_data is not None for bbox_data_matching in bboxes_data_matchings
+            ], dtype=bool),
+            ious=np.array([
+                bbox_data_matching.iou if bbox_data_matching.iou is not None else np.nan
+                for bbox_data_matching in bboxes_data_matchings
+            ], dtype=np.float64),
+            extra_bbox_labels=np.array([
+                bbox_data_matching.extra_bbox_label for bbox_data_matching in bboxes_data_matchings
+            ], dtype=object)
+        )
+
+    def filter_by_true_labels(
+        self,
+        labels: List[str]
+    ) -> 'BboxesDataMatchingsTable':
+        '''
+        Returns view with matchings whose true bbox has label from labels.
+        '''
+        labels = set(labels)
+        is_true_label_in_labels = np.fromiter(
+            (true_label in labels for true_label in self.true_labels), dtype=bool, count=len(self.true_labels)
+        )
+        return replace(
+            self,
+            mask=self.mask & self.has_true_bbox & is_true_label_in_labels
+        )
+
+    def get_support(
+        self,
+        label: str = None
+    ) -> int:
+        is_support = self.mask & self.has_true_bbox
+        if label is not None:
+            is_support &= (self.true_labels == label)
+        return int(np.sum(is_support))
+
+    def get_ious(
+        self,
+        label: str = None
+    ) -> np.ndarray:
+        '''
+        Returns IoU of found true bboxes (with given label).
+        '''
+        is_found = self.mask & self.has_true_bbox & self.has_pred_bbox
+        if label is not None:
+            is_found &= (self.true_labels == label)
+        return self.ious[is_found]
+
+    def count_pipeline_errors_types(
+        self,
+        label: str = None
+    ) -> Dict[str, int]:
+        '''
+        Vectorized version of BboxDataMatching.get_pipeline_error_type over the table.
+        Returns counts of every error type.
+        '''
+        is_found = self.mask & self.has_true_bbox & self.has_pred_bbox
+        is_not_found = self.mask & self.has_true_bbox & ~self.has_pred_bbox
+        is_extra = self.mask & ~self.has_true_bbox & self.has_pred_bbox
+        is_pred_extra_bbox_label = (self.pred_labels == self.extra_bbox_labels)
+        if label is None:
+            is_correct = (self.true_labels == self.pred_labels)
+            errors_types = {
+                "TP": is_found & is_correct,
+                "FP": is_found & ~is_correct,
+                "FN": is_not_found,
+                "TP (extra bbox)": is_extra & is_pred_extra_bbox_label,
+                "FP (extra bbox)": is_extra & ~is_pred_extra_bbox_label,
+                "FN (extra bbox)": np.zeros(len(self.mask), dtype=bool),
+            }
+        else:
+            is_true_label = (self.true_labels == label)
+            is_pred_label = (self.pred_labels == label)
+            is_label_extra_bbox_label = (self.extra_bbox_labels == label)
+            errors_types = {
+                "TP": is_found & is_true_label & is_pred_label,
+                "TN": (is_found & ~is_true_label & ~is_pred_label) | (is_not_found & ~is_true_label),
+                "FP": is_found & ~is_true_label & is_pred_label,
+                "FN": (is_found & is_true_label & ~is_pred_label) | (is_not_found & is_true_label),
+                "TP (extra bbox)": is_extra & is_label_extra_bbox_label & is_pred_label,
+                "TN (extra bbox)": is_extra & ~is_label_extra_bbox_label & ~is_pred_label,
+                "FP (extra bbox)": is_extra & ~is_label_extra_bbox_label & is_pred_label,
+                "FN (extra bbox)": is_extra & is_label_extra_bbox_label & ~is_pred_label,
+            }
+        return {
+            error_type: int(np.sum(is_error_type))
+            for error_type, is_error_type in errors_types.items()
+        }
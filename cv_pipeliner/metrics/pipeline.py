@@ -4,75 +4,32 @@ import pandas as pd
 import numpy as np
 
 from cv_pipeliner.core.data import ImageData
-from cv_pipeliner.metrics.image_data_matching import BboxDataMatching, ImageDataMatching
+from cv_pipeliner.metrics.image_data_matching import ImageDataMatching, BboxesDataMatchingsTable
 
 
 def _count_errors_types_and_get_pipeline_metrics_per_class(
-    images_data_matchings: List[ImageDataMatching],
+    bboxes_data_matchings_table: BboxesDataMatchingsTable,
     labels: List[str],
     extra_bbox_label: str,
     filter_by_true_labels: bool
 ) -> Dict:
     pipeline_metrics_per_class = {}
     if filter_by_true_labels:
-        images_data_matchings = [
-            ImageDataMatching(
-                true_image_data=image_data_matching.true_image_data,
-                pred_image_data=image_data_matching.pred_image_data,
-                minimum_iou=image_data_matching.minimum_iou,
-                extra_bbox_label=image_data_matching.extra_bbox_label,
-                bboxes_data_matchings=[
-                    BboxDataMatching(
-                        true_bbox_data=bbox_data_matching.true_bbox_data,
-                        pred_bbox_data=bbox_data_matching.pred_bbox_data,
-                        extra_bbox_label=bbox_data_matching.extra_bbox_label
-                    )
-                    for bbox_data_matching in image_data_matching.bboxes_data_matchings
-                    if (
-                        bbox_data_matching.true_bbox_data is not None
-                        and bbox_data_matching.true_bbox_data.label in labels
-                    )
-                ]
-            )
-            for image_data_matching in images_data_matchings
-        ]
-    true_labels = np.array([
-        bbox_data_matching.true_bbox_data.label
-        for image_data_matching in images_data_matchings
-        for bbox_data_matching in image_data_matching.bboxes_data_matchings
-        if bbox_data_matching.true_bbox_data is not None
-    ])
+        bboxes_data_matchings_table = bboxes_data_matchings_table.filter_by_true_labels(labels)
     for class_name in labels:
-        support_by_class_name = np.sum(true_labels == class_name)
-        TP_by_class_name = np.sum([
-            image_data_matching.get_pipeline_TP(label=class_name)
-            for image_data_matching in images_data_matchings
-        ])
-        FP_by_class_name = np.sum([
-            image_data_matching.get_pipeline_FP(label=class_name)
-            for image_data_matching in images_data_matchings
-        ])
+        support_by_class_name = bboxes_data_matchings_table.get_support(label=class_name)
+        errors_types_by_class_name = bboxes_data_matchings_table.count_pipeline_errors_types(label=class_name)
+        TP_by_class_name = errors_types_by_class_name["TP"]
+        FP_by_class_name = errors_types_by_class_name["FP"]
         if class_name != extra_bbox_label:
-            TP_extra_bbox_by_class_name = np.sum([
-                image_data_matching.get_pipeline_TP_extra_bbox(label=class_name)
-                for image_data_matching in images_data_matchings
-            ])
-            FP_extra_bbox_by_class_name = np.sum([
-                image_data_matching.get_pipeline_FP_extra_bbox(label=class_name)
-                for image_data_matching in images_data_matchings
-            ])
-            FN_extra_bbox_by_class_name = np.sum([
-                image_data_matching.get_pipeline_FN_extra_bbox(label=class_name)
-                for image_data_matching in images_data_matchings
-            ])
+            TP_extra_bbox_by_class_name = errors_types_by_class_name["TP (extra bbox)"]
+            FP_extra_bbox_by_class_name = errors_types_by_class_name["FP (extra bbox)"]
+            FN_extra_bbox_by_class_name = errors_types_by_class_name["FN (extra bbox)"]
         else:
             TP_extra_bbox_by_class_name = None
             FP_extra_bbox_by_class_name = None
             FN_extra_bbox_by_class_name = None
-        FN_by_class_name = np.sum([
-            image_data_matching.get_pipeline_FN(label=class_name)
-            for image_data_matching in images_data_matchings
-        ])
+        FN_by_class_name = errors_types_by_class_name["FN"]
         TP_extra_bbox_in_precision_numerator = (
             0 if TP_extra_bbox_by_class_name is None else TP_extra_bbox_by_class_name
         )
@@ -91,13 +48,7 @@ def _count_errors_types_and_get_pipeline_metrics_per_class(
         f1_score_by_class_name = 2 * precision_by_class_name * recall_by_class_name / (
             max(precision_by_class_name + recall_by_class_name, 1e-6)
         )
-        ious = [
-            bbox_data_matching.iou
-            for image_data_matching in images_data_matchings
-            for bbox_data_matching in image_data_matching.bboxes_data_matchings
-            if bbox_data_matching.iou is not None and bbox_data_matching.true_bbox_data is not None and
-            bbox_data_matching.true_bbox_data.label == class_name
-        ]
+        ious = bboxes_data_matchings_table.get_ious(label=class_name)
         iou_mean = np.mean(ious) if len(ious) > 0 else 0
         pipeline_metrics_per_class[class_name] = {
             'support': support_by_class_name,
@@ -248,8 +199,9 @@ def get_df_pipeline_metrics(
         for bbox_data in image_data.bboxes_data
     ])
     all_class_names = np.unique(np.concatenate([true_labels, pred_labels]))
+    bboxes_data_matchings_table = BboxesDataMatchingsTable.from_images_data_matchings(images_data_matchings)
     pipeline_metrics_per_class_all_class_names = _count_errors_types_and_get_pipeline_metrics_per_class(
-        images_data_matchings=images_data_matchings,
+        bboxes_data_matchings_table=bboxes_data_matchings_table,
         labels=all_class_names,
         extra_bbox_label=extra_bbox_label,
         filter_by_true_labels=False
@@ -257,18 +209,10 @@ def get_df_pipeline_metrics(
     pipeline_metrics = {}
     for class_name in all_class_names:
         pipeline_metrics[class_name] = pipeline_metrics_per_class_all_class_names[class_name]
-    TP_extra_bbox = np.sum([
-        image_data_matching.get_pipeline_TP_extra_bbox(label=extra_bbox_label)
-        for image_data_matching in images_data_matchings
-    ])
-    FP_extra_bbox = np.sum([
-        image_data_matching.get_pipeline_FP_extra_bbox(label=extra_bbox_label)
-        for image_data_matching in images_data_matchings
-    ])
-    FN_extra_bbox = np.sum([
-        image_data_matching.get_pipeline_FN_extra_bbox(label=extra_bbox_label)
-        for image_data_matching in images_data_matchings
-    ])
+    errors_types_extra_bbox = bboxes_data_matchings_table.count_pipeline_errors_types(label=extra_bbox_label)
+    TP_extra_bbox = errors_types_extra_bbox["TP (extra bbox)"]
+    FP_extra_bbox = errors_types_extra_bbox["FP (extra bbox)"]
+    FN_extra_bbox = errors_types_extra_bbox["FN (extra bbox)"]
     precision_extra_bbox = TP_extra_bbox / max(TP_extra_bbox + FP_extra_bbox, 1e-6)
     recall_extra_bbox = TP_extra_bbox / max(TP_extra_bbox + FN_extra_bbox, 1e-6)
     f1_score_extra_bbox = 2 * precision_extra_bbox * recall_extra_bbox / (
@@ -0,0 +1,273 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import pandas as pd
+import numpy as np
+
+from cv_pipeliner.core.data import ImageData
+
+
+def _get_bboxes_iou_matrix(
+    bboxes1: np.ndarray,
+    bboxes2: np.ndarray
+) -> np.ndarray:
+    '''
+    Vectorized version of intersection_over_union for bboxes in (xmin, ymin, xmax, ymax) format.
+    Returns matrix with shape (len(bboxes1), len(bboxes2)).
+    '''
+    bboxes1 = np.array(bboxes1, dtype=np.float64).reshape(-1, 4)
+    bboxes2 = np.array(bboxes2, dtype=np.float64).reshape(-1, 4)
+    xmins = np.maximum(bboxes1[:, None, 0], bboxes2[None, :, 0])
+    ymins = np.maximum(bboxes1[:, None, 1], bboxes2[None, :, 1])
+    xmaxs = np.minimum(bboxes1[:, None, 2], bboxes2[None, :, 2])
+    ymaxs = np.minimum(bboxes1[:, None, 3], bboxes2[None, :, 3])
+    inter_area = np.maximum(0, ymaxs - ymins + 1) * np.maximum(0, xmaxs - xmins + 1)
+    bboxes1_area = (bboxes1[:, 2] - bboxes1[:, 0] + 1) * (bboxes1[:, 3] - bboxes1[:, 1] + 1)
+    bboxes2_area = (bboxes2[:, 2] - bboxes2[:, 0] + 1) * (bboxes2[:, 3] - bboxes2[:, 1] + 1)
+    iou = inter_area / (bboxes1_area[:, None] + bboxes2_area[None, :] - inter_area + 1e-9)
+    return iou
+
+
+@dataclass
+class ScoredMatching:
+    '''
+    Flat matching between all true and pred bboxes of given images, where pred bboxes are sorted
+    by detection_score in descending order.
+
+    Pred bboxes are matched greedily in descending score order (as in COCO/VOC evaluation): every pred bbox
+    takes the unmatched true bbox with the best iou >= minimum_iou. Thus the matching at any score threshold
+    is a prefix of this matching, and metrics at all thresholds are counted from cumulative sums.
+    '''
+    scores: np.ndarray  # (N_pred,), sorted descending
+    is_matched: np.ndarray  # (N_pred,) bool
+    pred_labels: np.ndarray  # (N_pred,)
+    matched_true_labels: np.ndarray  # (N_pred,), None for unmatched pred bboxes
+    true_labels: np.ndarray  # (N_true,)
+
+    def get_n_kept(self, scores_thresholds: List[float]) -> np.ndarray:
+        '''
+        Returns count of pred bboxes with detection_score > score_threshold for every threshold.
+        '''
+        return np.searchsorted(-self.scores, -np.array(scores_thresholds, dtype=np.float64), side='left')
+
+
+def get_scored_matching(
+    true_images_data: List[ImageData],
+    raw_pred_images_data: List[ImageData],
+    minimum_iou: float
+) -> ScoredMatching:
+    assert len(true_images_data) == len(raw_pred_images_data)
+    n_scores, n_is_matched, n_pred_labels, n_matched_true_labels, n_true_labels = [], [], [], [], []
+    for true_image_data, raw_pred_image_data in zip(true_images_data, raw_pred_images_data):
+        true_bboxes_data = true_image_data.bboxes_data
+        pred_bboxes_data = sorted(
+            raw_pred_image_data.bboxes_data,
+            key=lambda bbox_data: bbox_data.detection_score,
+            reverse=True
+        )
+        true_labels = np.array([bbox_data.label for bbox_data in true_bboxes_data], dtype=object)
+        pred_labels = np.array([bbox_data.label for bbox_data in pred_bboxes_data], dtype=object)
+        scores = np.array([bbox_data.detection_score for bbox_data in pred_bboxes_data], dtype=np.float64)
+        is_matched = np.zeros(len(pred_bboxes_data), dtype=bool)
+        matched_true_labels = np.full(len(pred_bboxes_data), None, dtype=object)
+        if len(true_bboxes_data) > 0 and len(pred_bboxes_data) > 0:
+            iou_matrix = _get_bboxes_iou_matrix(
+                bboxes1=[
+                    (bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax)
+                    for bbox_data in pred_bboxes_data
+                ],
+                bboxes2=[
+                    (bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax)
+                    for bbox_data in true_bboxes_data
+                ]
+            )
+            iou_matrix[iou_matrix < minimum_iou] = -1
+            for pred_idx in range(len(pred_bboxes_data)):
+                true_idx = np.argmax(iou_matrix[pred_idx])
+                if iou_matrix[pred_idx, true_idx] >= minimum_iou:
+                    is_matched[pred_idx] = True
+                    matched_true_labels[pred_idx] = true_labels[true_idx]
+                    iou_matrix[:, true_idx] = -1
+        n_scores.append(scores)
+        n_is_matched.append(is_matched)
+        n_pred_labels.append(pred_labels)
+        n_matched_true_labels.append(matched_true_labels)
+        n_true_labels.append(true_labels)
+
+    scores = np.concatenate(n_scores) if n_scores else np.array([], dtype=np.float64)
+    idxs_sorted = np.argsort(-scores, kind='stable')
+    return ScoredMatching(
+        scores=scores[idxs_sorted],
+        is_matched=np.concatenate(n_is_matched)[idxs_sorted] if n_is_matched else np.array([], dtype=bool),
+        pred_labels=np.concatenate(n_pred_labels)[idxs_sorted] if n_pred_labels else np.array([], dtype=object),
+        matched_true_labels=(
+            np.concatenate(n_matched_true_labels)[idxs_sorted] if n_matched_true_labels
+            else np.array([], dtype=object)
+        ),
+        true_labels=np.concatenate(n_true_labels) if n_true_labels else np.array([], dtype=object)
+    )
+
+
+def _count_kept_by_positions(
+    positions: np.ndarray,
+    n_kept: np.ndarray
+) -> np.ndarray:
+    # positions are sorted, so count of positions < n_kept is searchsorted
+    return np.searchsorted(positions, n_kept, side='left')
+
+
+def _get_precision_recall_f1_score(
+    TP: np.ndarray,
+    n_preds: np.ndarray,
+    support: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    precision = TP / np.maximum(n_preds, 1e-6)
+    recall = TP / np.maximum(support, 1e-6)
+    f1_score = 2 * precision * recall / np.maximum(precision + recall, 1e-6)
+    return precision, recall, f1_score
+
+
+def _get_default_scores_thresholds(min_score_threshold: float = 0.) -> np.ndarray:
+    return np.round(np.arange(min_score_threshold, 1., 0.01), 2)
+
+
+df_detection_metrics_by_thresholds_columns = [
+    'TP', 'FP', 'FN', 'precision', 'recall', 'f1_score'
+]
+
+
+def get_df_detection_metrics_by_thresholds(
+    true_images_data: List[ImageData],
+    raw_pred_images_data: List[ImageData],
+    minimum_iou: float,
+    scores_thresholds: List[float] = None,
+    scored_matching: ScoredMatching = None
+) -> pd.DataFrame:
+    '''
+    Returns detection metrics (precision, recall, f1_score) at every given score threshold
+    (pred bbox is kept when detection_score > score_threshold).
+
+    raw_pred_images_data should be predicted once with score threshold lower than min(scores_thresholds).
+    '''
+    if scored_matching is None:
+        scored_matching = get_scored_matching(true_images_data, raw_pred_images_data, minimum_iou)
+    if scores_thresholds is None:
+        scores_thresholds = _get_default_scores_thresholds()
+    scores_thresholds = np.array(scores_thresholds, dtype=np.float64)
+
+    n_kept = scored_matching.get_n_kept(scores_thresholds)
+    TP = _count_kept_by_positions(np.flatnonzero(scored_matching.is_matched), n_kept)
+    FP = n_kept - TP
+    FN = len(scored_matching.true_labels) - TP
+    precision, recall, f1_score = _get_precision_recall_f1_score(
+        TP=TP, n_preds=n_kept, support=np.full(len(TP), len(scored_matching.true_labels))
+    )
+    df_detection_metrics_by_thresholds = pd.DataFrame({
+        'TP': TP,
+        'FP': FP,
+        'FN': FN,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1_score
+    }, index=pd.Index(scores_thresholds, name='score_threshold'))
+    return df_detection_metrics_by_thresholds[df_detection_metrics_by_thresholds_columns]
+
+
+df_pipeline_metrics_by_thresholds_columns = [
+    'support', 'TP', 'FP', 'FN', 'precision', 'recall', 'f1_score'
+]
+
+
+def get_df_pipeline_metrics_by_thresholds(
+    true_images_data: List[ImageData],
+    raw_pred_images_data: List[ImageData],
+    minimum_iou: float,
+    extra_bbox_label: str = None,
+    scores_thresholds: List[float] = None,
+    scored_matching: ScoredMatching = None
+) -> pd.DataFrame:
+    '''
+    Returns pipeline metrics per class (precision, recall, f1_score) at every given score threshold.
+    Index of the result is (class_name, score_threshold). Row 'all' contains micro average metrics,
+    where unmatched pred bboxes with extra_bbox_label are counted as correct predictions.
+
+    For class_name: precision = TP / (pred bboxes with class_name), recall = TP / (true bboxes with class_name),
+    where TP is pred bbox with class_name matched to the true bbox with the same class_name.
+    '''
+    if scored_matching is None:
+        scored_matching = get_scored_matching(true_images_data, raw_pred_images_data, minimum_iou)
+    if scores_thresholds is None:
+        scores_thresholds = _get_default_scores_thresholds()
+    scores_thresholds = np.array(scores_thresholds, dtype=np.float64)
+
+    n_kept = scored_matching.get_n_kept(scores_thresholds)
+    true_labels = scored_matching.true_labels
+    pred_labels = scored_matching.pred_labels
+    is_correct = scored_matching.is_matched & (pred_labels == scored_matching.matched_true_labels)
+    class_names = np.unique(np.concatenate([true_labels, pred_labels]).astype(str))
+
+    dfs = []
+    for class_name in class_names:
+        support = np.sum(true_labels.astype(str) == class_name)
+        is_pred_class_name = (pred_labels.astype(str) == class_name)
+        n_preds = _count_kept_by_positions(np.flatnonzero(is_pred_class_name), n_kept)
+        TP = _count_kept_by_positions(np.flatnonzero(is_correct & is_pred_class_name), n_kept)
+        precision, recall, f1_score = _get_precision_recall_f1_score(
+            TP=TP, n_preds=n_preds, support=np.full(len(TP), support)
+        )
+        dfs.append(pd.DataFrame({
+            'class_name': class_name,
+            'score_threshold': scores_thresholds,
+            'support': support,
+            'TP': TP,
+            'FP': n_preds - TP,
+            'FN': support - TP,
+            'precision': precision,
+            'recall': recall,
+            'f1_score': f1_score
+        }))
+
+    if extra_bbox_label is not None:
+        is_correct_extra_bbox = ~scored_matching.is_matched & (pred_labels == extra_bbox_label)
+    else:
+        is_correct_extra_bbox = np.zeros(len(pred_labels), dtype=bool)
+    TP = _count_kept_by_positions(np.flatnonzero(is_correct), n_kept)
+    TP_extra_bbox = _count_kept_by_positions(np.flatnonzero(is_correct_extra_bbox), n_kept)
+    precision = (TP + TP_extra_bbox) / np.maximum(n_kept, 1e-6)
+    recall = TP / max(len(true_labels), 1e-6)
+    f1_score = 2 * precision * recall / np.maximum(precision + recall, 1e-6)
+    dfs.append(pd.DataFrame({
+        'class_name': 'all',
+        'score_threshold': scores_thresholds,
+        'support': len(true_labels),
+        'TP': TP,
+        'FP': n_kept - TP - TP_extra_bbox,
+        'FN': len(true_labels) - TP,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1_score
+    }))
+    df_pipeline_metrics_by_thresholds = pd.concat(dfs, ignore_index=True).set_index(
+        ['class_name', 'score_threshold']
+    )
+    return df_pipeline_metrics_by_thresholds[df_pipeline_metrics_by_thresholds_columns]
+
+
+def get_df_optimal_scores_thresholds(
+    df_metrics_by_thresholds: pd.DataFrame,
+    by: str = 'f1_score'
+) -> pd.DataFrame:
+    '''
+    Returns score threshold with maximum value of the metric "by" for every class
+    of get_df_pipeline_metrics_by_thresholds output (or one row for get_df_detection_metrics_by_thresholds).
+    '''
+    if isinstance(df_metrics_by_thresholds.index, pd.MultiIndex):
+        df = df_metrics_by_thresholds.reset_index()
+        df_optimal_scores_thresholds = df.loc[
+            df.groupby('class_name', sort=False)[by].idxmax().values
+        ].set_index('class_name')
+    else:
+        df = df_metrics_by_thresholds.reset_index()
+        df_optimal_scores_thresholds = df.loc[[df[by].idxmax()]]
+        df_optimal_scores_thresholds.index = ['all']
+    return df_optimal_scores_thresholds
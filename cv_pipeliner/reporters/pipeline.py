@@ -3,6 +3,7 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Union, List, Tuple
 
+import numpy as np
 import pandas as pd
 import nbformat as nbf
 
@@ -15,6 +16,10 @@ from cv_pipeliner.inferencers.detection import DetectionInferencer
 from cv_pipeliner.inferencers.pipeline import PipelineInferencer
 from cv_pipeliner.metrics.detection import get_df_detection_metrics, df_detection_metrics_columns
 from cv_pipeliner.metrics.pipeline import get_df_pipeline_metrics, df_pipeline_metrics_columns
+from cv_pipeliner.metrics.thresholds import (
+    get_scored_matching, get_df_detection_metrics_by_thresholds,
+    get_df_pipeline_metrics_by_thresholds, get_df_optimal_scores_thresholds
+)
 from cv_pipeliner.visualizers.pipeline import PipelineVisualizer
 from cv_pipeliner.logging import logger
 from cv_pipeliner.utils.dataframes import transpose_columns_and_write_diffs_to_df_with_tags
@@ -483,6 +488,59 @@ pipeline_interactive_work(
             codes=codes
         )
 
+    def sweep_detection_score_threshold(
+        self,
+        model_spec: PipelineModelSpec,
+        true_images_data: List[ImageData],
+        minimum_iou: float,
+        extra_bbox_label: str = None,
+        scores_thresholds: List[float] = None,
+        min_score_threshold: float = 0.05,
+        batch_size: int = 16,
+        cut_by_bboxes: List[Tuple[int, int, int, int]] = None
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        '''
+        Runs the pipeline once with min_score_threshold and counts detection and pipeline metrics
+        at every score threshold from scores_thresholds (PR curves) without running inference again.
+
+        Returns (df_detection_metrics_by_thresholds, df_pipeline_metrics_by_thresholds, df_optimal_scores_thresholds),
+        where the last one contains score threshold with maximum f1_score for every class.
+        '''
+        if scores_thresholds is None:
+            scores_thresholds = np.round(np.arange(min_score_threshold, 1., 0.01), 2)
+        assert min(scores_thresholds) >= min_score_threshold
+
+        pipeline_model = model_spec.load()
+        inferencer = PipelineInferencer(pipeline_model)
+        images_data_gen = BatchGeneratorImageData(true_images_data, batch_size=batch_size,
+                                                  use_not_caught_elements_as_last_batch=True)
+        raw_pred_images_data = inferencer.predict(images_data_gen, detection_score_threshold=min_score_threshold)
+        true_images_data = cut_images_data_by_bboxes(true_images_data, cut_by_bboxes)
+        raw_pred_images_data = cut_images_data_by_bboxes(raw_pred_images_data, cut_by_bboxes)
+
+        scored_matching = get_scored_matching(
+            true_images_data=true_images_data,
+            raw_pred_images_data=raw_pred_images_data,
+            minimum_iou=minimum_iou
+        )
+        df_detection_metrics_by_thresholds = get_df_detection_metrics_by_thresholds(
+            true_images_data=true_images_data,
+            raw_pred_images_data=raw_pred_images_data,
+            minimum_iou=minimum_iou,
+            scores_thresholds=scores_thresholds,
+            scored_matching=scored_matching
+        )
+        df_pipeline_metrics_by_thresholds = get_df_pipeline_metrics_by_thresholds(
+            true_images_data=true_images_data,
+            raw_pred_images_data=raw_pred_images_data,
+            minimum_iou=minimum_iou,
+            extra_bbox_label=extra_bbox_label,
+            scores_thresholds=scores_thresholds,
+            scored_matching=scored_matching
+        )
+        df_optimal_scores_thresholds = get_df_optimal_scores_thresholds(df_pipeline_metrics_by_thresholds)
+        return df_detection_metrics_by_thresholds, df_pipeline_metrics_by_thresholds, df_optimal_scores_thresholds
+
     def report_on_predictions(
         self,
         true_images_data: List[ImageData],
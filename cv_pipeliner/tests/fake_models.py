@@ -0,0 +1,120 @@
+'''
+Fake models and images shared by tests of inferencers and servers.
+'''
+import time
+from dataclasses import dataclass
+from typing import List, Tuple, Type
+
+import cv2
+import numpy as np
+
+from cv_pipeliner.inference_models.detection.core import (
+    DetectionModelSpec, DetectionModel, DetectionInput, DetectionOutput
+)
+from cv_pipeliner.inference_models.classification.core import (
+    ClassificationModelSpec, ClassificationModel, ClassificationInput, ClassificationOutput
+)
+
+
+@dataclass
+class BrightBlobsDetectionModelSpec(DetectionModelSpec):
+    '''
+    Detects connected components of bright pixels, every predict takes the given time.
+    '''
+    predict_time: float = 0.
+
+    @property
+    def inference_model_cls(self) -> Type['BrightBlobsDetectionModel']:
+        return BrightBlobsDetectionModel
+
+
+class BrightBlobsDetectionModel(DetectionModel):
+    def __init__(self, model_spec: BrightBlobsDetectionModelSpec):
+        super().__init__(model_spec)
+
+    def predict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = None
+    ) -> DetectionOutput:
+        time.sleep(self.model_spec.predict_time)
+        n_pred_bboxes, n_pred_scores = [], []
+        for image in input:
+            mask = (image.max(axis=2) > 200).astype(np.uint8)
+            _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            n_pred_bboxes.append([(x, y, x + w, y + h) for x, y, w, h, _ in stats[1:]])
+            n_pred_scores.append([1.] * (len(stats) - 1))
+        return n_pred_bboxes, n_pred_scores, None, None
+
+    def preprocess_input(self, input):
+        return input
+
+    @property
+    def input_size(self) -> int:
+        return None
+
+
+@dataclass
+class RedChannelClassificationModelSpec(ClassificationModelSpec):
+    @property
+    def inference_model_cls(self) -> Type['RedChannelClassificationModel']:
+        return RedChannelClassificationModel
+
+
+class RedChannelClassificationModel(ClassificationModel):
+    def predict(self, input: ClassificationInput, top_n: int = 1) -> ClassificationOutput:
+        labels = [str(int(cropped_image[..., 0].mean() // 100 * 100)) for cropped_image in input]
+        return [[label] for label in labels], [[1.] for _ in labels]
+
+    def preprocess_input(self, input: List[np.ndarray]) -> ClassificationInput:
+        return input
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        return (None, None)
+
+    @property
+    def class_names(self) -> List[str]:
+        return ['100', '200']
+
+
+@dataclass
+class ScoredBlobsDetectionModelSpec(BrightBlobsDetectionModelSpec):
+    '''
+    Scores of bright blobs (class "blob") are the mean of their blue channel, fails on empty images.
+    '''
+    @property
+    def inference_model_cls(self) -> Type['ScoredBlobsDetectionModel']:
+        return ScoredBlobsDetectionModel
+
+
+class ScoredBlobsDetectionModel(BrightBlobsDetectionModel):
+    def predict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = None
+    ) -> DetectionOutput:
+        assert all(image.any() for image in input), "Empty image"
+        n_pred_bboxes, _, _, _ = super().predict(input, score_threshold, classification_top_n)
+        n_pred_scores = [
+            [image[ymin:ymax, xmin:xmax, 2].mean() / 255 for xmin, ymin, xmax, ymax in pred_bboxes]
+            for image, pred_bboxes in zip(input, n_pred_bboxes)
+        ]
+        n_pred_bboxes = [
+            [bbox for bbox, score in zip(pred_bboxes, pred_scores) if score > score_threshold]
+            for pred_bboxes, pred_scores in zip(n_pred_bboxes, n_pred_scores)
+        ]
+        n_pred_scores = [[score for score in pred_scores if score > score_threshold] for pred_scores in n_pred_scores]
+        top_n = classification_top_n or 1
+        n_pred_class_names_top_n = [[['blob'] * top_n for _ in pred_bboxes] for pred_bboxes in n_pred_bboxes]
+        n_pred_scores_top_n = [[[score] * top_n for score in pred_scores] for pred_scores in n_pred_scores]
+        return n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, n_pred_scores_top_n
+
+
+def get_blobs_image(blobs_colors) -> np.ndarray:
+    image = np.zeros((100, 400, 3), dtype=np.uint8)
+    for idx, color in enumerate(blobs_colors):
+        image[20:60, 10 + 50 * idx:50 + 50 * idx] = color
+    return image
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import numpy as np
+
+from cv_pipeliner.inference_models.pipeline import PipelineModel
+from cv_pipeliner.tests.fake_models import (
+    BrightBlobsDetectionModelSpec, RedChannelClassificationModelSpec, get_blobs_image
+)
+
+
+def _get_image(reds) -> np.ndarray:
+    return get_blobs_image([(red, 255, 255) for red in reds])
+
+
+def test_local_model_apredict_does_not_block_loop():
+    model = BrightBlobsDetectionModelSpec(predict_time=0.05).load()
+    images = [_get_image([255, 255])]
+
+    async def run():
+        n_ticks = 0
+
+        async def tick():
+            nonlocal n_ticks
+            while True:
+                n_ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.ensure_future(tick())
+        started_at = time.perf_counter()
+        outputs = await asyncio.gather(*[model.apredict(images, score_threshold=0.5) for _ in range(4)])
+        elapsed = time.perf_counter() - started_at
+        ticker.cancel()
+        return outputs, elapsed, n_ticks
+
+    outputs, elapsed, n_ticks = asyncio.run(run())
+    assert all(len(n_pred_bboxes[0]) == 2 for n_pred_bboxes, _, _, _ in outputs)
+    # calls of the local model are serialized in a thread while the loop keeps running
+    assert elapsed >= 0.2
+    assert n_ticks > 10
+
+
+def test_pipeline_apredict_equals_predict():
+    pipeline_model = PipelineModel()
+    pipeline_model.load_from_loaded_models(
+        BrightBlobsDetectionModelSpec().load(), RedChannelClassificationModelSpec().load()
+    )
+    images = [_get_image([255, 120, 210]), _get_image([]), _get_image([150] * 7)]
+    expected = pipeline_model.predict(images, detection_score_threshold=0.5, classification_batch_size=2)
+    output = asyncio.run(
+        pipeline_model.apredict(images, detection_score_threshold=0.5, classification_batch_size=2)
+    )
+    for n_expected, n_output in zip(expected, output):
+        assert [np.array(x).tolist() for x in n_expected] == [np.array(x).tolist() for x in n_output]
+    n_pred_labels_top_n = output[2]
+    assert [[labels[0] for labels in pred_labels_top_n] for pred_labels_top_n in n_pred_labels_top_n] == [
+        ['200', '100', '200'], [], ['100'] * 7
+    ]
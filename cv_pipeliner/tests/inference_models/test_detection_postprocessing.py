@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from cv_pipeliner.inference_models.detection.postprocessing import (
+    DetectionPostprocessing, load_class_names, non_max_suppression, postprocess_detection_prediction,
+    postprocess_detection_predictions
+)
+
+BBOXES = np.array([
+    [10, 10, 50, 50],
+    [12, 12, 52, 52],  # IoU with the first is 0.82
+    [30, 30, 70, 70],  # IoU with the first is 0.14
+    [100, 100, 140, 140]
+])
+SCORES = np.array([0.9, 0.8, 0.7, 0.6])
+CLASSES = np.array([1, 2, 1, 1])
+
+
+def _naive_hard_nms(bboxes, scores, iou_threshold):
+    def iou(bbox1, bbox2):
+        width = max(0, min(bbox1[2], bbox2[2]) - max(bbox1[0], bbox2[0]))
+        height = max(0, min(bbox1[3], bbox2[3]) - max(bbox1[1], bbox2[1]))
+        intersection = width * height
+        area1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
+        area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
+        return intersection / (area1 + area2 - intersection)
+
+    keep_idxs = []
+    for idx in np.argsort(-scores, kind='stable'):
+        if all(iou(bboxes[idx], bboxes[keep_idx]) <= iou_threshold for keep_idx in keep_idxs):
+            keep_idxs.append(idx)
+    return keep_idxs
+
+
+def test_hard_nms():
+    keep_idxs, scores = non_max_suppression(BBOXES, SCORES, iou_threshold=0.5)
+    assert keep_idxs.tolist() == [0, 2, 3]
+    assert scores.tolist() == [0.9, 0.7, 0.6]
+    keep_idxs, _ = non_max_suppression(BBOXES, SCORES, iou_threshold=0.5, classes=CLASSES)
+    assert keep_idxs.tolist() == [0, 1, 2, 3]
+    keep_idxs, _ = non_max_suppression(BBOXES, SCORES, iou_threshold=0.1, max_detections=2)
+    assert keep_idxs.tolist() == [0, 3]
+
+    rng = np.random.default_rng(0)
+    xymin = rng.integers(0, 200, size=(300, 2))
+    bboxes = np.concatenate([xymin, xymin + rng.integers(5, 60, size=(300, 2))], axis=1)
+    scores = rng.random(300)
+    keep_idxs, _ = non_max_suppression(bboxes, scores, iou_threshold=0.3)
+    assert keep_idxs.tolist() == _naive_hard_nms(bboxes, scores, iou_threshold=0.3)
+
+
+@pytest.mark.parametrize('method', ['linear', 'gaussian'])
+def test_soft_nms(method):
+    keep_idxs, scores = non_max_suppression(BBOXES, SCORES, iou_threshold=0.5, method=method, score_threshold=0.3)
+    if method == 'linear':
+        # only the bbox with IoU > iou_threshold is decayed
+        assert keep_idxs.tolist() == [0, 2, 3]
+        assert scores.tolist() == [0.9, 0.7, 0.6]
+    else:
+        # all overlapping bboxes are decayed, the second one is dropped by score_threshold
+        assert keep_idxs.tolist() == [0, 2, 3]
+        assert scores == pytest.approx([0.9, 0.7 * np.exp(-(0.1429 ** 2) / 0.5), 0.6], abs=1e-3)
+    keep_idxs, scores = non_max_suppression(BBOXES, SCORES, iou_threshold=0.5, method=method, score_threshold=0.)
+    assert len(keep_idxs) == 4 and scores[-1] > 0
+
+
+def test_postprocess_detection_prediction_with_nms():
+    kwargs = dict(
+        raw_bboxes=BBOXES / 200,
+        raw_scores=SCORES,
+        raw_classes=CLASSES,
+        score_threshold=0.5,
+        height=200,
+        width=200,
+        classification_top_n=3,
+        class_names=np.array(['a', 'b'])
+    )
+    bboxes, scores, class_names_top_n, scores_top_n = postprocess_detection_prediction(
+        **kwargs, postprocessing=DetectionPostprocessing(nms_iou_threshold=0.5)
+    )
+    assert bboxes.tolist() == BBOXES.tolist()
+    assert class_names_top_n.tolist() == [['a'] * 3, ['b'] * 3, ['a'] * 3, ['a'] * 3]
+    assert scores_top_n.shape == (4, 3) and scores_top_n[:, 0].tolist() == scores.tolist()
+
+    bboxes, scores, class_names_top_n, _ = postprocess_detection_prediction(
+        **kwargs, postprocessing=DetectionPostprocessing(nms_iou_threshold=0.5, class_agnostic=True, max_detections=2)
+    )
+    assert bboxes.tolist() == BBOXES[[0, 2]].tolist()
+    assert scores.tolist() == [0.9, 0.7]
+
+    bboxes, scores, _, _ = postprocess_detection_prediction(
+        **kwargs, postprocessing=DetectionPostprocessing(max_detections=1)
+    )
+    assert bboxes.tolist() == BBOXES[[0]].tolist()
+
+    with pytest.raises(ValueError):
+        DetectionPostprocessing(nms_iou_threshold=0.5, nms_method='average')
+
+
+def test_postprocess_detection_predictions(tmp_path):
+    (tmp_path / 'class_names.json').write_text('["a", "b"]')
+    class_names = load_class_names(str(tmp_path / 'class_names.json'))
+    assert class_names.tolist() == load_class_names(['a', 'b']).tolist() == ['a', 'b']
+    assert load_class_names(None) is None
+
+    images = [np.zeros((200, 200, 3), dtype=np.uint8), np.zeros((100, 400, 3), dtype=np.uint8)]
+    raw_predictions = [(BBOXES / 200, SCORES, CLASSES), (BBOXES[:1] / 200, SCORES[:1], CLASSES[[1]])]
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, _ = postprocess_detection_predictions(
+        input=images,
+        raw_predictions=raw_predictions,
+        score_threshold=0.65,
+        classification_top_n=1,
+        class_names=class_names
+    )
+    assert [pred_bboxes.tolist() for pred_bboxes in n_pred_bboxes] == [
+        BBOXES[:3].tolist(), [[20, 5, 100, 25]]
+    ]
+    assert n_pred_scores[0].tolist() == [0.9, 0.8, 0.7]
+    assert [pred_class_names_top_n.tolist() for pred_class_names_top_n in n_pred_class_names_top_n] == [
+        [['a'], ['b'], ['a']], [['b']]
+    ]
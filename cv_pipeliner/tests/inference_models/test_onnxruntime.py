@@ -0,0 +1,119 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip('onnx')
+pytest.importorskip('onnxruntime')
+from onnx import TensorProto, helper  # noqa: E402
+
+from cv_pipeliner.inference_models.classification.onnxruntime import (  # noqa: E402
+    ONNXRuntime_ClassificationModelSpec
+)
+from cv_pipeliner.inference_models.detection.onnxruntime import ONNXRuntime_DetectionModelSpec  # noqa: E402
+
+
+def _save_model(graph, path) -> str:
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 11)])
+    model.ir_version = 7
+    onnx.checker.check_model(model)
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def classification_model_path(tmp_path) -> str:
+    '''
+    Scores of classes "red", "green" and "blue" are the mean intensities of the channels.
+    '''
+    graph = helper.make_graph(
+        nodes=[helper.make_node('ReduceMean', ['images'], ['scores'], axes=[1, 2], keepdims=0)],
+        name='classifier',
+        inputs=[helper.make_tensor_value_info('images', TensorProto.FLOAT, ['batch', 'height', 'width', 3])],
+        outputs=[helper.make_tensor_value_info('scores', TensorProto.FLOAT, ['batch', 3])]
+    )
+    return _save_model(graph, tmp_path / 'classifier.onnx')
+
+
+@pytest.fixture
+def detection_model_path(tmp_path) -> str:
+    '''
+    Object Detection API-like model: one box (0.25, 0.25, 0.75, 0.75) of class 1 per image
+    with the score equal to the mean intensity of the image.
+    '''
+    graph = helper.make_graph(
+        nodes=[
+            helper.make_node('Cast', ['input_tensor'], ['image_float'], to=TensorProto.FLOAT),
+            helper.make_node('ReduceMean', ['image_float'], ['mean'], axes=[1, 2, 3], keepdims=0),
+            helper.make_node('Div', ['mean', 'max_value'], ['score']),
+            helper.make_node('Unsqueeze', ['score'], ['detection_scores'], axes=[1]),
+            helper.make_node('Unsqueeze', ['detection_scores'], ['scores_3d'], axes=[2]),
+            helper.make_node('Mul', ['scores_3d', 'zero'], ['zeros_3d']),
+            helper.make_node('Add', ['zeros_3d', 'box'], ['detection_boxes']),
+            helper.make_node('Mul', ['detection_scores', 'zero'], ['zeros_2d']),
+            helper.make_node('Add', ['zeros_2d', 'one'], ['detection_classes']),
+        ],
+        name='detector',
+        inputs=[helper.make_tensor_value_info('input_tensor', TensorProto.UINT8, ['batch', 'height', 'width', 3])],
+        outputs=[
+            helper.make_tensor_value_info('detection_boxes', TensorProto.FLOAT, ['batch', 1, 4]),
+            helper.make_tensor_value_info('detection_scores', TensorProto.FLOAT, ['batch', 1]),
+            helper.make_tensor_value_info('detection_classes', TensorProto.FLOAT, ['batch', 1])
+        ],
+        initializer=[
+            helper.make_tensor('max_value', TensorProto.FLOAT, [], [255.]),
+            helper.make_tensor('zero', TensorProto.FLOAT, [], [0.]),
+            helper.make_tensor('one', TensorProto.FLOAT, [], [1.]),
+            helper.make_tensor('box', TensorProto.FLOAT, [1, 1, 4], [0.25, 0.25, 0.75, 0.75])
+        ]
+    )
+    return _save_model(graph, tmp_path / 'detector.onnx')
+
+
+def test_onnxruntime_backends_do_not_import_tensorflow():
+    code = (
+        'import sys\n'
+        'import cv_pipeliner.inference_models.classification.onnxruntime\n'
+        'import cv_pipeliner.inference_models.detection.onnxruntime\n'
+        'assert "tensorflow" not in sys.modules\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+@pytest.mark.parametrize('use_io_binding', [True, False])
+def test_onnxruntime_classification(classification_model_path, use_io_binding):
+    model = ONNXRuntime_ClassificationModelSpec(
+        input_size=(8, 8),
+        preprocess_input=lambda images: np.array(images, dtype=np.float32) / 255,
+        class_names=['red', 'green', 'blue'],
+        model_path=classification_model_path,
+        max_batch_size=4,
+        intra_op_num_threads=1,
+        use_io_binding=use_io_binding
+    ).load()
+    colors = [(200, 10, 100), (10, 200, 100), (10, 100, 200)] * 3
+    images = [np.full((8, 8, 3), color, dtype=np.uint8) for color in colors]
+    pred_labels_top_n, pred_scores_top_n = model.predict(model.preprocess_input(images), top_n=2)
+    assert pred_labels_top_n.tolist() == [['red', 'blue'], ['green', 'blue'], ['blue', 'green']] * 3
+    assert pred_scores_top_n[0] == pytest.approx([200 / 255, 100 / 255])
+    pred_labels_top_n, _ = model.predict(model.preprocess_input([]), top_n=1)
+    assert len(pred_labels_top_n) == 0
+
+
+@pytest.mark.parametrize('input_size', [None, (32, 32)])
+def test_onnxruntime_detection(detection_model_path, input_size):
+    model = ONNXRuntime_DetectionModelSpec(
+        model_path=detection_model_path,
+        input_size=input_size,
+        max_batch_size=2,
+        class_names=['object']
+    ).load()
+    # images of different shapes
+    images = [np.full((40 + 20 * (idx % 2), 80, 3), 50 * idx, dtype=np.uint8) for idx in range(5)]
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, _ = model.predict(images, score_threshold=0.1)
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0, 1, 1, 1, 1]
+    assert n_pred_bboxes[1].tolist() == [[20, 15, 60, 45]]
+    assert n_pred_bboxes[2].tolist() == [[20, 10, 60, 30]]
+    assert [pred_scores[0] * 255 for pred_scores in n_pred_scores[1:]] == pytest.approx([50, 100, 150, 200])
+    assert n_pred_class_names_top_n[4][0][0] == 'object'
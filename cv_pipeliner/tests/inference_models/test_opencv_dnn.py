@@ -0,0 +1,131 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from cv_pipeliner.inference_models.detection.opencv_dnn import (
+    OpenCVDNN_DetectionModelSpec, split_detection_output
+)
+from cv_pipeliner.inference_models.detection.postprocessing import postprocess_detection_prediction
+
+
+@pytest.fixture
+def detection_model_path(tmp_path) -> str:
+    '''
+    SSD-like model: one box (0.25, 0.25, 0.75, 0.75) of class 1 per image with the score equal to the mean
+    intensity of the image. The image id is the value of the top left pixel of the first channel.
+    '''
+    onnx = pytest.importorskip('onnx')
+    from onnx import TensorProto, helper
+    graph = helper.make_graph(
+        nodes=[
+            helper.make_node('GlobalAveragePool', ['data'], ['pooled']),
+            helper.make_node('Reshape', ['pooled', 'shape_n3'], ['channels_mean']),
+            helper.make_node('MatMul', ['channels_mean', 'mean_weights'], ['score']),
+            helper.make_node('Slice', ['data', 'starts', 'ends', 'axes'], ['pixel']),
+            helper.make_node('Reshape', ['pixel', 'shape_n1'], ['image_id']),
+            helper.make_node('Mul', ['score', 'zero'], ['zeros']),
+            helper.make_node('Add', ['zeros', 'one'], ['class']),
+            helper.make_node('MatMul', ['class', 'box'], ['boxes']),
+            helper.make_node('Concat', ['image_id', 'class', 'score', 'boxes'], ['detection_out'], axis=1),
+        ],
+        name='detector',
+        inputs=[helper.make_tensor_value_info('data', TensorProto.FLOAT, ['batch', 3, 32, 32])],
+        outputs=[helper.make_tensor_value_info('detection_out', TensorProto.FLOAT, ['batch', 7])],
+        initializer=[
+            helper.make_tensor('mean_weights', TensorProto.FLOAT, [3, 1], [1 / 765] * 3),
+            helper.make_tensor('zero', TensorProto.FLOAT, [], [0.]),
+            helper.make_tensor('one', TensorProto.FLOAT, [], [1.]),
+            helper.make_tensor('box', TensorProto.FLOAT, [1, 4], [0.25, 0.25, 0.75, 0.75]),
+            helper.make_tensor('shape_n1', TensorProto.INT64, [2], [-1, 1]),
+            helper.make_tensor('shape_n3', TensorProto.INT64, [2], [-1, 3]),
+            helper.make_tensor('starts', TensorProto.INT64, [3], [0, 0, 0]),
+            helper.make_tensor('ends', TensorProto.INT64, [3], [1, 1, 1]),
+            helper.make_tensor('axes', TensorProto.INT64, [3], [1, 2, 3])
+        ]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 11)])
+    model.ir_version = 7
+    path = tmp_path / 'detector.onnx'
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def test_opencv_dnn_backend_does_not_import_tensorflow():
+    code = (
+        'import sys\n'
+        'import cv_pipeliner.inference_models.detection.opencv_dnn\n'
+        'assert "tensorflow" not in sys.modules\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_split_detection_output():
+    detection_output = np.array([[[
+        [1, 2, 0.9, 0.1, 0.2, 0.3, 1.2],
+        [0, 1, 0.8, 0.1, 0.1, 0.5, 0.5],
+        [1, 1, 0.7, -0.1, 0.2, 0.3, 0.4],
+        [-1, 0, 0., 0., 0., 0., 0.]
+    ]]])
+    (bboxes0, scores0, classes0), (bboxes1, scores1, classes1), (bboxes2, _, _) = split_detection_output(
+        detection_output, batch_size=3
+    )
+    assert bboxes0 == pytest.approx(np.array([[0.1, 0.1, 0.5, 0.5]]))
+    assert bboxes1 == pytest.approx(np.array([[0.1, 0.2, 0.3, 1.], [0., 0.2, 0.3, 0.4]]))
+    assert scores1 == pytest.approx([0.9, 0.7])
+    assert classes0.tolist() == [1] and classes1.tolist() == [2, 1]
+    assert len(bboxes2) == 0
+
+
+def test_postprocess_detection_prediction():
+    raw_bboxes = np.array([
+        [0.1, 0.1, 0.5, 0.5],
+        [0.1, 0.1, 0.5, 0.5],  # repeated
+        [0.2, 0.2, 0.2, 0.6],  # empty
+        [0.5, 0.5, 0.9, 0.9],
+        [0.0, 0.0, 1.0, 1.0]  # low score
+    ])
+    bboxes, scores, class_names_top_n, scores_top_n = postprocess_detection_prediction(
+        raw_bboxes=raw_bboxes,
+        raw_scores=np.array([0.9, 0.8, 0.9, 0.7, 0.1]),
+        raw_classes=np.array([1, 1, 1, 2, 1]),
+        score_threshold=0.5,
+        height=100,
+        width=200,
+        classification_top_n=2,
+        class_names=np.array(['a', 'b'])
+    )
+    assert bboxes.tolist() == [[20, 10, 100, 50], [100, 50, 180, 90]]
+    assert scores.tolist() == [0.9, 0.7]
+    assert class_names_top_n.tolist() == [['a', 'a'], ['b', 'b']]
+    assert scores_top_n.tolist() == [[0.9, 0.9], [0.7, 0.7]]
+
+    _, _, class_names_top_n, _ = postprocess_detection_prediction(
+        raw_bboxes=np.zeros((0, 4)),
+        raw_scores=np.zeros(0),
+        raw_classes=np.zeros(0),
+        score_threshold=0.5,
+        height=100,
+        width=200,
+        classification_top_n=1
+    )
+    assert len(class_names_top_n) == 0
+
+
+def test_opencv_dnn_detection(detection_model_path):
+    model = OpenCVDNN_DetectionModelSpec(
+        model_path=detection_model_path,
+        input_size=(32, 32),
+        max_batch_size=2,
+        class_names=['object']
+    ).load()
+    images = [np.full((40 + 20 * (idx % 2), 80, 3), 50 * idx, dtype=np.uint8) for idx in range(5)]
+    for idx, image in enumerate(images):
+        image[:8, :8, 0] = idx % 2  # the id of the image in the batch, kept after resizing
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, _ = model.predict(images, score_threshold=0.1)
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0, 1, 1, 1, 1]
+    assert n_pred_bboxes[1].tolist() == [[20, 15, 60, 45]]
+    assert n_pred_bboxes[2].tolist() == [[20, 10, 60, 30]]
+    assert [pred_scores[0] * 255 for pred_scores in n_pred_scores[1:]] == pytest.approx([50, 100, 150, 200], abs=2)
+    assert n_pred_class_names_top_n[4][0][0] == 'object'
@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+from typing import Type
+
+import cv2
+import numpy as np
+
+from cv_pipeliner.inference_models.detection.core import (
+    DetectionModelSpec, DetectionModel, DetectionInput, DetectionOutput
+)
+from cv_pipeliner.inference_models.detection.tiling import Tiling_DetectionModelSpec, get_tiles, merge_tiles_bboxes
+
+BLOBS = [(20, 30), (100, 41), (250, 200), (61, 300), (330, 90)]  # (xmin, ymin) of 6x6 blobs
+BLOB_SIZE = 6
+
+
+@dataclass
+class DownsamplingBlobsDetectionModelSpec(DetectionModelSpec):
+    '''
+    Detects bright blobs on the image resized to input_size x input_size, like real detectors
+    it misses small objects of large images.
+    '''
+    input_size: int = 64
+
+    @property
+    def inference_model_cls(self) -> Type['DownsamplingBlobsDetectionModel']:
+        return DownsamplingBlobsDetectionModel
+
+
+class DownsamplingBlobsDetectionModel(DetectionModel):
+    def __init__(self, model_spec: DownsamplingBlobsDetectionModelSpec):
+        super().__init__(model_spec)
+        self.batches_sizes = []
+
+    def predict(
+        self,
+        input: DetectionInput,
+        score_threshold: float,
+        classification_top_n: int = 1
+    ) -> DetectionOutput:
+        self.batches_sizes.append(len(input))
+        size = self.model_spec.input_size
+        n_pred_bboxes, n_pred_scores = [], []
+        for image in input:
+            height, width = image.shape[:2]
+            resized_image = cv2.resize(image.max(axis=2), (size, size), interpolation=cv2.INTER_AREA)
+            _, _, stats, _ = cv2.connectedComponentsWithStats((resized_image > 200).astype(np.uint8))
+            n_pred_bboxes.append([
+                (
+                    round(x * width / size), round(y * height / size),
+                    round((x + w) * width / size), round((y + h) * height / size)
+                )
+                for x, y, w, h, _ in stats[1:]
+            ])
+            n_pred_scores.append([1.] * (len(stats) - 1))
+        n_pred_class_names_top_n = [[['blob'] * classification_top_n] * len(bboxes) for bboxes in n_pred_bboxes]
+        n_pred_scores_top_n = [[[1.] * classification_top_n] * len(bboxes) for bboxes in n_pred_bboxes]
+        return n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, n_pred_scores_top_n
+
+    def preprocess_input(self, input):
+        return input
+
+    @property
+    def input_size(self) -> int:
+        return (None, None)
+
+
+def _get_image() -> np.ndarray:
+    image = np.zeros((384, 512, 3), dtype=np.uint8)
+    for xmin, ymin in BLOBS:
+        image[ymin:ymin+BLOB_SIZE, xmin:xmin+BLOB_SIZE] = 255
+    return image
+
+
+def test_get_tiles():
+    tiles = get_tiles(height=1000, width=700, tile_size=(400, 400), tile_overlap=0.25)
+    assert tiles.tolist() == [
+        [0, 0, 400, 400], [300, 0, 700, 400],
+        [0, 300, 400, 700], [300, 300, 700, 700],
+        [0, 600, 400, 1000], [300, 600, 700, 1000]
+    ]
+    assert get_tiles(height=100, width=50, tile_size=(400, 400), tile_overlap=0.25).tolist() == [[0, 0, 50, 100]]
+
+
+def test_merge_tiles_bboxes():
+    bboxes = np.array([
+        [40, 10, 64, 30],  # the part on the tile 0
+        [40, 10, 70, 30],  # the whole object on the tile 1
+        [44, 12, 60, 28],  # other object inside on the tile 1
+        [40, 10, 64, 30],  # other class on the tile 2
+    ])
+    scores = np.array([0.6, 0.9, 0.5, 0.7])
+    tiles_idxs = np.array([0, 1, 1, 2])
+    keep_idxs, merged_bboxes = merge_tiles_bboxes(bboxes, scores, tiles_idxs, merge_threshold=0.5)
+    assert keep_idxs.tolist() == [1, 2]
+    assert merged_bboxes.tolist() == [[40, 10, 70, 30], [44, 12, 60, 28]]
+    keep_idxs, _ = merge_tiles_bboxes(
+        bboxes, scores, tiles_idxs, merge_threshold=0.5, classes=np.array(['a', 'a', 'a', 'b'])
+    )
+    assert keep_idxs.tolist() == [1, 3, 2]
+
+
+def test_tiling_detection_model():
+    detection_model_spec = DownsamplingBlobsDetectionModelSpec(input_size=64)
+    images = [_get_image(), _get_image()[:, ::-1]]
+    n_pred_bboxes, _, _, _ = detection_model_spec.load().predict(images, score_threshold=0.5)
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0, 0]
+
+    model = Tiling_DetectionModelSpec(
+        detection_model_spec=detection_model_spec,
+        tile_size=(64, 64),
+        tile_overlap=0.25,
+        batch_size=16
+    ).load()
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, n_pred_scores_top_n = model.predict(
+        images, score_threshold=0.5, classification_top_n=2
+    )
+    # (100, 41) and (61, 300) are cut by tiles borders
+    expected_bboxes = sorted((xmin, ymin, xmin + BLOB_SIZE, ymin + BLOB_SIZE) for xmin, ymin in BLOBS)
+    assert sorted(map(tuple, n_pred_bboxes[0].tolist())) == expected_bboxes
+    assert sorted(map(tuple, n_pred_bboxes[1].tolist())) == sorted(
+        (512 - xmax, ymin, 512 - xmin, ymax) for xmin, ymin, xmax, ymax in expected_bboxes
+    )
+    assert n_pred_scores[0].tolist() == [1.] * len(BLOBS)
+    assert n_pred_class_names_top_n[1] == [['blob', 'blob']] * len(BLOBS)
+    assert len(n_pred_scores_top_n[1]) == len(BLOBS)
+
+    n_tiles = len(get_tiles(384, 512, (64, 64), 0.25))
+    batches_sizes = model.detection_model.batches_sizes
+    assert sum(batches_sizes) == 2 * n_tiles and max(batches_sizes) == 16
+
+
+def test_tiling_detection_model_with_full_image():
+    image = np.zeros((384, 512, 3), dtype=np.uint8)
+    image[100:300, 100:400] = 255  # larger than tiles
+    model = Tiling_DetectionModelSpec(
+        detection_model_spec=DownsamplingBlobsDetectionModelSpec(input_size=64),
+        tile_size=(128, 128),
+        include_full_image=True
+    ).load()
+    (pred_bboxes,), _, _, _ = model.predict([image], score_threshold=0.5)
+    assert pred_bboxes.tolist() == [[100, 100, 400, 300]]
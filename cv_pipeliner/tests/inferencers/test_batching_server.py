@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from cv_pipeliner.inference_models.pipeline import PipelineModel
+from cv_pipeliner.inferencers.batching_server import PipelineBatchingServer
+from cv_pipeliner.tests.fake_models import (
+    RedChannelClassificationModelSpec, ScoredBlobsDetectionModelSpec, get_blobs_image
+)
+
+
+def _get_pipeline_model(predict_time: float = 0.) -> PipelineModel:
+    pipeline_model = PipelineModel()
+    pipeline_model.load_from_loaded_models(
+        ScoredBlobsDetectionModelSpec(predict_time=predict_time).load(), RedChannelClassificationModelSpec().load()
+    )
+    return pipeline_model
+
+
+def test_batching_server_batches_concurrent_requests():
+    n_requests = 16
+    results = [None] * n_requests
+
+    def run_client(server: PipelineBatchingServer, idx: int):
+        red = 100 if idx % 2 == 0 else 200
+        results[idx] = server.predict(get_blobs_image([(red, 255, 255)] * (idx % 3 + 1)), detection_score_threshold=0.5)
+
+    with PipelineBatchingServer(_get_pipeline_model(predict_time=0.05), max_batch_size=8) as server:
+        threads = [threading.Thread(target=run_client, args=(server, idx)) for idx in range(n_requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    # every caller gets the result of its image
+    for idx, pred_image_data in enumerate(results):
+        assert [bbox_data.label for bbox_data in pred_image_data.bboxes_data] == (
+            ['100' if idx % 2 == 0 else '200'] * (idx % 3 + 1)
+        )
+    assert server.stats.n_predicted == n_requests
+    assert server.stats.n_batches < n_requests
+    assert server.stats.mean_batch_size > 1
+
+
+def test_batching_server_filters_predictions_of_every_request():
+    pipeline_model = _get_pipeline_model()
+    image = get_blobs_image([(255, 255, 100), (255, 255, 160), (255, 255, 220)])
+    with PipelineBatchingServer(pipeline_model, max_batch_size=2, max_batch_delay=1.) as server:
+        future_low = server.submit(image, detection_score_threshold=0.3)
+        future_high = server.submit(image, detection_score_threshold=0.7)
+        pred_image_data_low, pred_image_data_high = future_low.result(), future_high.result()
+    assert server.stats.n_batches == 1
+    assert len(pred_image_data_low.bboxes_data) == 3
+    assert [bbox_data.xmin for bbox_data in pred_image_data_high.bboxes_data] == [110]
+    assert pred_image_data_high.bboxes_data[0].detection_score == pytest.approx(220 / 255)
+
+
+def _wait_for_empty_queue(server: PipelineBatchingServer):
+    while not server.requests_queue.empty():
+        time.sleep(0.01)
+
+
+def test_batching_server_errors_and_rejections():
+    server = PipelineBatchingServer(
+        _get_pipeline_model(predict_time=0.3), max_batch_size=2, max_batch_delay=1., max_queue_size=1
+    )
+    with server:
+        future_ok = server.submit(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5)
+        _wait_for_empty_queue(server)
+        future_failed = server.submit(get_blobs_image([]), detection_score_threshold=0.5)
+        _wait_for_empty_queue(server)
+        # the batch is being predicted, the next request takes the only place in the queue
+        future_next = server.submit(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5)
+        assert server.submit(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5) is None
+        # the exception of the batch comes to all its callers
+        with pytest.raises(AssertionError, match='Empty image'):
+            future_failed.result()
+        with pytest.raises(AssertionError, match='Empty image'):
+            future_ok.result()
+        assert len(future_next.result().bboxes_data) == 1
+    assert server.stats.n_rejected == 1
+    assert server.stats.n_failed == 2
+    assert server.stats.n_predicted == 1
+
+
+def test_batching_server_rejects_requests_when_not_started():
+    server = PipelineBatchingServer(_get_pipeline_model(), max_queue_size=1)
+    assert server.submit(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5) is None
+    with server:
+        assert len(server.predict(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5).bboxes_data) == 1
+    assert server.predict(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5) is None
+    assert server.stats.n_rejected == 2
+    assert server.requests_queue.empty()
+
+
+def test_batching_server_stops_with_full_queue():
+    server = PipelineBatchingServer(_get_pipeline_model(predict_time=0.3), max_batch_size=1, max_queue_size=1)
+    server.start()
+    future_predicted = server.submit(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5)
+    _wait_for_empty_queue(server)
+    future_queued = server.submit(get_blobs_image([(255, 255, 255)]), detection_score_threshold=0.5)
+    assert server.requests_queue.full()
+    stop_thread = threading.Thread(target=server.stop)
+    stop_thread.start()
+    stop_thread.join(timeout=5.)
+    assert not stop_thread.is_alive()
+    # the batch collected before the stop is predicted, the queued request is cancelled
+    assert len(future_predicted.result().bboxes_data) == 1
+    assert future_queued.cancelled()
@@ -0,0 +1,118 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Type
+
+import cv2
+import numpy as np
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+from cv_pipeliner.inference_models.pipeline import PipelineModelSpec
+from cv_pipeliner.inferencers.inference_server import InferenceServer, ServedPipelineModel
+from cv_pipeliner.tests.fake_models import (
+    BrightBlobsDetectionModel, RedChannelClassificationModelSpec, ScoredBlobsDetectionModelSpec, get_blobs_image
+)
+
+
+@dataclass
+class BrokenDetectionModelSpec(ScoredBlobsDetectionModelSpec):
+    @property
+    def inference_model_cls(self) -> Type['BrokenDetectionModel']:
+        return BrokenDetectionModel
+
+
+class BrokenDetectionModel(BrightBlobsDetectionModel):
+    def __init__(self, model_spec: BrokenDetectionModelSpec):
+        raise FileNotFoundError('checkpoint')
+
+
+def _encode_png(image: np.ndarray) -> bytes:
+    return cv2.imencode('.png', cv2.cvtColor(image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+
+async def _wait_ready(client: TestClient, timeout: float = 5.):
+    for _ in range(int(timeout / 0.01)):
+        response = await client.get('/ready')
+        if response.status == 200:
+            return await response.json()
+        await asyncio.sleep(0.01)
+    return await response.json()
+
+
+def _run_with_client(inference_server: InferenceServer, run):
+    async def run_with_client():
+        async with TestClient(TestServer(inference_server.make_app())) as client:
+            return await run(client)
+    return asyncio.run(run_with_client())
+
+
+def test_inference_server_predicts_with_resident_models():
+    inference_server = InferenceServer([
+        ServedPipelineModel(
+            model_index='blobs:red',
+            model_spec=PipelineModelSpec(ScoredBlobsDetectionModelSpec(), RedChannelClassificationModelSpec()),
+            detection_score_threshold=0.5
+        ),
+        ServedPipelineModel(
+            model_index='blobs',
+            model_spec=PipelineModelSpec(ScoredBlobsDetectionModelSpec(), None),
+        )
+    ])
+    image = get_blobs_image([(120, 255, 100), (220, 255, 220)])
+
+    async def run(client: TestClient):
+        assert (await client.get('/health')).status == 200
+        assert (await _wait_ready(client))['loaded_models'] == ['blobs:red', 'blobs']
+        models = await (await client.get('/models')).json()
+        assert models['default_model_index'] == 'blobs:red'
+        assert all(model['loaded'] for model in models['models'])
+
+        # concurrent requests of the default model with the multipart image
+        async def predict_multipart():
+            data = FormData()
+            data.add_field('image', _encode_png(image), filename='image.png', content_type='image/png')
+            return await client.post('/predict', data=data)
+        responses = await asyncio.gather(*[predict_multipart() for _ in range(8)])
+        assert all(response.status == 200 for response in responses)
+        pred_images_data_dicts = [await response.json() for response in responses]
+
+        # the raw body and query arguments
+        response = await client.post(
+            '/predict', params={'model_index': 'blobs', 'detection_score_threshold': 0.1}, data=_encode_png(image)
+        )
+        assert response.status == 200
+        pred_image_data_dict_blobs = await response.json()
+
+        assert (await client.post('/predict', params={'model_index': 'unknown'}, data=b'1')).status == 404
+        assert (await client.post('/predict', data=b'')).status == 400
+        assert (await client.post('/predict', data=b'not an image')).status == 400
+        return pred_images_data_dicts, pred_image_data_dict_blobs
+
+    pred_images_data_dicts, pred_image_data_dict_blobs = _run_with_client(inference_server, run)
+    for pred_image_data_dict in pred_images_data_dicts:
+        # the default threshold of the model is used
+        assert [
+            (bbox_data['xmin'], bbox_data['label']) for bbox_data in pred_image_data_dict['bboxes_data']
+        ] == [(60, '200')]
+    assert [bbox_data['label'] for bbox_data in pred_image_data_dict_blobs['bboxes_data']] == ['blob', 'blob']
+    assert all(batching_server._thread is None for batching_server in inference_server.batching_servers.values())
+
+
+def test_inference_server_is_not_ready_when_model_failed_to_load():
+    inference_server = InferenceServer([
+        ServedPipelineModel(
+            model_index='broken',
+            model_spec=PipelineModelSpec(BrokenDetectionModelSpec(), None),
+        )
+    ])
+
+    async def run(client: TestClient):
+        ready = await _wait_ready(client, timeout=0.5)
+        response = await client.post('/predict', data=_encode_png(get_blobs_image([(255, 255, 255)])))
+        return ready, response.status, (await client.get('/health')).status
+
+    ready, predict_status, health_status = _run_with_client(inference_server, run)
+    assert not ready['success']
+    assert 'checkpoint' in ready['error']
+    assert predict_status == 503
+    assert health_status == 200
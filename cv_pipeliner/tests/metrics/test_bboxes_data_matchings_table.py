@@ -0,0 +1,74 @@
+import numpy as np
+
+from cv_pipeliner.core.data import BboxData, ImageData
+from cv_pipeliner.metrics.image_data_matching import BboxDataMatching, ImageDataMatching, BboxesDataMatchingsTable
+
+labels = ['A', 'B', 'C', 'trash']
+
+
+def _get_random_images_data(random_state: np.random.RandomState, n_images: int):
+    images_data = []
+    for _ in range(n_images):
+        bboxes_data = []
+        for _ in range(random_state.randint(0, 20)):
+            xmin, ymin = random_state.randint(0, 300, size=2)
+            bboxes_data.append(BboxData(
+                xmin=xmin, ymin=ymin, xmax=xmin+random_state.randint(5, 60), ymax=ymin+random_state.randint(5, 60),
+                label=random_state.choice(labels)
+            ))
+        images_data.append(ImageData(bboxes_data=bboxes_data))
+    return images_data
+
+
+def test_bboxes_data_matchings_table():
+    random_state = np.random.RandomState(0)
+    images_data_matchings = [
+        ImageDataMatching(true_image_data, pred_image_data, minimum_iou=0.2)
+        for true_image_data, pred_image_data in zip(
+            _get_random_images_data(random_state, 30), _get_random_images_data(random_state, 30)
+        )
+    ]
+    bboxes_data_matchings_table = BboxesDataMatchingsTable.from_images_data_matchings(images_data_matchings)
+    for filter_by_labels in [None, ['A'], ['B', 'C']]:
+        if filter_by_labels is None:
+            table = bboxes_data_matchings_table
+            filtered_images_data_matchings = images_data_matchings
+        else:
+            table = bboxes_data_matchings_table.filter_by_true_labels(filter_by_labels)
+            filtered_images_data_matchings = [
+                ImageDataMatching(
+                    true_image_data=image_data_matching.true_image_data,
+                    pred_image_data=image_data_matching.pred_image_data,
+                    minimum_iou=image_data_matching.minimum_iou,
+                    bboxes_data_matchings=[
+                        BboxDataMatching(
+                            true_bbox_data=bbox_data_matching.true_bbox_data,
+                            pred_bbox_data=bbox_data_matching.pred_bbox_data
+                        )
+                        for bbox_data_matching in image_data_matching.bboxes_data_matchings
+                        if (
+                            bbox_data_matching.true_bbox_data is not None
+                            and bbox_data_matching.true_bbox_data.label in filter_by_labels
+                        )
+                    ]
+                )
+                for image_data_matching in images_data_matchings
+            ]
+        for label in labels + [None]:
+            errors_types = table.count_pipeline_errors_types(label=label)
+            pipeline_errors_types = [
+                error_type
+                for image_data_matching in filtered_images_data_matchings
+                for error_type in image_data_matching.get_pipeline_errors_types(label=label)
+            ]
+            for error_type in ["TP", "FP", "FN", "TP (extra bbox)", "FP (extra bbox)", "FN (extra bbox)"]:
+                assert errors_types[error_type] == pipeline_errors_types.count(error_type)
+            ious = [
+                bbox_data_matching.iou
+                for image_data_matching in filtered_images_data_matchings
+                for bbox_data_matching in image_data_matching.bboxes_data_matchings
+                if bbox_data_matching.iou is not None and (
+                    label is None or bbox_data_matching.true_bbox_data.label == label
+                )
+            ]
+            assert np.allclose(np.sort(table.get_ious(label=label)), np.sort(ious))
@@ -0,0 +1,109 @@
+import numpy as np
+
+from cv_pipeliner.core.data import BboxData, ImageData
+from cv_pipeliner.metrics.image_data_matching import ImageDataMatching
+from cv_pipeliner.utils.bboxes_index import BboxesIndex
+from cv_pipeliner.utils.images_datas import cut_images_data_by_bboxes
+
+
+def _get_random_bboxes(random_state: np.random.RandomState, n: int):
+    xmins = random_state.randint(0, 1000, size=n)
+    ymins = random_state.randint(0, 1000, size=n)
+    widths = random_state.randint(1, 150, size=n)
+    heights = random_state.randint(1, 150, size=n)
+    return np.stack([xmins, ymins, xmins + widths, ymins + heights], axis=1)
+
+
+def test_bboxes_index_queries():
+    random_state = np.random.RandomState(0)
+    bboxes = _get_random_bboxes(random_state, n=300)
+    bboxes_index = BboxesIndex(bboxes)
+    for region in _get_random_bboxes(random_state, n=50).tolist() + [[-10, -10, 2000, 2000], [5000, 5000, 5001, 5001]]:
+        xmin, ymin, xmax, ymax = region
+        intersects = np.flatnonzero(
+            (bboxes[:, 0] <= xmax) & (bboxes[:, 2] >= xmin) & (bboxes[:, 1] <= ymax) & (bboxes[:, 3] >= ymin)
+        )
+        inside = np.flatnonzero(
+            (bboxes[:, 0] >= xmin) & (bboxes[:, 2] <= xmax) & (bboxes[:, 1] >= ymin) & (bboxes[:, 3] <= ymax)
+        )
+        assert np.array_equal(bboxes_index.query_region(region, how='intersects'), intersects)
+        assert np.array_equal(bboxes_index.query_region(region, how='inside'), inside)
+    for x, y in random_state.randint(0, 1100, size=(50, 2)):
+        assert np.array_equal(
+            bboxes_index.query_point(x, y),
+            np.flatnonzero((bboxes[:, 0] <= x) & (bboxes[:, 2] >= x) & (bboxes[:, 1] <= y) & (bboxes[:, 3] >= y))
+        )
+    for idx in random_state.randint(0, len(bboxes), size=20):
+        assert np.array_equal(bboxes[bboxes_index.find_by_coords(bboxes[idx])], bboxes[idx])
+    assert bboxes_index.find_by_coords((-1, -1, -1, -1)) is None
+
+
+def test_bboxes_index_with_huge_bbox():
+    random_state = np.random.RandomState(2)
+    xymins = random_state.randint(0, 20000, size=(100, 2))
+    bboxes = np.concatenate([
+        np.concatenate([xymins, xymins + 2], axis=1),
+        [[0, 0, 20000, 20000]]
+    ])
+    bboxes_index = BboxesIndex(bboxes, max_cells_per_bbox=16)
+    for x, y in xymins[:20].tolist() + [[10000, 10000], [30000, 30000]]:
+        assert np.array_equal(
+            bboxes_index.query_point(x, y),
+            np.flatnonzero((bboxes[:, 0] <= x) & (bboxes[:, 2] >= x) & (bboxes[:, 1] <= y) & (bboxes[:, 3] >= y))
+        )
+    region = (5000, 5000, 5100, 5100)
+    assert bboxes_index.query_region(region, how='intersects').tolist()[-1] == 100
+    assert 100 not in bboxes_index.query_region(region, how='inside').tolist()
+    # the huge bbox is kept out of the grid (it would take 1e8 cells of the size 2)
+    assert bboxes_index._large_idxs.tolist() == [100]
+    assert sum(len(cell_idxs) for cell_idxs in bboxes_index._grid.values()) <= 4 * 100
+
+
+def test_image_data_matching_lookups():
+    random_state = np.random.RandomState(1)
+    true_image_data = ImageData(bboxes_data=[
+        BboxData(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax, label='a')
+        for xmin, ymin, xmax, ymax in _get_random_bboxes(random_state, n=50)
+    ])
+    pred_image_data = ImageData(bboxes_data=[
+        BboxData(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax, label='a')
+        for xmin, ymin, xmax, ymax in _get_random_bboxes(random_state, n=50)
+    ])
+    image_data_matching = ImageDataMatching(true_image_data, pred_image_data, minimum_iou=0.1)
+    for tag, image_data in [('true', true_image_data), ('pred', pred_image_data)]:
+        for bbox_data in image_data.bboxes_data:
+            bbox_data_matching = image_data_matching.find_bbox_data_matching(bbox_data, tag=tag)
+            assert (bbox_data_matching.true_bbox_data if tag == 'true' else bbox_data_matching.pred_bbox_data) is bbox_data
+        x, y = 500, 500
+        bboxes_data_matchings = image_data_matching.find_bboxes_data_matchings_by_point(x, y, tag=tag)
+        assert len(bboxes_data_matchings) == sum(
+            bbox_data.xmin <= x <= bbox_data.xmax and bbox_data.ymin <= y <= bbox_data.ymax
+            for bbox_data in image_data.bboxes_data
+        )
+
+
+def test_cut_images_data_by_bboxes():
+    random_state = np.random.RandomState(2)
+    images_data = [
+        ImageData(bboxes_data=[
+            BboxData(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax)
+            for xmin, ymin, xmax, ymax in _get_random_bboxes(random_state, n=100)
+        ])
+        for _ in range(5)
+    ]
+    cut_bboxes = [(0, 0, 500, 500), (200, 100, 900, 700), (300, 300, 310, 310), (-10, -10, 2000, 2000), (0, 0, 0, 0)]
+    cut_images_data = cut_images_data_by_bboxes(images_data, cut_bboxes)
+    assert sum(len(cut_image_data.bboxes_data) for cut_image_data in cut_images_data) > 0
+    for image_data, cut_image_data, (xmin, ymin, xmax, ymax) in zip(images_data, cut_images_data, cut_bboxes):
+        assert [
+            (bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax) for bbox_data in cut_image_data.bboxes_data
+        ] == [
+            (bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax)
+            for bbox_data in image_data.bboxes_data
+            if (
+                bbox_data.xmin >= xmin and bbox_data.xmin <= xmax
+                and bbox_data.xmax >= xmin and bbox_data.xmax <= xmax
+                and bbox_data.ymin >= ymin and bbox_data.ymin <= ymax
+                and bbox_data.ymax >= ymin and bbox_data.ymax <= ymax
+            )
+        ]
@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.metrics import confusion_matrix as sklearn_confusion_matrix, multilabel_confusion_matrix
+
+from cv_pipeliner.core.data import BboxData
+from cv_pipeliner.metrics.classification import (
+    get_labels_ids, get_sparse_confusion_matrix, get_classes_metrics_from_confusion_matrix,
+    get_df_top_confused_classes
+)
+
+class_names = ['A', 'B', 'C', 'D', 'E']
+
+
+def _get_random_labels(seed: int, n: int = 500):
+    random_state = np.random.RandomState(seed)
+    true_labels = random_state.choice(class_names, size=n)
+    pred_labels = np.where(random_state.rand(n) < 0.6, true_labels, random_state.choice(class_names, size=n))
+    return true_labels, pred_labels
+
+
+def test_sparse_confusion_matrix():
+    true_labels, pred_labels = _get_random_labels(seed=0)
+    confusion_matrix = get_sparse_confusion_matrix(
+        true_labels_ids=get_labels_ids(true_labels, class_names),
+        pred_labels_ids=get_labels_ids(pred_labels, class_names),
+        n_classes=len(class_names)
+    )
+    assert np.array_equal(
+        confusion_matrix.toarray(),
+        sklearn_confusion_matrix(y_true=true_labels, y_pred=pred_labels, labels=class_names)
+    )
+    classes_metrics = get_classes_metrics_from_confusion_matrix(confusion_matrix)
+    MMM = multilabel_confusion_matrix(y_true=true_labels, y_pred=pred_labels, labels=class_names)
+    assert np.array_equal(classes_metrics['TP'], MMM[:, 1, 1])
+    assert np.array_equal(classes_metrics['FP'], MMM[:, 0, 1])
+    assert np.array_equal(classes_metrics['FN'], MMM[:, 1, 0])
+    assert np.array_equal(classes_metrics['support'], [np.sum(true_labels == label) for label in class_names])
+
+
+def test_top_confused_classes():
+    true_labels, pred_labels = _get_random_labels(seed=1)
+    n_true_bboxes_data = [[BboxData(label=label) for label in true_labels]]
+    n_pred_bboxes_data = [[BboxData(label=label) for label in pred_labels]]
+    df_top_confused_classes = get_df_top_confused_classes(
+        n_true_bboxes_data=n_true_bboxes_data,
+        n_pred_bboxes_data=n_pred_bboxes_data,
+        top_k=5
+    )
+    dense_confusion_matrix = sklearn_confusion_matrix(y_true=true_labels, y_pred=pred_labels, labels=class_names)
+    np.fill_diagonal(dense_confusion_matrix, 0)
+    assert len(df_top_confused_classes) == 5
+    assert np.array_equal(
+        df_top_confused_classes['count'].values,
+        np.sort(dense_confusion_matrix.ravel())[::-1][:5]
+    )
+    for _, row in df_top_confused_classes.iterrows():
+        assert row['true_label'] != row['pred_label']
+        assert row['count'] == np.sum((true_labels == row['true_label']) & (pred_labels == row['pred_label']))
+        assert np.isclose(row['fraction_of_true_label'], row['count'] / np.sum(true_labels == row['true_label']))
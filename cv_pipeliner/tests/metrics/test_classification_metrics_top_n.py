@@ -0,0 +1,144 @@
+import numpy as np
+
+from cv_pipeliner.metrics.classification import (
+    get_labels_ids, get_precision_and_recall_top_n, get_precisions_and_recalls_top_n,
+    get_mean_expected_steps, get_mean_expected_steps_by_classes
+)
+
+class_names = ['A', 'B', 'C', 'D', 'E', 'F', 'other']
+known_class_names = ['A', 'B', 'C', 'D', 'E', 'F']
+
+
+def _get_random_classification(seed: int, n_images: int = 20):
+    random_state = np.random.RandomState(seed)
+    n_true_labels, n_pred_labels_top_n, n_pred_scores_top_n = [], [], []
+    for _ in range(n_images):
+        n_bboxes = random_state.randint(0, 15)
+        true_labels = np.array(random_state.choice(class_names, size=n_bboxes), dtype='<U5')
+        pred_labels_top_n = np.array([
+            random_state.permutation(known_class_names) for _ in range(n_bboxes)
+        ], dtype='<U5').reshape(n_bboxes, len(known_class_names))
+        pred_scores_top_n = -np.sort(-random_state.rand(n_bboxes, len(known_class_names)), axis=1)
+        n_true_labels.append(true_labels)
+        n_pred_labels_top_n.append(pred_labels_top_n)
+        n_pred_scores_top_n.append(pred_scores_top_n)
+    return n_true_labels, n_pred_labels_top_n, n_pred_scores_top_n
+
+
+def test_precisions_and_recalls_top_n():
+    n_true_labels, n_pred_labels_top_n, _ = _get_random_classification(seed=0)
+    true_labels = np.concatenate(n_true_labels)
+    pred_labels_top_n = np.concatenate(n_pred_labels_top_n)
+    true_labels_ids = get_labels_ids(true_labels, class_names)
+    pred_labels_ids_top_n = get_labels_ids(pred_labels_top_n, class_names)
+    for top_n in [1, 2, 3, 6]:
+        precisions_top_n, recalls_top_n = get_precisions_and_recalls_top_n(
+            true_labels_ids=true_labels_ids,
+            pred_labels_ids_top_n=pred_labels_ids_top_n,
+            n_classes=len(class_names),
+            top_n=top_n
+        )
+        for idx, class_name in enumerate(class_names):
+            precision_top_n, recall_top_n = get_precision_and_recall_top_n(
+                true_labels=true_labels,
+                pred_labels_top_n=pred_labels_top_n,
+                label=class_name,
+                top_n=top_n
+            )
+            assert np.isclose(precisions_top_n[idx], precision_top_n)
+            assert np.isclose(recalls_top_n[idx], recall_top_n)
+
+
+def test_mean_expected_steps_by_classes():
+    n_true_labels, n_pred_labels_top_n, n_pred_scores_top_n = _get_random_classification(seed=1)
+    images_ids = np.repeat(np.arange(len(n_true_labels)), [len(true_labels) for true_labels in n_true_labels])
+    for step_penalty in [3, 20]:
+        mean_expected_steps = get_mean_expected_steps_by_classes(
+            images_ids=images_ids,
+            true_labels_ids=get_labels_ids(np.concatenate(n_true_labels), class_names),
+            pred_labels_ids_top_n=get_labels_ids(np.concatenate(n_pred_labels_top_n), class_names),
+            pred_scores_top_n=np.concatenate(n_pred_scores_top_n),
+            n_classes=len(class_names),
+            step_penalty=step_penalty
+        )
+        for idx, class_name in enumerate(class_names):
+            assert np.isclose(
+                mean_expected_steps[idx],
+                get_mean_expected_steps(
+                    n_true_labels=n_true_labels,
+                    n_pred_labels_top_n=n_pred_labels_top_n,
+                    n_pred_scores_top_n=n_pred_scores_top_n,
+                    label=class_name,
+                    step_penalty=step_penalty
+                ),
+                equal_nan=True
+            )
+
+
+def test_mean_expected_steps_by_classes_top_n_less_than_n_classes():
+    n_true_labels = [np.array(['b', 'a', 'c'])]
+    n_pred_labels_top_n = [np.array([['c'], ['a'], ['a']])]
+    n_pred_scores_top_n = [np.array([[0.9], [0.8], [0.7]])]
+    mean_expected_steps = get_mean_expected_steps_by_classes(
+        images_ids=np.zeros(3, dtype=np.int64),
+        true_labels_ids=get_labels_ids(n_true_labels[0], ['a', 'b', 'c']),
+        pred_labels_ids_top_n=get_labels_ids(n_pred_labels_top_n[0], ['a', 'b', 'c']),
+        pred_scores_top_n=n_pred_scores_top_n[0],
+        n_classes=3,
+        step_penalty=20
+    )
+    # "a" is predicted for the 2nd (true "a") and the 3rd bboxes, the 2nd has the higher score
+    assert mean_expected_steps.tolist() == [1., 20., 20.]
+    for idx, class_name in enumerate(['a', 'b', 'c']):
+        assert get_mean_expected_steps(
+            n_true_labels, n_pred_labels_top_n, n_pred_scores_top_n, label=class_name, step_penalty=20
+        ) == mean_expected_steps[idx]
+
+    n_true_labels, n_pred_labels_top_n, n_pred_scores_top_n = _get_random_classification(seed=2)
+    n_pred_labels_top_n = [pred_labels_top_n[:, :2] for pred_labels_top_n in n_pred_labels_top_n]
+    n_pred_scores_top_n = [pred_scores_top_n[:, :2] for pred_scores_top_n in n_pred_scores_top_n]
+    images_ids = np.repeat(np.arange(len(n_true_labels)), [len(true_labels) for true_labels in n_true_labels])
+    mean_expected_steps = get_mean_expected_steps_by_classes(
+        images_ids=images_ids,
+        true_labels_ids=get_labels_ids(np.concatenate(n_true_labels), class_names),
+        pred_labels_ids_top_n=get_labels_ids(np.concatenate(n_pred_labels_top_n), class_names),
+        pred_scores_top_n=np.concatenate(n_pred_scores_top_n),
+        n_classes=len(class_names),
+        step_penalty=5
+    )
+    for idx, class_name in enumerate(known_class_names):
+        assert np.isclose(
+            mean_expected_steps[idx],
+            get_mean_expected_steps(
+                n_true_labels=n_true_labels,
+                n_pred_labels_top_n=n_pred_labels_top_n,
+                n_pred_scores_top_n=n_pred_scores_top_n,
+                label=class_name,
+                step_penalty=5
+            )
+        )
+
+
+def test_precisions_and_recalls_top_n_with_repeated_labels():
+    true_labels_ids = np.array([0, 1, 0])
+    pred_labels_ids_top_n = np.array([
+        [0, 0, 1],  # "0" is repeated: recommended once
+        [1, 1, 1],
+        [2, 0, 0]
+    ])
+    precisions_top_n, recalls_top_n = get_precisions_and_recalls_top_n(
+        true_labels_ids=true_labels_ids,
+        pred_labels_ids_top_n=pred_labels_ids_top_n,
+        n_classes=3,
+        top_n=3
+    )
+    assert precisions_top_n.tolist() == [1., 0.5, 0.]
+    assert recalls_top_n.tolist() == [1., 1., 0.]
+    for idx in range(3):
+        precision_top_n, recall_top_n = get_precision_and_recall_top_n(
+            true_labels=true_labels_ids.tolist(),
+            pred_labels_top_n=pred_labels_ids_top_n.tolist(),
+            label=idx,
+            top_n=3
+        )
+        assert (precisions_top_n[idx], recalls_top_n[idx]) == (precision_top_n, recall_top_n)
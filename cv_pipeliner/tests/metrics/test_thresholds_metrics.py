@@ -0,0 +1,93 @@
+import numpy as np
+
+from cv_pipeliner.core.data import BboxData, ImageData
+from cv_pipeliner.metrics.detection import get_df_detection_metrics
+from cv_pipeliner.metrics.pipeline import get_df_pipeline_metrics
+from cv_pipeliner.metrics.thresholds import (
+    get_df_detection_metrics_by_thresholds, get_df_pipeline_metrics_by_thresholds, get_df_optimal_scores_thresholds
+)
+
+labels = ['A', 'B', 'Z']
+
+
+def _get_images_data(seed: int):
+    random_state = np.random.RandomState(seed)
+    true_images_data, raw_pred_images_data = [], []
+    for _ in range(5):
+        true_bboxes_data, pred_bboxes_data = [], []
+        for i in range(4):
+            for j in range(4):
+                xmin, ymin = 100 * i, 100 * j
+                true_label = labels[random_state.randint(len(labels))]
+                if random_state.rand() < 0.8:
+                    true_bboxes_data.append(BboxData(
+                        xmin=xmin, ymin=ymin, xmax=xmin+50, ymax=ymin+50, label=true_label
+                    ))
+                if random_state.rand() < 0.8:
+                    pred_label = true_label if random_state.rand() < 0.7 else labels[random_state.randint(len(labels))]
+                    shift = random_state.randint(0, 10)
+                    pred_bboxes_data.append(BboxData(
+                        xmin=xmin+shift, ymin=ymin+shift, xmax=xmin+50+shift, ymax=ymin+50+shift,
+                        label=pred_label,
+                        detection_score=round(random_state.rand(), 3)
+                    ))
+        true_images_data.append(ImageData(bboxes_data=true_bboxes_data))
+        raw_pred_images_data.append(ImageData(bboxes_data=pred_bboxes_data))
+    return true_images_data, raw_pred_images_data
+
+
+def _get_pred_images_data_by_threshold(raw_pred_images_data, score_threshold):
+    return [
+        ImageData(bboxes_data=[
+            bbox_data for bbox_data in image_data.bboxes_data
+            if bbox_data.detection_score > score_threshold
+        ])
+        for image_data in raw_pred_images_data
+    ]
+
+
+def test_metrics_by_thresholds():
+    true_images_data, raw_pred_images_data = _get_images_data(seed=42)
+    scores_thresholds = [0., 0.25, 0.5, 0.75, 0.9]
+    df_detection_metrics_by_thresholds = get_df_detection_metrics_by_thresholds(
+        true_images_data=true_images_data,
+        raw_pred_images_data=raw_pred_images_data,
+        minimum_iou=0.5,
+        scores_thresholds=scores_thresholds
+    )
+    df_pipeline_metrics_by_thresholds = get_df_pipeline_metrics_by_thresholds(
+        true_images_data=true_images_data,
+        raw_pred_images_data=raw_pred_images_data,
+        minimum_iou=0.5,
+        scores_thresholds=scores_thresholds
+    )
+    for score_threshold in scores_thresholds:
+        pred_images_data = _get_pred_images_data_by_threshold(raw_pred_images_data, score_threshold)
+        df_detection_metrics = get_df_detection_metrics(
+            true_images_data=true_images_data,
+            pred_images_data=pred_images_data,
+            minimum_iou=0.5
+        )
+        for column in ['TP', 'FP', 'FN', 'precision', 'recall']:
+            assert np.isclose(
+                df_detection_metrics.loc[column, 'value'],
+                df_detection_metrics_by_thresholds.loc[score_threshold, column]
+            )
+        df_pipeline_metrics = get_df_pipeline_metrics(
+            true_images_data=true_images_data,
+            pred_images_data=pred_images_data,
+            minimum_iou=0.5,
+            extra_bbox_label=None,
+            pseudo_class_names=[]
+        )
+        for class_name in labels:
+            for column in ['TP', 'precision', 'recall']:
+                assert np.isclose(
+                    df_pipeline_metrics.loc[class_name, column],
+                    df_pipeline_metrics_by_thresholds.loc[(class_name, score_threshold), column]
+                )
+
+    df_optimal_scores_thresholds = get_df_optimal_scores_thresholds(df_pipeline_metrics_by_thresholds)
+    for class_name in labels + ['all']:
+        f1_scores = df_pipeline_metrics_by_thresholds.loc[class_name, 'f1_score']
+        assert np.isclose(df_optimal_scores_thresholds.loc[class_name, 'f1_score'], f1_scores.max())
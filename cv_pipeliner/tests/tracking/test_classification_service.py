@@ -0,0 +1,113 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Tuple, Type
+
+import numpy as np
+
+from cv_pipeliner.inference_models.classification.core import (
+    ClassificationModelSpec, ClassificationModel, ClassificationInput, ClassificationOutput
+)
+from cv_pipeliner.tracking.classification_service import TrackClassificationService
+
+
+@dataclass
+class MeanColorClassificationModelSpec(ClassificationModelSpec):
+    '''
+    Labels crops by their mean value, every predict takes the given time.
+    '''
+    predict_time: float = 0.01
+
+    @property
+    def inference_model_cls(self) -> Type['MeanColorClassificationModel']:
+        return MeanColorClassificationModel
+
+
+class MeanColorClassificationModel(ClassificationModel):
+    def __init__(self, model_spec: MeanColorClassificationModelSpec):
+        super().__init__(model_spec)
+        self.batches_sizes = []
+
+    def predict(self, input: ClassificationInput, top_n: int = 1) -> ClassificationOutput:
+        time.sleep(self.model_spec.predict_time)
+        self.batches_sizes.append(len(input))
+        labels = [str(int(cropped_image.mean())) for cropped_image in input]
+        return [[label] for label in labels], [[1.] for _ in labels]
+
+    def preprocess_input(self, input: List[np.ndarray]) -> ClassificationInput:
+        return input
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        return (None, None)
+
+    @property
+    def class_names(self) -> List[str]:
+        return [str(i) for i in range(256)]
+
+
+def _wait_results(service: TrackClassificationService, n: int, timeout: float = 5.):
+    results = []
+    started_at = time.perf_counter()
+    while len(results) < n and time.perf_counter() - started_at < timeout:
+        results.extend(service.get_ready_results())
+        time.sleep(0.001)
+    return results
+
+
+def test_track_classification_service_micro_batches():
+    model = MeanColorClassificationModelSpec(predict_time=0.05).load()
+    with TrackClassificationService(model, batch_size=8, max_batch_delay=0.02, latency_budget=10.) as service:
+        started_at = time.perf_counter()
+        for track_id in range(40):
+            assert service.submit(track_id, np.full((4, 4, 3), track_id), frame_idx=track_id // 4)
+        # submitting doesn't wait for the classifier
+        assert time.perf_counter() - started_at < 0.05
+        # already pending tracks are not submitted twice
+        assert service.is_pending(39)
+        assert not service.submit(39, np.full((4, 4, 3), 39), frame_idx=10)
+        results = _wait_results(service, n=40)
+    assert sorted((result.track_id, result.label) for result in results) == [
+        (track_id, str(track_id)) for track_id in range(40)
+    ]
+    assert all(result.frame_idx == result.track_id // 4 for result in results)
+    # requests that came while the model was busy are batched together
+    assert max(model.batches_sizes) == 8
+    assert len(model.batches_sizes) < 40
+    assert service.stats.n_classified == 40
+    assert not any(service.is_pending(track_id) for track_id in range(40))
+
+
+def test_track_classification_service_latency_budget():
+    model = MeanColorClassificationModelSpec(predict_time=0.1).load()
+    with TrackClassificationService(model, batch_size=1, max_batch_delay=0., latency_budget=0.05) as service:
+        for track_id in range(5):
+            service.submit(track_id, np.zeros((4, 4, 3)), frame_idx=0)
+        results = _wait_results(service, n=5, timeout=1.)
+    # the first request is classified at once, the others wait longer than the budget behind it
+    assert [result.track_id for result in results] == [0]
+    assert service.stats.n_expired == 4
+    assert not any(service.is_pending(track_id) for track_id in range(5))
+
+
+def test_track_classification_service_restarts_from_clean_state():
+    model = MeanColorClassificationModelSpec(predict_time=0.3).load()
+    service = TrackClassificationService(model, batch_size=1, max_batch_delay=0., latency_budget=10., max_queue_size=2)
+    service.start()
+    for track_id in range(3):
+        assert service.submit(track_id, np.full((4, 4, 3), track_id), frame_idx=0)
+        while track_id == 0 and not service.requests_queue.empty():
+            time.sleep(0.001)
+    # the first crop is being classified and the queue is full: stop doesn't need a place in the queue
+    assert service.requests_queue.full()
+    stop_thread = threading.Thread(target=service.stop)
+    stop_thread.start()
+    stop_thread.join(timeout=5.)
+    assert not stop_thread.is_alive()
+    assert service.requests_queue.empty() and service.results_queue.empty()
+    assert not any(service.is_pending(track_id) for track_id in range(3))
+
+    with service:
+        assert service.submit(1, np.full((4, 4, 3), 1), frame_idx=1)
+        results = _wait_results(service, n=1)
+    assert [(result.track_id, result.frame_idx) for result in results] == [(1, 1)]
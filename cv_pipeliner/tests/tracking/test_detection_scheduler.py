@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from cv_pipeliner.tracking.detection_scheduler import (
+    FixedRateDetectionScheduler, AdaptiveDetectionScheduler, get_scene_change, get_thumbnail
+)
+
+
+def _run_scheduler(scheduler, frames, fps, tracker_confidences=None, detection_time=0.):
+    scheduler.reset(fps=fps)
+    detection_frames_idxs = []
+    for frame_idx, frame in enumerate(frames):
+        confidences = tracker_confidences[frame_idx] if tracker_confidences is not None else None
+        if scheduler.should_detect(frame_idx=frame_idx, frame=frame, tracker_confidences=confidences):
+            scheduler.on_detection(frame_idx=frame_idx, frame=frame, detection_time=detection_time)
+            detection_frames_idxs.append(frame_idx)
+    return detection_frames_idxs
+
+
+@pytest.mark.parametrize('fps, detection_delay, expected_n_detections', [
+    (30, 300, 10),
+    (29.97, 300, 10),
+    (25, 100, 30),
+    (23.976, 1000, 3),
+])
+def test_fixed_rate_detection_scheduler(fps, detection_delay, expected_n_detections):
+    n_frames = int(round(3 * fps))  # 3 seconds
+    detection_frames_idxs = _run_scheduler(FixedRateDetectionScheduler(detection_delay), [None] * n_frames, fps)
+    # with float modulo, non-integer fps gave the only detection at the first frame
+    assert len(detection_frames_idxs) == expected_n_detections
+    # the first frame of every detection_delay ms
+    assert detection_frames_idxs == [
+        int(np.ceil(k * detection_delay * fps / 1000 - 1e-6)) for k in range(expected_n_detections)
+    ]
+
+
+def _get_frames(n_frames: int, cuts_frames_idxs):
+    random_state = np.random.RandomState(0)
+    scenes = [
+        np.kron(random_state.randint(0, 256, size=(9, 16, 3)), np.ones((10, 10, 1))).astype(np.uint8)
+        for _ in range(len(cuts_frames_idxs) + 1)
+    ]
+    frames = []
+    for frame_idx in range(n_frames):
+        scene_idx = np.searchsorted(cuts_frames_idxs, frame_idx, side='right')
+        noise = random_state.randint(-3, 4, size=scenes[scene_idx].shape)
+        frames.append(np.clip(scenes[scene_idx].astype(int) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+@pytest.mark.parametrize('scene_change_metric', ['frame_difference', 'histogram'])
+def test_scene_change(scene_change_metric):
+    frames = _get_frames(3, cuts_frames_idxs=[2])
+    thumbnails = [get_thumbnail(frame) for frame in frames]
+    assert thumbnails[0].shape == (36, 64)
+    same_scene = get_scene_change(thumbnails[0], thumbnails[1], metric=scene_change_metric)
+    other_scene = get_scene_change(thumbnails[0], thumbnails[2], metric=scene_change_metric)
+    assert same_scene < other_scene
+
+
+def test_adaptive_detection_scheduler_scene_changes():
+    frames = _get_frames(100, cuts_frames_idxs=[17, 60])
+    scheduler = AdaptiveDetectionScheduler(
+        max_detection_delay=1000, scene_change_threshold=0.1, min_tracker_confidence=0.5
+    )
+    # scene cuts and forced detection after max_detection_delay (25 frames)
+    assert _run_scheduler(scheduler, frames, fps=25) == [0, 17, 42, 60, 85]
+    tracker_confidences = [np.array([0.9, 0.8])] * 100
+    tracker_confidences[30] = np.array([0.1, 0.2])
+    assert _run_scheduler(scheduler, frames, fps=25, tracker_confidences=tracker_confidences) == [
+        0, 17, 30, 55, 60, 85
+    ]
+    # the same scheduler on the video with other fps: max_detection_delay is 50 frames
+    assert _run_scheduler(scheduler, frames, fps=50) == [0, 17, 60]
+
+
+def test_adaptive_detection_scheduler_latency_budget():
+    frames = _get_frames(100, cuts_frames_idxs=list(range(1, 100)))  # the scene changes every frame
+    scheduler = AdaptiveDetectionScheduler(min_detection_delay=0, max_detection_delay=1000)
+    assert len(_run_scheduler(scheduler, frames, fps=25, detection_time=0.04)) == 100
+    # 10 ms per frame for detections of 40 ms
+    scheduler = AdaptiveDetectionScheduler(min_detection_delay=0, max_detection_delay=1000, latency_budget=10)
+    detection_frames_idxs = _run_scheduler(scheduler, frames, fps=25, detection_time=0.04)
+    assert 20 <= len(detection_frames_idxs) <= 30
+    assert np.all(np.diff(detection_frames_idxs) <= 25)
+
+
+def test_adaptive_detection_scheduler_min_delay():
+    frames = _get_frames(100, cuts_frames_idxs=list(range(1, 100)))
+    scheduler = AdaptiveDetectionScheduler(min_detection_delay=200, max_detection_delay=1000)
+    assert _run_scheduler(scheduler, frames, fps=25) == list(range(0, 100, 5))
+    with pytest.raises(AssertionError):
+        AdaptiveDetectionScheduler().should_detect(frame_idx=0, frame=frames[0])
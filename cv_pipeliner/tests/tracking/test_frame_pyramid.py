@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from cv_pipeliner.tracking.frame_pyramid import FramePyramid, get_fit_scale, scale_bboxes
+
+
+def test_get_fit_scale():
+    assert get_fit_scale((1080, 1920, 3), max_width=640, max_height=1152) == pytest.approx(1 / 3)
+    assert get_fit_scale((1920, 1080, 3), max_width=640, max_height=1152) == pytest.approx(640 / 1080)
+    # frames are never upscaled
+    assert get_fit_scale((360, 640, 3), max_width=1280, max_height=1280) == 1.
+    assert get_fit_scale((360, 640, 3)) == 1.
+
+
+def test_frame_pyramid_levels_are_computed_once():
+    frame = np.kron(np.arange(12, dtype=np.uint8).reshape(3, 4), np.ones((40, 40), dtype=np.uint8))
+    pyramid = FramePyramid(frame)
+    assert pyramid.get_level(1.) is frame
+    level = pyramid.get_level(0.5)
+    assert level.shape == (60, 80)
+    assert pyramid.get_level(0.5) is level
+    # smaller levels are computed from the nearest bigger one
+    assert pyramid.get_level(0.25).shape == (30, 40)
+    assert np.array_equal(pyramid.get_level(0.025), np.arange(12).reshape(3, 4))
+    assert sorted(pyramid.levels) == [0.025, 0.25, 0.5, 1.]
+    with pytest.raises(AssertionError):
+        pyramid.get_level(2.)
+
+
+def test_scale_bboxes_maps_between_levels():
+    bboxes = np.array([[30, 60, 90, 120]])
+    level_bboxes = scale_bboxes(bboxes, 0.5)
+    assert np.array_equal(level_bboxes, [[15, 30, 45, 60]])
+    assert np.array_equal(scale_bboxes(level_bboxes, 1 / 0.5), bboxes)
+    assert scale_bboxes(np.array([]), 0.5).shape == (0, 4)
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+
+from cv_pipeliner.tracking.lk_tracker import LKTracker
+from cv_pipeliner.tracking.vectorized_sort_tracker import iou_matrix
+
+
+def _get_textured_image(random_state: np.random.RandomState, height: int, width: int) -> np.ndarray:
+    noise = random_state.randint(0, 256, size=(height // 4, width // 4, 3)).astype(np.uint8)
+    return cv2.GaussianBlur(cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR), (5, 5), 0)
+
+
+def _get_video(n_frames: int = 20, n_objects: int = 6, size: int = 60):
+    '''
+    Textured objects moving with constant velocities over the static textured background.
+    '''
+    random_state = np.random.RandomState(0)
+    background = _get_textured_image(random_state, 480, 640) // 2
+    patches = [_get_textured_image(random_state, size, size) for _ in range(n_objects)]
+    xymins = np.stack([np.arange(n_objects) * 100 + 20, np.full(n_objects, 150)], axis=1).astype(float)
+    # objects don't overlap
+    velocities = np.column_stack([random_state.uniform(-1, 1, n_objects), random_state.uniform(-3, 3, n_objects)])
+    frames, frames_bboxes = [], []
+    for frame_idx in range(n_frames):
+        frame = background.copy()
+        frame_xymins = (xymins + velocities * frame_idx).round().astype(int)
+        for patch, (xmin, ymin) in zip(patches, frame_xymins):
+            frame[ymin:ymin+size, xmin:xmin+size] = patch
+        frames.append(frame)
+        frames_bboxes.append(np.column_stack([frame_xymins, frame_xymins + size]))
+    return frames, frames_bboxes
+
+
+def test_lk_tracker_follows_moving_objects():
+    frames, frames_bboxes = _get_video()
+    lk_tracker = LKTracker(frames_bboxes[0], frames[0], scale=0.5)
+    for frame, bboxes in zip(frames[1:], frames_bboxes[1:]):
+        tracked_bboxes = lk_tracker.update(frame)
+        assert tracked_bboxes.shape == bboxes.shape
+        assert np.all(np.diag(iou_matrix(tracked_bboxes, bboxes)) > 0.8)
+        assert np.all(lk_tracker.confidences > 0.5)
+
+
+def test_lk_tracker_confidence_drops_when_object_disappears():
+    frames, frames_bboxes = _get_video(n_frames=2)
+    random_state = np.random.RandomState(1)
+    next_frame = frames[1].copy()
+    xmin, ymin, xmax, ymax = frames_bboxes[1][0]
+    next_frame[ymin:ymax, xmin:xmax] = _get_textured_image(random_state, ymax - ymin, xmax - xmin)
+    lk_tracker = LKTracker(frames_bboxes[0], frames[0], scale=0.5)
+    lk_tracker.update(next_frame)
+    assert lk_tracker.confidences[0] < lk_tracker.confidences[1:].min()
+
+
+def test_lk_tracker_without_bboxes():
+    frames, _ = _get_video(n_frames=2)
+    lk_tracker = LKTracker(np.array([]), frames[0])
+    assert lk_tracker.update(frames[1]).shape == (0, 4)
+    assert len(lk_tracker.confidences) == 0
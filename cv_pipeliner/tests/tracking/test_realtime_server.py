@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+
+from cv_pipeliner.tests.fake_models import BrightBlobsDetectionModelSpec, RedChannelClassificationModelSpec
+from cv_pipeliner.tracking.realtime_server import RealTimeServer
+
+
+def _get_frame(frame_idx: int, red: int) -> np.ndarray:
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    xmin = 20 + 2 * frame_idx
+    frame[100:150, xmin:xmin+50] = (red, 255, 255)
+    return frame
+
+
+def _predict_until_labeled(server: RealTimeServer, session_id: str, red: int, n_frames: int = 50):
+    for frame_idx in range(n_frames):
+        bboxes_data = server.predict_on_frame(session_id, _get_frame(frame_idx, red), detection_score_threshold=0.5)
+        if bboxes_data:
+            return frame_idx, bboxes_data
+        time.sleep(0.005)
+    return None, []
+
+
+def test_realtime_server_sessions_share_models():
+    detection_model = BrightBlobsDetectionModelSpec().load()
+    with RealTimeServer([detection_model], RedChannelClassificationModelSpec().load()) as server:
+        assert server.start_session('a', fps=30, detection_delay=100)
+        assert server.start_session('b', fps=30, detection_delay=100)
+        assert not server.start_session('a', fps=30, detection_delay=100)
+        _, bboxes_data_a = _predict_until_labeled(server, 'a', red=200)
+        _, bboxes_data_b = _predict_until_labeled(server, 'b', red=120)
+        # results of the shared classifier come to their sessions
+        assert [bbox_data.label for bbox_data in bboxes_data_a] == ['200']
+        assert [bbox_data.label for bbox_data in bboxes_data_b] == ['100']
+        assert server.end_session('a')
+        assert not server.end_session('a')
+    assert server.stats.n_started_sessions == 2
+    assert server.stats.n_rejected_sessions == 1
+
+
+def test_realtime_server_tracks_between_detections():
+    with RealTimeServer(
+        [BrightBlobsDetectionModelSpec().load()], RedChannelClassificationModelSpec().load()
+    ) as server:
+        server.start_session('a', fps=10, detection_delay=1000)
+        labeled_frame_idx, _ = _predict_until_labeled(server, 'a', red=255)
+        for frame_idx in range(labeled_frame_idx + 1, 9):
+            bboxes_data = server.predict_on_frame('a', _get_frame(frame_idx, 255), detection_score_threshold=0.5)
+            assert len(bboxes_data) == 1
+            assert abs(bboxes_data[0].xmin - (20 + 2 * frame_idx)) <= 2
+    assert server.stats.n_detections == 1
+
+
+def test_realtime_server_backpressure():
+    with RealTimeServer(
+        [BrightBlobsDetectionModelSpec().load()], RedChannelClassificationModelSpec().load(),
+        max_detection_wait=0.01
+    ) as server:
+        server.start_session('a', fps=30, detection_delay=100)
+        # the previous frame of the session is still processed
+        with server.sessions['a'].lock:
+            assert server.predict_on_frame('a', _get_frame(0, 255), detection_score_threshold=0.5) is None
+        assert server.stats.n_dropped_frames == 1
+        # all detection models are busy, detection is postponed to the next frame
+        detection_model = server._detection_models_pool.get()
+        assert server.predict_on_frame('a', _get_frame(0, 255), detection_score_threshold=0.5) == []
+        assert server.stats.n_postponed_detections == 1
+        server._detection_models_pool.put(detection_model)
+        server.predict_on_frame('a', _get_frame(1, 255), detection_score_threshold=0.5)
+        assert server.stats.n_detections == 1
+
+
+def test_realtime_server_evicts_idle_sessions():
+    with RealTimeServer(
+        [BrightBlobsDetectionModelSpec().load()], RedChannelClassificationModelSpec().load(),
+        max_sessions=2, session_timeout=0.05
+    ) as server:
+        assert server.start_session('a', fps=30, detection_delay=100)
+        assert server.start_session('b', fps=30, detection_delay=100)
+        assert not server.start_session('c', fps=30, detection_delay=100)
+        for _ in range(10):
+            server.predict_on_frame('b', _get_frame(0, 255), detection_score_threshold=0.5)
+            time.sleep(0.01)
+        assert server.start_session('c', fps=30, detection_delay=100)
+        assert sorted(server.sessions) == ['b', 'c']
+    assert server.stats.n_evicted_sessions == 1
@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pytest
+
+from cv_pipeliner.tracking.video_inferencer import open_video_frames
+from cv_pipeliner.utils.streaming import (
+    StageStats, collect_micro_batch, stream_through_stages, get_df_stages_stats
+)
+
+
+def test_stream_through_stages_is_lazy_and_ordered():
+    n_frames = 1000
+    n_produced = [0]
+    max_in_flight = [0]
+    lock = threading.Lock()
+
+    def frames_gen():
+        for frame_idx in range(n_frames):
+            with lock:
+                n_produced[0] += 1
+            yield np.full((4, 4, 3), frame_idx % 256, dtype=np.uint8)
+
+    fps, frames = open_video_frames(frames_gen(), fps=30)
+    assert fps == 30
+    results = []
+    for frame_idx, (idx, mean) in enumerate(stream_through_stages(
+        items=enumerate(frames),
+        stages=[
+            lambda idx_and_frame: (idx_and_frame[0], idx_and_frame[1] + 1),
+            lambda idx_and_frame: (idx_and_frame[0], float(idx_and_frame[1].mean()))
+        ],
+        queue_size=2
+    )):
+        with lock:
+            max_in_flight[0] = max(max_in_flight[0], n_produced[0] - frame_idx)
+        results.append((idx, mean))
+    assert results == [(idx, float((idx + 1) % 256)) for idx in range(n_frames)]
+    # bounded queues: source can't run ahead of the consumer by more than the queues sizes
+    assert max_in_flight[0] <= 3 * 2 + 4
+
+
+def test_stream_through_stages_raises_stage_errors():
+    def fail(item):
+        if item == 5:
+            raise RuntimeError("bad frame")
+        return item
+
+    def endless():
+        idx = 0
+        while True:
+            yield idx
+            idx += 1
+
+    with pytest.raises(RuntimeError, match="bad frame"):
+        for _ in stream_through_stages(endless(), stages=[fail], queue_size=1):
+            pass
+
+
+def test_stream_through_stages_stats():
+    def sleep(seconds):
+        def func(item):
+            time.sleep(seconds)
+            return item
+        return func
+
+    stages_stats = {}
+    started_at = time.perf_counter()
+    results = list(stream_through_stages(
+        items=range(20),
+        stages={'fast': sleep(0.001), 'slow_a': sleep(0.02), 'slow_b': sleep(0.02)},
+        stages_stats=stages_stats,
+        source_name='decode'
+    ))
+    elapsed = time.perf_counter() - started_at
+    assert results == list(range(20))
+    assert list(stages_stats) == ['decode', 'fast', 'slow_a', 'slow_b']
+    assert all(isinstance(stage_stats, StageStats) for stage_stats in stages_stats.values())
+    assert all(stage_stats.n_items == 20 for stage_stats in stages_stats.values())
+    assert stages_stats['slow_a'].busy_time >= 20 * 0.02
+    assert stages_stats['fast'].throughput > stages_stats['slow_a'].throughput
+    # slow stages run concurrently
+    assert elapsed < stages_stats['slow_a'].busy_time + stages_stats['slow_b'].busy_time
+    df_stages_stats = get_df_stages_stats(stages_stats)
+    assert list(df_stages_stats.index) == list(stages_stats)
+    assert df_stages_stats.loc['slow_b', 'n_items'] == 20
+
+
+@dataclass
+class _Request:
+    idx: int
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+def test_collect_micro_batch():
+    requests_queue, stop_event = queue.Queue(maxsize=4), threading.Event()
+    for idx in range(4):
+        requests_queue.put(_Request(idx))
+    batch = collect_micro_batch(requests_queue, stop_event, max_batch_size=3, max_batch_delay=1.)
+    assert [request.idx for request in batch] == [0, 1, 2]
+    # the batch is not full: it is sent after max_batch_delay
+    started_at = time.perf_counter()
+    batch = collect_micro_batch(requests_queue, stop_event, max_batch_size=3, max_batch_delay=0.1)
+    assert [request.idx for request in batch] == [3]
+    assert 0.05 < time.perf_counter() - started_at < 1.
+    # waiting for the first request ends at stop
+    threading.Timer(0.1, stop_event.set).start()
+    assert collect_micro_batch(requests_queue, stop_event, max_batch_size=3, max_batch_delay=1.) is None
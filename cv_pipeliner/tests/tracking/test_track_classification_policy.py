@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from cv_pipeliner.tracking.track_classification_policy import (
+    TrackClassificationPolicy, TracksClassificationVoting, get_crop_quality
+)
+
+
+def _get_crop(random_state: np.random.RandomState, size: int, sharp: bool):
+    if sharp:
+        return random_state.randint(0, 256, size=(size, size, 3)).astype(np.uint8)
+    return np.full((size, size, 3), 128, dtype=np.uint8)
+
+
+def test_crop_quality():
+    random_state = np.random.RandomState(0)
+    assert get_crop_quality(_get_crop(random_state, 32, sharp=True)) > get_crop_quality(
+        _get_crop(random_state, 32, sharp=False)
+    )
+    assert get_crop_quality(_get_crop(random_state, 64, sharp=True)) > get_crop_quality(
+        _get_crop(random_state, 16, sharp=True)
+    )
+
+
+def test_voting_buffers_best_crops_with_spacing():
+    random_state = np.random.RandomState(1)
+    voting = TracksClassificationVoting(TrackClassificationPolicy(
+        min_frames_between_crops=5, min_crop_size=8, n_crops_per_classification=2
+    ))
+    assert voting.add_crop(1, _get_crop(random_state, 16, sharp=True), frame_idx=0)
+    assert not voting.add_crop(1, _get_crop(random_state, 16, sharp=True), frame_idx=3)  # too early
+    assert not voting.add_crop(2, _get_crop(random_state, 4, sharp=True), frame_idx=3)  # too small
+    # the first classification goes with the first crop
+    assert [(track_id, track_crop.frame_idx) for track_id, track_crop in voting.pop_crops_to_classify()] == [(1, 0)]
+    voting.add_prediction(1, ['a', 'b'], [0.5, 0.3])
+
+    assert voting.add_crop(1, _get_crop(random_state, 16, sharp=False), frame_idx=5)
+    assert voting.pop_crops_to_classify() == []  # waits for n_crops_per_classification crops
+    assert voting.add_crop(1, _get_crop(random_state, 32, sharp=True), frame_idx=10)
+    assert voting.add_crop(1, _get_crop(random_state, 8, sharp=False), frame_idx=15)
+    tracks_crops = voting.pop_crops_to_classify(exclude_tracks_ids=[1])
+    assert tracks_crops == []
+    tracks_crops = voting.pop_crops_to_classify()
+    assert [(track_id, track_crop.frame_idx) for track_id, track_crop in tracks_crops] == [(1, 10)]
+    assert voting.tracks_states[1].crops == []
+
+
+def test_voting_returns_not_submitted_crops():
+    random_state = np.random.RandomState(2)
+    voting = TracksClassificationVoting(TrackClassificationPolicy(n_crops_per_classification=2))
+    voting.add_crop(1, _get_crop(random_state, 16, sharp=True), frame_idx=0)
+    (track_id, track_crop), = voting.pop_crops_to_classify()
+    # e.g. the classifier queue is full: the crop is classified later
+    voting.return_crop(track_id, track_crop)
+    assert voting.pop_crops_to_classify() == [(1, track_crop)]
+    voting.add_prediction(1, ['a'], [0.5])
+
+    voting.add_crop(1, _get_crop(random_state, 32, sharp=True), frame_idx=1)
+    voting.add_crop(1, _get_crop(random_state, 16, sharp=False), frame_idx=2)
+    (_, track_crop), = voting.pop_crops_to_classify()
+    voting.add_crop(1, _get_crop(random_state, 8, sharp=False), frame_idx=3)
+    voting.return_crop(1, track_crop)
+    # the returned crop is still the best one and the buffer keeps n_crops_per_classification crops
+    assert [crop.frame_idx for crop in voting.tracks_states[1].crops] == [3, 1]
+    assert voting.pop_crops_to_classify() == [(1, track_crop)]
+
+    voting.remove_track(1)
+    voting.return_crop(1, track_crop)
+    assert 1 not in voting.tracks_states
+
+
+@pytest.mark.parametrize('aggregation, expected_label, expected_confidence', [
+    ('mean', 'b', (0.4 + 0.9 + 0.8) / 3),
+    ('max', 'b', 0.9),
+    ('vote', 'b', (1 + 2 + 2) / 6),
+])
+def test_voting_aggregation(aggregation, expected_label, expected_confidence):
+    voting = TracksClassificationVoting(TrackClassificationPolicy(
+        top_n=2, aggregation=aggregation, confidence_threshold=1.1, max_classifications=10
+    ))
+    for labels_top_n, scores_top_n in [(['a', 'b'], [0.6, 0.4]), (['b', 'c'], [0.9, 0.1]), (['b', 'a'], [0.8, 0.2])]:
+        label, confidence = voting.add_prediction(7, labels_top_n, scores_top_n)
+    assert label == expected_label
+    assert confidence == pytest.approx(expected_confidence)
+    assert voting.get_label(7) == (label, confidence)
+
+
+def test_voting_stops_when_confident():
+    random_state = np.random.RandomState(2)
+    voting = TracksClassificationVoting(TrackClassificationPolicy(
+        n_crops_per_classification=1, confidence_threshold=0.8, min_classifications=2, max_classifications=4
+    ))
+    n_classifications = {1: 0, 2: 0}
+    for frame_idx in range(20):
+        for track_id in [1, 2]:
+            voting.add_crop(track_id, _get_crop(random_state, 16, sharp=True), frame_idx=frame_idx)
+        for track_id, _ in voting.pop_crops_to_classify():
+            n_classifications[track_id] += 1
+            if track_id == 1:
+                voting.add_prediction(track_id, ['a'], [0.95])
+            else:
+                voting.add_prediction(track_id, [['a', 'b'][frame_idx % 2]], [0.6])
+    assert n_classifications == {1: 2, 2: 4}
+    assert voting.is_done(1) and voting.is_done(2)
+    assert not voting.add_crop(1, _get_crop(random_state, 16, sharp=True), frame_idx=100)
+
+
+def test_unknown_aggregation():
+    with pytest.raises(ValueError):
+        TrackClassificationPolicy(aggregation='median')
@@ -0,0 +1,38 @@
+from cv_pipeliner.tracking.tracks_store import TracksStore
+
+
+def test_tracks_store_labels_and_readiness():
+    tracks_store = TracksStore(max_age=5)
+    tracks_store.set_label(track_id=1, label='a', ready_at_frame=0)
+    tracks_store.set_label(track_id=2, label='b', ready_at_frame=3)
+    tracks_store.update(frame_idx=0, tracks_ids=[1, 2])
+    assert [frame_result.track_id for frame_result in tracks_store.get_ready_frames_results(frame_idx=0)] == [1]
+    assert tracks_store.get_ready_frames_results(frame_idx=3, tracks_ids=[2, 3]) == [
+        tracks_store.frames_results[2]
+    ]
+    frame_result = tracks_store.frames_results[2]
+    tracks_store.set_label(track_id=2, label='c', ready_at_frame=10)
+    # results are replaced, ready_at_frame is kept
+    assert frame_result.label == 'b'
+    assert tracks_store.frames_results[2].label == 'c'
+    assert tracks_store.frames_results[2].ready_at_frame == 3
+
+
+def test_tracks_store_expires_not_seen_tracks():
+    tracks_store = TracksStore(max_age=2)
+    expired_tracks_ids = []
+    for frame_idx in range(10000):
+        # every track lives for 3 frames
+        tracks_ids = [frame_idx // 3, frame_idx // 3 + 100000]
+        for track_id in tracks_ids:
+            if track_id not in tracks_store:
+                tracks_store.set_label(track_id=track_id, label=str(track_id), ready_at_frame=frame_idx)
+        expired_tracks_ids.extend(tracks_store.update(frame_idx=frame_idx, tracks_ids=tracks_ids))
+        assert len(tracks_store) <= 4
+    assert len(expired_tracks_ids) == 2 * (10000 // 3 - 1)
+    assert all(track_id in tracks_store for track_id in [9999 // 3, 9999 // 3 + 100000])
+
+    # results that came after the track is gone are expired too
+    tracks_store.set_label(track_id=0, label='late', ready_at_frame=10000)
+    tracks_store.update(frame_idx=10003, tracks_ids=[])
+    assert len(tracks_store) == 0
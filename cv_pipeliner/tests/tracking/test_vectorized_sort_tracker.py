@@ -0,0 +1,49 @@
+import numpy as np
+
+from cv_pipeliner.tracking.sort_tracker import Sort, KalmanBoxTracker
+from cv_pipeliner.tracking.vectorized_sort_tracker import VectorizedSort
+
+
+def _get_recorded_sequence(seed: int, n_frames: int = 150, n_objects: int = 60):
+    '''
+    Objects moving with constant velocity and noise; every object lives in the random range of frames
+    and is sometimes missed by detector.
+    '''
+    random_state = np.random.RandomState(seed)
+    starts = random_state.randint(0, 1000, size=(n_objects, 2)).astype(float)
+    sizes = random_state.randint(20, 80, size=(n_objects, 2)).astype(float)
+    velocities = random_state.uniform(-5, 5, size=(n_objects, 2))
+    births = random_state.randint(0, n_frames, size=n_objects)
+    deaths = births + random_state.randint(5, n_frames, size=n_objects)
+    frames_dets = []
+    for frame_idx in range(n_frames):
+        is_alive = (births <= frame_idx) & (frame_idx < deaths) & (random_state.rand(n_objects) > 0.1)
+        xymins = starts + velocities * (frame_idx - births)[:, None] + random_state.normal(0, 1.5, size=(n_objects, 2))
+        dets = np.column_stack([xymins, xymins + sizes, random_state.rand(n_objects)])[is_alive]
+        frames_dets.append(dets[random_state.permutation(len(dets))])
+    return frames_dets
+
+
+def test_vectorized_sort_gives_identical_tracks():
+    for seed in range(3):
+        frames_dets = _get_recorded_sequence(seed)
+        results = []
+        for sort_cls in [Sort, VectorizedSort]:
+            KalmanBoxTracker.count = 0
+            sort_tracker = sort_cls()
+            results.append([sort_tracker.update(dets) for dets in frames_dets])
+        for tracks, vectorized_tracks in zip(*results):
+            assert tracks.shape == vectorized_tracks.shape
+            assert np.array_equal(tracks[:, -1], vectorized_tracks[:, -1])
+            assert np.allclose(tracks, vectorized_tracks)
+
+
+def test_vectorized_sort_trackers_count_ids_independently():
+    frames_dets = _get_recorded_sequence(seed=0, n_frames=20)
+    KalmanBoxTracker.count = 100
+    sort_tracker1, sort_tracker2 = VectorizedSort(), VectorizedSort()
+    for dets in frames_dets:
+        tracks1, tracks2 = sort_tracker1.update(dets), sort_tracker2.update(dets)
+        assert np.array_equal(tracks1, tracks2)
+    assert sort_tracker1.next_id == sort_tracker2.next_id > 0
+    assert KalmanBoxTracker.count == 100
@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+import requests
+
+from cv_pipeliner.utils.tf_serving import TFServingRESTClient
+
+
+class FakeTFServingHandler(BaseHTTPRequestHandler):
+    '''
+    Mimics TF Serving REST predict API of Object Detection API model (row format) with the input "input_tensor":
+    returns the box of the whole image with the score equal to the mean intensity of the image.
+    '''
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status_code: int, content: dict):
+        data = json.dumps(content).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.n_requests += 1
+            server.clients_addresses.add(self.client_address)
+            server.n_in_flight += 1
+            server.max_n_in_flight = max(server.max_n_in_flight, server.n_in_flight)
+            fail = server.n_failures > 0
+            server.n_failures -= int(fail)
+        try:
+            time.sleep(server.predict_time)
+            if fail:
+                self._send(503, {'error': 'Server is overloaded'})
+                return
+            if not all('input_tensor' in instance for instance in data['instances']):
+                self._send(400, {'error': 'Missing input_tensor'})
+                return
+            predictions = []
+            for instance in data['instances']:
+                buffer = np.frombuffer(base64.b64decode(instance['input_tensor']['b64']), dtype=np.uint8)
+                image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+                server.batches_sizes.append(len(data['instances']))
+                predictions.append({
+                    'detection_boxes': [[0., 0., 1., 1.]],
+                    'detection_scores': [float(image.mean() / 255)],
+                    'detection_classes': [1.]
+                })
+            self._send(200, {'predictions': predictions})
+        finally:
+            with server.lock:
+                server.n_in_flight -= 1
+
+
+@pytest.fixture
+def fake_tf_serving():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTFServingHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.n_requests = 0
+    server.clients_addresses = set()
+    server.n_in_flight = 0
+    server.max_n_in_flight = 0
+    server.n_failures = 0
+    server.predict_time = 0.
+    server.batches_sizes = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/v1/models/detector:predict'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get_images(n: int):
+    return [np.full((32, 48, 3), 5 * idx, dtype=np.uint8) for idx in range(n)]
+
+
+def test_tf_serving_client_batches_and_limits_requests_in_flight(fake_tf_serving):
+    fake_tf_serving.predict_time = 0.05
+    with TFServingRESTClient(fake_tf_serving.url, max_batch_size=4, max_in_flight=2) as client:
+        for _ in range(3):
+            predictions = client.predict_images(_get_images(10), input_name='input_tensor')
+            assert [
+                prediction['detection_scores'][0] * 255 for prediction in predictions
+            ] == pytest.approx([5 * idx for idx in range(10)], abs=1.)
+    # 10 images are sent in 3 requests
+    assert fake_tf_serving.n_requests == 9
+    assert sorted(set(fake_tf_serving.batches_sizes)) == [2, 4]
+    assert fake_tf_serving.max_n_in_flight == 2
+    # connections are reused
+    assert len(fake_tf_serving.clients_addresses) <= 2
+
+
+def test_tf_serving_client_retries(fake_tf_serving):
+    fake_tf_serving.n_failures = 2
+    with TFServingRESTClient(fake_tf_serving.url, max_retries=2, backoff=0.01) as client:
+        assert len(client.predict_images(_get_images(1), input_name='input_tensor')) == 1
+    assert fake_tf_serving.n_requests == 3
+
+    fake_tf_serving.n_failures = 2
+    with TFServingRESTClient(fake_tf_serving.url, max_retries=1, backoff=0.01) as client:
+        with pytest.raises(ValueError, match='503'):
+            client.predict_images(_get_images(1), input_name='input_tensor')
+        # bad requests are not retried
+        n_requests = fake_tf_serving.n_requests
+        with pytest.raises(ValueError, match='Missing input_tensor'):
+            client.predict([{'images': [0]}])
+        assert fake_tf_serving.n_requests == n_requests + 1
+
+
+def test_tf_serving_client_timeout(fake_tf_serving):
+    fake_tf_serving.predict_time = 0.5
+    with TFServingRESTClient(fake_tf_serving.url, timeout=0.05, max_retries=1, backoff=0.01) as client:
+        with pytest.raises(requests.Timeout):
+            client.predict_images(_get_images(1), input_name='input_tensor')
+    assert fake_tf_serving.n_requests == 2
+
+
+def test_object_detection_api_kfserving(fake_tf_serving):
+    from cv_pipeliner.inference_models.detection.object_detection_api import ObjectDetectionAPI_KFServing
+    model = ObjectDetectionAPI_KFServing(
+        url=fake_tf_serving.url, input_name='input_tensor', class_names=['object'], max_batch_size=8
+    ).load()
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, _ = model.predict(
+        model.preprocess_input(_get_images(20)), score_threshold=0.1
+    )
+    assert fake_tf_serving.n_requests == 3
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0] * 6 + [1] * 14
+    assert np.array_equal(n_pred_bboxes[-1], [[0, 0, 48, 32]])
+    assert n_pred_scores[-1][0] * 255 == pytest.approx(95, abs=1.)
+    assert n_pred_class_names_top_n[-1][0][0] == 'object'
+
+
+def test_tf_serving_client_apredict_images(fake_tf_serving):
+    fake_tf_serving.predict_time = 0.05
+
+    async def run():
+        async with TFServingRESTClient(fake_tf_serving.url, max_batch_size=4, max_in_flight=2) as client:
+            # requests of concurrent calls share the limit of requests in flight
+            return await asyncio.gather(*[
+                client.apredict_images(_get_images(10), input_name='input_tensor') for _ in range(3)
+            ])
+
+    for predictions in asyncio.run(run()):
+        assert [
+            prediction['detection_scores'][0] * 255 for prediction in predictions
+        ] == pytest.approx([5 * idx for idx in range(10)], abs=1.)
+    assert fake_tf_serving.n_requests == 9
+    assert fake_tf_serving.max_n_in_flight == 2
+    assert len(fake_tf_serving.clients_addresses) <= 2
+
+
+def test_tf_serving_client_apredict_retries_and_timeout(fake_tf_serving):
+    async def run(client: TFServingRESTClient):
+        async with client:
+            return await client.apredict_images(_get_images(1), input_name='input_tensor')
+
+    fake_tf_serving.n_failures = 2
+    assert len(asyncio.run(run(TFServingRESTClient(fake_tf_serving.url, max_retries=2, backoff=0.01)))) == 1
+    assert fake_tf_serving.n_requests == 3
+
+    fake_tf_serving.n_failures = 2
+    with pytest.raises(ValueError, match='503'):
+        asyncio.run(run(TFServingRESTClient(fake_tf_serving.url, max_retries=1, backoff=0.01)))
+
+    fake_tf_serving.predict_time = 0.5
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run(TFServingRESTClient(fake_tf_serving.url, timeout=0.05, max_retries=0)))
+
+
+def test_object_detection_api_kfserving_apredict(fake_tf_serving):
+    from cv_pipeliner.inference_models.detection.object_detection_api import ObjectDetectionAPI_KFServing
+    model = ObjectDetectionAPI_KFServing(
+        url=fake_tf_serving.url, input_name='input_tensor', class_names=['object'], max_batch_size=8
+    ).load()
+    images = model.preprocess_input(_get_images(20))
+
+    async def run():
+        output = await model.apredict(images, score_threshold=0.1)
+        await model.client.aclose()
+        return output
+
+    n_pred_bboxes, n_pred_scores, _, _ = asyncio.run(run())
+    assert fake_tf_serving.n_requests == 3
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0] * 6 + [1] * 14
+    assert n_pred_scores[-1][0] * 255 == pytest.approx(95, abs=1.)
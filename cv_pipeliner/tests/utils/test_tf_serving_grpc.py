@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+grpc = pytest.importorskip('grpc')
+pytest.importorskip('tensorflow_serving')
+import tensorflow as tf  # noqa: E402
+from tensorflow_serving.apis import predict_pb2, prediction_service_pb2_grpc  # noqa: E402
+
+from cv_pipeliner.utils.tf_serving_grpc import TFServingGRPCClient  # noqa: E402
+
+
+class FakePredictionService(prediction_service_pb2_grpc.PredictionServiceServicer):
+    '''
+    Mimics models served by TF Serving:
+        "detector" (Object Detection API) returns the box of the whole image with the score equal to
+        the mean intensity of the image, input "input_tensor" is uint8 image tensor or encoded image string;
+        "classifier" returns scores of classes "dark" and "bright" of uint8 images from input "images".
+    '''
+    def __init__(self, predict_time: float = 0.):
+        self.predict_time = predict_time
+        self.lock = threading.Lock()
+        self.n_requests = 0
+        self.n_in_flight = 0
+        self.max_n_in_flight = 0
+        self.peers = set()
+        self.inputs_dtypes = set()
+
+    def _predict(self, request: predict_pb2.PredictRequest) -> dict:
+        if request.model_spec.name == 'detector':
+            input_tensor = tf.make_ndarray(request.inputs['input_tensor'])
+            self.inputs_dtypes.add(input_tensor.dtype)
+            if input_tensor.dtype == object:
+                image = cv2.imdecode(np.frombuffer(input_tensor[0], dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                image = input_tensor[0]
+            return {
+                'detection_boxes': np.array([[[0., 0., 1., 1.]]], dtype=np.float32),
+                'detection_scores': np.array([[image.mean() / 255]], dtype=np.float32),
+                'detection_classes': np.array([[1.]], dtype=np.float32)
+            }
+        elif request.model_spec.name == 'classifier':
+            images = tf.make_ndarray(request.inputs['images'])
+            self.inputs_dtypes.add(images.dtype)
+            brightness = images.reshape(len(images), -1).mean(axis=1) / 255
+            return {'scores': np.column_stack([1 - brightness, brightness]).astype(np.float32)}
+        raise KeyError(request.model_spec.name)
+
+    def Predict(self, request, context):
+        with self.lock:
+            self.n_requests += 1
+            self.n_in_flight += 1
+            self.max_n_in_flight = max(self.max_n_in_flight, self.n_in_flight)
+            self.peers.add(context.peer())
+        try:
+            time.sleep(self.predict_time)
+            try:
+                outputs = self._predict(request)
+            except KeyError:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"Servable not found: {request.model_spec.name}")
+            response = predict_pb2.PredictResponse()
+            for output_name, output in outputs.items():
+                response.outputs[output_name].CopyFrom(tf.make_tensor_proto(output))
+            return response
+        finally:
+            with self.lock:
+                self.n_in_flight -= 1
+
+
+@pytest.fixture
+def fake_tf_serving_grpc():
+    server = grpc.server(ThreadPoolExecutor(max_workers=16))
+    service = FakePredictionService()
+    prediction_service_pb2_grpc.add_PredictionServiceServicer_to_server(service, server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    service.address = f'127.0.0.1:{port}'
+    yield service
+    server.stop(grace=None)
+
+
+def _get_images(n: int):
+    return [np.full((32, 48, 3), 5 * idx, dtype=np.uint8) for idx in range(n)]
+
+
+def test_tf_serving_grpc_client_requests_in_flight(fake_tf_serving_grpc):
+    fake_tf_serving_grpc.predict_time = 0.1
+    with TFServingGRPCClient(fake_tf_serving_grpc.address, model_name='detector', n_channels=2) as client:
+        started_at = time.perf_counter()
+        outputs = client.predict_many([{'input_tensor': image[None, ...]} for image in _get_images(8)])
+        assert time.perf_counter() - started_at < 0.5
+    assert [output['detection_scores'][0][0] * 255 for output in outputs] == pytest.approx(
+        [5 * idx for idx in range(8)], abs=0.01
+    )
+    assert fake_tf_serving_grpc.max_n_in_flight > 1
+    # requests are distributed over the channels
+    assert len(fake_tf_serving_grpc.peers) == 2
+    # raw tensors are sent
+    assert fake_tf_serving_grpc.inputs_dtypes == {np.dtype(np.uint8)}
+
+
+def test_tf_serving_grpc_client_errors(fake_tf_serving_grpc):
+    with TFServingGRPCClient(fake_tf_serving_grpc.address, model_name='unknown', n_channels=1) as client:
+        with pytest.raises(grpc.RpcError) as e:
+            client.predict({'input_tensor': _get_images(1)[0][None, ...]})
+        assert e.value.code() == grpc.StatusCode.NOT_FOUND
+
+
+@pytest.mark.parametrize('input_type', ['image_tensor', 'encoded_image_string_tensor'])
+def test_object_detection_api_tf_serving_grpc(fake_tf_serving_grpc, input_type):
+    from cv_pipeliner.inference_models.detection.object_detection_api import ObjectDetectionAPI_TFServingGRPC
+    model = ObjectDetectionAPI_TFServingGRPC(
+        address=fake_tf_serving_grpc.address, model_name='detector', input_type=input_type, class_names=['object']
+    ).load()
+    n_pred_bboxes, n_pred_scores, n_pred_class_names_top_n, _ = model.predict(
+        model.preprocess_input(_get_images(20)), score_threshold=0.1
+    )
+    assert fake_tf_serving_grpc.n_requests == 20
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0] * 6 + [1] * 14
+    assert np.array_equal(n_pred_bboxes[-1], [[0, 0, 48, 32]])
+    assert n_pred_scores[-1][0] * 255 == pytest.approx(95, abs=1.)
+    assert n_pred_class_names_top_n[-1][0][0] == 'object'
+
+
+def test_tensorflow_classification_tf_serving_grpc(fake_tf_serving_grpc):
+    from cv_pipeliner.inference_models.classification.tensorflow import (
+        TensorFlow_ClassificationModelSpec_TFServingGRPC
+    )
+    model = TensorFlow_ClassificationModelSpec_TFServingGRPC(
+        address=fake_tf_serving_grpc.address,
+        model_name='classifier',
+        input_name='images',
+        input_size=(32, 48),
+        preprocess_input=lambda images: np.array(images, dtype=np.uint8),
+        class_names=['dark', 'bright'],
+        max_batch_size=8
+    ).load()
+    images = [np.full((32, 48, 3), 255 * (idx % 2), dtype=np.uint8) for idx in range(20)]
+    pred_labels_top_n, pred_scores_top_n = model.predict(model.preprocess_input(images), top_n=1)
+    assert fake_tf_serving_grpc.n_requests == 3
+    assert list(pred_labels_top_n[:, 0]) == ['dark', 'bright'] * 10
+    assert np.allclose(pred_scores_top_n, 1.)
+
+
+def test_tf_serving_grpc_apredict(fake_tf_serving_grpc):
+    from cv_pipeliner.inference_models.classification.tensorflow import (
+        TensorFlow_ClassificationModelSpec_TFServingGRPC
+    )
+    from cv_pipeliner.inference_models.detection.object_detection_api import ObjectDetectionAPI_TFServingGRPC
+    fake_tf_serving_grpc.predict_time = 0.1
+    detection_model = ObjectDetectionAPI_TFServingGRPC(
+        address=fake_tf_serving_grpc.address, model_name='detector', class_names=['object']
+    ).load()
+    classification_model = TensorFlow_ClassificationModelSpec_TFServingGRPC(
+        address=fake_tf_serving_grpc.address,
+        model_name='classifier',
+        input_name='images',
+        input_size=(32, 48),
+        preprocess_input=lambda images: np.array(images, dtype=np.uint8),
+        class_names=['dark', 'bright'],
+        max_batch_size=8
+    ).load()
+    images = _get_images(8)
+
+    async def run():
+        return await asyncio.gather(
+            detection_model.apredict(images, score_threshold=0.1),
+            classification_model.apredict(classification_model.preprocess_input(images), top_n=1)
+        )
+
+    started_at = time.perf_counter()
+    (n_pred_bboxes, _, _, _), (pred_labels_top_n, _) = asyncio.run(run())
+    # all requests are in flight at once
+    assert time.perf_counter() - started_at < 0.5
+    assert fake_tf_serving_grpc.n_requests == 9
+    assert [len(pred_bboxes) for pred_bboxes in n_pred_bboxes] == [0] * 6 + [1] * 2
+    assert list(pred_labels_top_n[:, 0]) == ['dark'] * 8
+
+
+def test_tf_serving_grpc_apredict_errors(fake_tf_serving_grpc):
+    async def run():
+        with TFServingGRPCClient(fake_tf_serving_grpc.address, model_name='unknown', n_channels=1) as client:
+            return await client.apredict({'input_tensor': _get_images(1)[0][None, ...]})
+
+    with pytest.raises(grpc.RpcError) as e:
+        asyncio.run(run())
+    assert e.value.code() == grpc.StatusCode.NOT_FOUND
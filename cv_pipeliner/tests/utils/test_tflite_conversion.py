@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from cv_pipeliner.core.data import BboxData  # noqa: E402
+from cv_pipeliner.batch_generators.bbox_data import BatchGeneratorBboxData  # noqa: E402
+from cv_pipeliner.inference_models.classification.tensorflow import TensorFlow_ClassificationModelSpec  # noqa: E402
+from cv_pipeliner.utils.tflite_conversion import (  # noqa: E402
+    convert_classification_model_to_tflite, quantize_classification_model
+)
+
+COLORS = {'red': (200, 10, 100), 'green': (10, 200, 100), 'blue': (10, 100, 200)}
+
+
+@pytest.fixture
+def model_spec(tmp_path) -> TensorFlow_ClassificationModelSpec:
+    '''
+    Scores of classes "red", "green" and "blue" are the softmax of the mean intensities of the channels.
+    '''
+    inputs = tf.keras.Input(shape=(8, 8, 3))
+    pooled = tf.keras.layers.GlobalAveragePooling2D()(inputs)
+    outputs = tf.keras.layers.Dense(3, activation='softmax')(pooled)
+    keras_model = tf.keras.Model(inputs, outputs)
+    keras_model.layers[-1].set_weights([np.eye(3, dtype=np.float32) * 10, np.zeros(3, dtype=np.float32)])
+    keras_model.save(str(tmp_path / 'model.h5'))
+    preprocess_input_path = tmp_path / 'preprocess_input.py'
+    preprocess_input_path.write_text(
+        'import cv2\n'
+        'import numpy as np\n'
+        '\n'
+        '\n'
+        'def preprocess_input(images):\n'
+        '    return np.array([cv2.resize(image, (8, 8)) for image in images], dtype=np.float32) / 255\n'
+    )
+    return TensorFlow_ClassificationModelSpec(
+        input_size=(8, 8),
+        preprocess_input=str(preprocess_input_path),
+        class_names=list(COLORS),
+        model_path=str(tmp_path / 'model.h5'),
+        saved_model_type='tf.keras'
+    )
+
+
+def _get_n_bboxes_data(n_images: int = 4):
+    return [
+        [
+            BboxData(
+                cropped_image=np.full((10 + idx, 12, 3), color, dtype=np.uint8),
+                xmin=0, ymin=0, xmax=12, ymax=10 + idx,
+                label=class_name
+            )
+            for class_name, color in COLORS.items()
+        ]
+        for idx in range(n_images)
+    ]
+
+
+@pytest.mark.parametrize('quantization', ['float16', 'int8'])
+def test_convert_classification_model_to_tflite(model_spec, tmp_path, quantization):
+    n_bboxes_data = _get_n_bboxes_data()
+    tflite_model_spec = convert_classification_model_to_tflite(
+        model_spec=model_spec,
+        output_path=str(tmp_path / f'model_{quantization}.tflite'),
+        quantization=quantization,
+        bboxes_data_gen=BatchGeneratorBboxData(n_bboxes_data, batch_size=4, use_not_caught_elements_as_last_batch=True)
+    )
+    assert tflite_model_spec.saved_model_type == 'tflite'
+    assert tflite_model_spec.preprocess_input == model_spec.preprocess_input
+
+    model, tflite_model = model_spec.load(), tflite_model_spec.load()
+    images = [bbox_data.cropped_image for bbox_data in n_bboxes_data[0]]
+    pred_labels_top_n, pred_scores_top_n = model.predict(model.preprocess_input(images), top_n=3)
+    tflite_pred_labels_top_n, tflite_pred_scores_top_n = tflite_model.predict(
+        tflite_model.preprocess_input(images), top_n=3
+    )
+    assert tflite_pred_labels_top_n[:, 0].tolist() == ['red', 'green', 'blue']
+    assert tflite_pred_labels_top_n.tolist() == pred_labels_top_n.tolist()
+    assert tflite_pred_scores_top_n == pytest.approx(pred_scores_top_n, abs=0.05)
+
+
+def test_convert_classification_model_to_tflite_int8_requires_data(model_spec, tmp_path):
+    with pytest.raises(AssertionError):
+        convert_classification_model_to_tflite(model_spec, str(tmp_path / 'model.tflite'), quantization='int8')
+    with pytest.raises(ValueError):
+        convert_classification_model_to_tflite(model_spec, str(tmp_path / 'model.tflite'), quantization='int4')
+
+
+def test_quantize_classification_model(model_spec, tmp_path):
+    pytest.importorskip('tabulate')  # for the markdown tables of ClassificationReporter
+    results = quantize_classification_model(
+        model_spec=model_spec,
+        output_directory=tmp_path / 'quantization',
+        n_true_bboxes_data=_get_n_bboxes_data(),
+        batch_size=4,
+        latency_batch_size=2,
+        latency_n_runs=5
+    )
+    assert [result.tag for result in results] == ['original', 'float16', 'int8']
+    for result in results:
+        assert result.model_size > 0
+        assert result.latency.batch_size == 2 and len(result.latency.latencies) == 5
+        df_classification_metrics = result.classification_report_data.df_classification_metrics
+        assert df_classification_metrics.loc['all_weighted_average', f'precision [{result.tag}]'] == 1.
+    assert results[2].model_size < results[0].model_size
+    assert (tmp_path / 'quantization' / 'report' / 'report.ipynb').exists()
+    assert (tmp_path / 'quantization' / 'tflite_conversion.csv').exists()
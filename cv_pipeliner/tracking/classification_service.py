@@ -0,0 +1,206 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from cv_pipeliner.inference_models.classification.core import ClassificationModel
+from cv_pipeliner.logging import logger
+from cv_pipeliner.utils.streaming import collect_micro_batch
+
+
+@dataclass
+class TrackClassificationRequest:
+    track_id: int
+    cropped_image: np.ndarray
+    frame_idx: int
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class TrackClassificationResult:
+    track_id: int
+    label: str
+    classification_score: float
+    frame_idx: int
+    latency: float
+    labels_top_n: List[str] = None
+    classification_scores_top_n: List[float] = None
+
+
+@dataclass
+class TrackClassificationServiceStats:
+    n_submitted: int = 0
+    n_rejected: int = 0
+    n_expired: int = 0
+    n_classified: int = 0
+    n_batches: int = 0
+    total_latency: float = 0.
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.n_classified / max(self.n_batches, 1e-6)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / max(self.n_classified, 1e-6)
+
+
+class TrackClassificationService:
+    '''
+    Classifies crops of tracks in the background thread, so tracking doesn't wait for the classifier.
+
+    The worker blocks on the requests queue and collects micro-batches across frames: the batch is sent
+    to the model when it has batch_size crops or when the oldest crop has waited for max_batch_delay seconds.
+    Requests that waited longer than latency_budget seconds before being batched are expired (their tracks
+    can be submitted again with fresher crops). Ready results are taken by get_ready_results().
+    '''
+    def __init__(
+        self,
+        classification_model: ClassificationModel,
+        batch_size: int = 16,
+        max_batch_delay: float = 0.01,
+        latency_budget: float = 1.,
+        max_queue_size: int = 256,
+        top_n: int = 1
+    ):
+        assert isinstance(classification_model, ClassificationModel)
+        assert max_batch_delay <= latency_budget
+        self.classification_model = classification_model
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.latency_budget = latency_budget
+        self.top_n = top_n
+
+        self.requests_queue = queue.Queue(maxsize=max_queue_size)
+        self.results_queue = queue.Queue()
+        self.stats = TrackClassificationServiceStats()
+        self._pending_tracks_ids = set()
+        self._pending_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> 'TrackClassificationService':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='track_classification_service', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Stops the worker after already collected batch. Not classified requests and not taken results
+        are dropped, so the service can be started again from the clean state.
+        '''
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        with self._pending_lock:
+            for requests_or_results_queue in [self.requests_queue, self.results_queue]:
+                while True:
+                    try:
+                        requests_or_results_queue.get_nowait()
+                    except queue.Empty:
+                        break
+            self._pending_tracks_ids.clear()
+
+    def is_pending(self, track_id: int) -> bool:
+        with self._pending_lock:
+            return track_id in self._pending_tracks_ids
+
+    def submit(
+        self,
+        track_id: int,
+        cropped_image: np.ndarray,
+        frame_idx: int
+    ) -> bool:
+        '''
+        Adds the crop of the track to the queue without blocking.
+        Returns False if the track is already waiting for classification or the queue is full.
+        '''
+        with self._pending_lock:
+            if track_id in self._pending_tracks_ids:
+                return False
+            try:
+                self.requests_queue.put_nowait(TrackClassificationRequest(
+                    track_id=track_id,
+                    cropped_image=cropped_image,
+                    frame_idx=frame_idx
+                ))
+            except queue.Full:
+                self.stats.n_rejected += 1
+                return False
+            self._pending_tracks_ids.add(track_id)
+            self.stats.n_submitted += 1
+        return True
+
+    def get_ready_results(self) -> List[TrackClassificationResult]:
+        '''
+        Returns all results that are ready at the moment without blocking.
+        '''
+        results = []
+        while True:
+            try:
+                results.append(self.results_queue.get_nowait())
+            except queue.Empty:
+                return results
+
+    def _release(self, requests: List[TrackClassificationRequest]):
+        with self._pending_lock:
+            for request in requests:
+                self._pending_tracks_ids.discard(request.track_id)
+
+    def _collect_batch(self) -> List[TrackClassificationRequest]:
+        return collect_micro_batch(
+            queue_=self.requests_queue,
+            stop_event=self._stop_event,
+            max_batch_size=self.batch_size,
+            max_batch_delay=self.max_batch_delay
+        )
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            now = time.perf_counter()
+            expired = [request for request in batch if now - request.submitted_at > self.latency_budget]
+            batch = [request for request in batch if now - request.submitted_at <= self.latency_budget]
+            self.stats.n_expired += len(expired)
+            self._release(expired)
+            if not batch:
+                continue
+            try:
+                input = self.classification_model.preprocess_input([request.cropped_image for request in batch])
+                pred_labels_top_n, pred_scores_top_n = self.classification_model.predict(input=input, top_n=self.top_n)
+            except Exception:
+                logger.exception("TrackClassificationService: failed to classify the batch")
+                self._release(batch)
+                continue
+            finished_at = time.perf_counter()
+            for request, pred_label_top_n, pred_score_top_n in zip(batch, pred_labels_top_n, pred_scores_top_n):
+                latency = finished_at - request.submitted_at
+                self.results_queue.put(TrackClassificationResult(
+                    track_id=request.track_id,
+                    label=pred_label_top_n[0],
+                    classification_score=pred_score_top_n[0],
+                    frame_idx=request.frame_idx,
+                    latency=latency,
+                    labels_top_n=pred_label_top_n,
+                    classification_scores_top_n=pred_score_top_n
+                ))
+                self.stats.total_latency += latency
+            self.stats.n_classified += len(batch)
+            self.stats.n_batches += 1
+            self._release(batch)
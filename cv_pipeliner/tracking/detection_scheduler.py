@@ -0,0 +1,187 @@
+import abc
+from typing import Literal
+
+import cv2
+import numpy as np
+
+
+class DetectionScheduler(abc.ABC):
+    '''
+    Decides on which frames of the video detection is run (on the other frames boxes are tracked).
+    The scheduler is reset with fps of every video before its first frame.
+    '''
+    fps: float = None
+
+    def reset(self, fps: float):
+        self.fps = fps
+
+    def _get_frame_time(self, frame_idx: int) -> float:
+        '''
+        Time of the frame in ms.
+        '''
+        assert self.fps is not None, "reset(fps) must be called before the first frame"
+        return frame_idx * 1000 / self.fps
+
+    @abc.abstractmethod
+    def should_detect(
+        self,
+        frame_idx: int,
+        frame: np.ndarray,
+        tracker_confidences: np.ndarray = None
+    ) -> bool:
+        '''
+        tracker_confidences are confidences of the currently tracked boxes (None if unknown).
+        '''
+        pass
+
+    def on_detection(
+        self,
+        frame_idx: int,
+        frame: np.ndarray,
+        detection_time: float
+    ):
+        '''
+        Is called after detection on the frame, detection_time is in seconds.
+        '''
+        pass
+
+
+class FixedRateDetectionScheduler(DetectionScheduler):
+    '''
+    Runs detection at the first frame of every detection_delay milliseconds of the video.
+    Time of frames is used instead of frames numbers, so non-integer fps are handled.
+    '''
+    def __init__(self, detection_delay: int):
+        self.detection_delay = detection_delay
+        self.reset(fps=None)
+
+    def reset(self, fps: float):
+        super().reset(fps)
+        self._next_detection_time = 0.
+
+    def should_detect(
+        self,
+        frame_idx: int,
+        frame: np.ndarray = None,
+        tracker_confidences: np.ndarray = None
+    ) -> bool:
+        return self._get_frame_time(frame_idx) >= self._next_detection_time - 1e-6
+
+    def on_detection(self, frame_idx: int, frame: np.ndarray = None, detection_time: float = None):
+        frame_time = self._get_frame_time(frame_idx)
+        self._next_detection_time = (np.floor(frame_time / self.detection_delay + 1e-9) + 1) * self.detection_delay
+
+
+def get_thumbnail(frame: np.ndarray, width: int = 64) -> np.ndarray:
+    '''
+    Small grayscale copy of the frame for cheap comparisons of frames.
+    '''
+    height = max(int(round(frame.shape[0] * width / frame.shape[1])), 1)
+    thumbnail = cv2.resize(np.ascontiguousarray(frame), (width, height), interpolation=cv2.INTER_AREA)
+    if thumbnail.ndim == 3:
+        thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_RGB2GRAY)
+    return thumbnail
+
+
+def get_scene_change(
+    thumbnail1: np.ndarray,
+    thumbnail2: np.ndarray,
+    metric: Literal['frame_difference', 'histogram'] = 'frame_difference'
+) -> float:
+    '''
+    Returns difference between two thumbnails from 0 (the same) to 1:
+        'frame_difference' - mean absolute difference of pixels,
+        'histogram' - Bhattacharyya distance between histograms of intensities (robust to motion inside the scene).
+    '''
+    if metric == 'frame_difference':
+        return float(cv2.absdiff(thumbnail1, thumbnail2).mean() / 255.)
+    elif metric == 'histogram':
+        hist1 = cv2.calcHist([thumbnail1], [0], None, [32], [0, 256])
+        hist2 = cv2.calcHist([thumbnail2], [0], None, [32], [0, 256])
+        return float(cv2.compareHist(hist1, hist2, cv2.HISTCMP_BHATTACHARYYA))
+    else:
+        raise ValueError(f"Unknown metric: {metric}")
+
+
+class AdaptiveDetectionScheduler(DetectionScheduler):
+    '''
+    Runs detection when the scene changes since the last detection (scene_change_metric is above
+    scene_change_threshold) or the tracker loses confidence (mean confidence of boxes is below
+    min_tracker_confidence), but:
+        - not earlier than min_detection_delay and not later than max_detection_delay ms after the last detection;
+        - if latency_budget (ms of detection per frame on average) is given, triggered detections are skipped
+          until enough budget is accumulated for the detection (by the mean time of previous detections).
+    '''
+    def __init__(
+        self,
+        min_detection_delay: int = 0,
+        max_detection_delay: int = 1000,
+        scene_change_metric: Literal['frame_difference', 'histogram'] = 'frame_difference',
+        scene_change_threshold: float = 0.1,
+        min_tracker_confidence: float = 0.5,
+        latency_budget: float = None
+    ):
+        assert min_detection_delay <= max_detection_delay
+        if scene_change_metric not in ['frame_difference', 'histogram']:
+            raise ValueError(f"Unknown scene_change_metric: {scene_change_metric}")
+        self.min_detection_delay = min_detection_delay
+        self.max_detection_delay = max_detection_delay
+        self.scene_change_metric = scene_change_metric
+        self.scene_change_threshold = scene_change_threshold
+        self.min_tracker_confidence = min_tracker_confidence
+        self.latency_budget = latency_budget
+        self.reset(fps=None)
+
+    def reset(self, fps: float):
+        super().reset(fps)
+        self._last_detection_time = None
+        self._last_detection_thumbnail = None
+        self._mean_detection_time = 0.
+        self._n_detections = 0
+        self._budget = 0.
+        self._last_frame_idx = None
+
+    def _accumulate_budget(self, frame_idx: int):
+        if self.latency_budget is None:
+            return
+        n_frames = 1 if self._last_frame_idx is None else frame_idx - self._last_frame_idx
+        # budget is not accumulated for more than max_detection_delay
+        max_budget = self.latency_budget * max(self.max_detection_delay * self.fps / 1000, 1)
+        self._budget = min(self._budget + n_frames * self.latency_budget, max_budget)
+
+    def should_detect(
+        self,
+        frame_idx: int,
+        frame: np.ndarray,
+        tracker_confidences: np.ndarray = None
+    ) -> bool:
+        frame_time = self._get_frame_time(frame_idx)
+        if self._last_frame_idx != frame_idx:
+            self._accumulate_budget(frame_idx)
+            self._last_frame_idx = frame_idx
+        if self._last_detection_time is None:
+            return True
+        delay = frame_time - self._last_detection_time
+        if delay >= self.max_detection_delay - 1e-6:
+            return True
+        if delay < self.min_detection_delay - 1e-6:
+            return False
+        if self.latency_budget is not None and self._budget < self._mean_detection_time * 1000:
+            return False
+        if (
+            tracker_confidences is not None and len(tracker_confidences) > 0
+            and np.mean(tracker_confidences) < self.min_tracker_confidence
+        ):
+            return True
+        scene_change = get_scene_change(
+            self._last_detection_thumbnail, get_thumbnail(frame), metric=self.scene_change_metric
+        )
+        return scene_change > self.scene_change_threshold
+
+    def on_detection(self, frame_idx: int, frame: np.ndarray, detection_time: float):
+        self._last_detection_time = self._get_frame_time(frame_idx)
+        self._last_detection_thumbnail = get_thumbnail(frame)
+        self._n_detections += 1
+        self._mean_detection_time += (detection_time - self._mean_detection_time) / self._n_detections
+        if self.latency_budget is not None:
+            self._budget = max(self._budget - detection_time * 1000, 0.)
@@ -0,0 +1,58 @@
+from typing import Dict
+
+import cv2
+import numpy as np
+
+
+def get_fit_scale(
+    frame_shape: tuple,
+    max_width: int = None,
+    max_height: int = None
+) -> float:
+    '''
+    Returns the scale (not more than 1) to fit the frame into max_width x max_height keeping aspect ratio.
+    '''
+    height, width = frame_shape[:2]
+    scale = 1.
+    if max_width is not None:
+        scale = min(scale, max_width / width)
+    if max_height is not None:
+        scale = min(scale, max_height / height)
+    return scale
+
+
+def scale_bboxes(bboxes: np.ndarray, scale: float) -> np.ndarray:
+    '''
+    Maps bboxes (xmin, ymin, xmax, ymax) between levels: from the level with scale s1 to s2 use scale=s2/s1.
+    '''
+    return np.array(bboxes, dtype=np.float64).reshape(-1, 4) * scale
+
+
+class FramePyramid:
+    '''
+    Frame at several resolutions given by scales relative to the full resolution frame (level 1.).
+    Every level is computed once, at the first request, from the nearest bigger computed level,
+    so consumers (detector, tracker, renderer) can pick their own resolutions for the same frame.
+    '''
+    def __init__(self, frame: np.ndarray):
+        self.frame = frame
+        self.levels: Dict[float, np.ndarray] = {1.: frame}
+
+    @property
+    def shape(self) -> tuple:
+        return self.frame.shape
+
+    def get_level(self, scale: float) -> np.ndarray:
+        assert 0 < scale <= 1, "Frames are not upscaled"
+        scale = round(scale, 6)
+        if scale not in self.levels:
+            nearest_scale = min(
+                (level_scale for level_scale in list(self.levels) if level_scale >= scale),
+                key=lambda level_scale: level_scale - scale
+            )
+            height, width = self.frame.shape[:2]
+            size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+            self.levels[scale] = cv2.resize(
+                np.ascontiguousarray(self.levels[nearest_scale]), size, interpolation=cv2.INTER_AREA
+            )
+        return self.levels[scale]
@@ -0,0 +1,131 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+
+def to_gray(frame: np.ndarray, scale: float = 1.) -> np.ndarray:
+    if scale != 1.:
+        frame = cv2.resize(
+            np.ascontiguousarray(frame), None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    return np.ascontiguousarray(frame, dtype=np.uint8)
+
+
+def get_grid_points(
+    bboxes: np.ndarray,
+    grid_size: int,
+    margin: float = 0.15
+) -> np.ndarray:
+    '''
+    Returns points of grid_size x grid_size grids inside of bboxes (without margin of their sizes)
+    with shape (len(bboxes), grid_size * grid_size, 2).
+    '''
+    steps = np.linspace(margin, 1 - margin, grid_size)
+    xs, ys = np.meshgrid(steps, steps)
+    xs, ys = xs.reshape(-1), ys.reshape(-1)
+    widths = (bboxes[:, 2] - bboxes[:, 0])[:, None]
+    heights = (bboxes[:, 3] - bboxes[:, 1])[:, None]
+    return np.stack([
+        bboxes[:, 0][:, None] + xs[None] * widths,
+        bboxes[:, 1][:, None] + ys[None] * heights
+    ], axis=2).astype(np.float32)
+
+
+class LKTracker:
+    '''
+    Median flow tracker of all bboxes by one call of sparse pyramidal Lucas-Kanade optical flow
+    (cv2.calcOpticalFlowPyrLK) on downscaled grayscale frames. Drop-in replacement of OpenCVTracker.
+
+    Every frame grid points of every bbox are tracked forward and backward, points with forward-backward error
+    more than max_fb_error (pixels of the downscaled frame) are rejected. Bbox is moved by the median shift
+    of its valid points and scaled by the median change of distances from points to their center.
+    confidences are fractions of valid points of bboxes; bboxes with confidence less than min_confidence
+    stay on the place.
+    '''
+    def __init__(
+        self,
+        initial_bboxes: List[Tuple[int, int, int, int]],
+        initial_frame: np.ndarray,
+        scale: float = 0.5,
+        grid_size: int = 5,
+        max_fb_error: float = 1.,
+        min_confidence: float = 0.3,
+        win_size: int = 15,
+        max_level: int = 3
+    ):
+        self.scale = scale
+        self.grid_size = grid_size
+        self.max_fb_error = max_fb_error
+        self.min_confidence = min_confidence
+        self.lk_params = dict(
+            winSize=(win_size, win_size),
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+        )
+        self.bboxes = np.array(initial_bboxes, dtype=np.float64).reshape(-1, 4) * self.scale
+        self.confidences = np.ones(len(self.bboxes))
+        self.prev_gray_frame = to_gray(initial_frame, scale=self.scale)
+        self.frame_shape = initial_frame.shape
+
+    def _get_voc_bboxes(self) -> np.ndarray:
+        bboxes = self.bboxes / self.scale
+        height, width = self.frame_shape[:2]
+        bboxes[:, [0, 2]] = np.clip(bboxes[:, [0, 2]], 0, width)
+        bboxes[:, [1, 3]] = np.clip(bboxes[:, [1, 3]], 0, height)
+        return bboxes.round().astype(int)
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        '''
+        Returns tracked bboxes (xmin, ymin, xmax, ymax) on the frame.
+        '''
+        gray_frame = to_gray(frame, scale=self.scale)
+        self.frame_shape = frame.shape
+        n_bboxes = len(self.bboxes)
+        if n_bboxes == 0:
+            self.prev_gray_frame = gray_frame
+            return np.zeros((0, 4), dtype=int)
+
+        points = get_grid_points(self.bboxes, self.grid_size)  # (n_bboxes, n_points, 2)
+        n_points = points.shape[1]
+        points = points.reshape(-1, 1, 2)
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray_frame, gray_frame, points, None, **self.lk_params
+        )
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(
+            gray_frame, self.prev_gray_frame, new_points, None, **self.lk_params
+        )
+        fb_errors = np.linalg.norm(back_points - points, axis=2).reshape(n_bboxes, n_points)
+        is_valid = (
+            (status.reshape(n_bboxes, n_points) == 1)
+            & (back_status.reshape(n_bboxes, n_points) == 1)
+            & (fb_errors <= self.max_fb_error)
+        )
+        points = points.reshape(n_bboxes, n_points, 2).astype(np.float64)
+        new_points = new_points.reshape(n_bboxes, n_points, 2).astype(np.float64)
+        points[~is_valid] = np.nan
+        new_points[~is_valid] = np.nan
+
+        self.confidences = is_valid.mean(axis=1)
+        is_tracked = self.confidences >= self.min_confidence
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shifts = np.nanmedian(new_points[is_tracked] - points[is_tracked], axis=1)
+            centers = np.nanmean(points[is_tracked], axis=1, keepdims=True)
+            new_centers = np.nanmean(new_points[is_tracked], axis=1, keepdims=True)
+            scales = np.nanmedian(
+                np.linalg.norm(new_points[is_tracked] - new_centers, axis=2)
+                / np.linalg.norm(points[is_tracked] - centers, axis=2),
+                axis=1
+            )
+        scales = np.where(np.isfinite(scales), scales, 1.)
+
+        bboxes = self.bboxes[is_tracked]
+        bboxes_centers = (bboxes[:, :2] + bboxes[:, 2:]) / 2 + shifts
+        bboxes_half_sizes = (bboxes[:, 2:] - bboxes[:, :2]) / 2 * scales[:, None]
+        self.bboxes[is_tracked] = np.concatenate([
+            bboxes_centers - bboxes_half_sizes, bboxes_centers + bboxes_half_sizes
+        ], axis=1)
+        self.prev_gray_frame = gray_frame
+        return self._get_voc_bboxes()
@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 
 from cv_pipeliner.tracking.bbox_utils import coco_bboxes_to_voc, voc_bboxes_to_coco
 
@@ -12,5 +13,7 @@ class OpenCVTracker:
 
     def update(self, frame_pixels):
         success, tracked_bboxes = self.multiTracker.update(frame_pixels)
+        # MultiTracker reports only one success flag for all boxes
+        self.confidences = np.full(len(tracked_bboxes), float(success))
         tracked_bboxes = coco_bboxes_to_voc(tracked_bboxes, frame_pixels.shape)
         return tracked_bboxes
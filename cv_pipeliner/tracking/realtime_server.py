@@ -0,0 +1,330 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from cv_pipeliner.core.data import BboxData
+from cv_pipeliner.inference_models.detection.core import DetectionModel
+from cv_pipeliner.inference_models.classification.core import ClassificationModel
+from cv_pipeliner.logging import logger
+
+from cv_pipeliner.tracking.lk_tracker import LKTracker
+from cv_pipeliner.tracking.vectorized_sort_tracker import VectorizedSort
+from cv_pipeliner.tracking.classification_service import TrackClassificationService, TrackClassificationResult
+from cv_pipeliner.tracking.tracks_store import TracksStore
+from cv_pipeliner.tracking.detection_scheduler import FixedRateDetectionScheduler
+
+
+@dataclass
+class RealTimeServerStats:
+    n_started_sessions: int = 0
+    n_rejected_sessions: int = 0
+    n_evicted_sessions: int = 0
+    n_frames: int = 0
+    n_dropped_frames: int = 0
+    n_detections: int = 0
+    n_postponed_detections: int = 0
+
+
+class RealTimeSession:
+    '''
+    Tracking state of one client stream. Frames of the session are processed one at a time.
+    '''
+    def __init__(
+        self,
+        session_id: str,
+        fps: float,
+        detection_delay: int,
+        tracks_max_age: int = 30
+    ):
+        self.session_id = session_id
+        self.fps = fps
+        self.detection_scheduler = FixedRateDetectionScheduler(detection_delay=detection_delay)
+        self.detection_scheduler.reset(fps=fps)
+        self.sort_tracker = VectorizedSort()
+        self.optical_flow_tracker: LKTracker = None
+        self.tracks_store = TracksStore(max_age=tracks_max_age)
+        self.frame_idx = 0
+        self.last_time = time.perf_counter()
+        self.lock = threading.Lock()
+        # classification results of the session's tracks, filled by the server
+        self.classification_results: 'queue.Queue[TrackClassificationResult]' = queue.Queue()
+
+    def update_sort_tracker(
+        self,
+        bboxes: np.ndarray,
+        scores: np.ndarray = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        if scores is None:
+            # SORT requires detection scores, use 1 while tracking
+            scores = np.ones(len(bboxes))
+        tracked_bboxes_sort = self.sort_tracker.update(np.column_stack([bboxes, scores]))
+        tracked_bboxes_sort = tracked_bboxes_sort.round().astype(int)
+        tracked_bboxes = np.clip(tracked_bboxes_sort[:, :-1], 0, None)
+        tracked_ids = tracked_bboxes_sort[:, -1]
+        return tracked_bboxes, tracked_ids
+
+
+class RealTimeServer:
+    '''
+    Frame-by-frame inference with tracking for many concurrent client streams (sessions), e.g. behind HTTP
+    endpoints. Sessions share one set of models and keep only their tracker state:
+        - detection runs on a free model from the detection_models pool (several instances or remote replicas
+          allow several sessions to detect in parallel);
+        - crops of new tracks of all sessions are classified in micro-batches by one TrackClassificationService,
+          labels are shown when ready.
+
+    Backpressure: a frame is dropped (predict_on_frame returns None) while the previous frame of the session
+    is processed. If no detection model gets free in max_detection_wait seconds, detection is postponed
+    to the next frame and the frame is tracked instead. Sessions idle for session_timeout seconds are evicted,
+    new sessions are rejected when max_sessions are running.
+    '''
+    def __init__(
+        self,
+        detection_models: List[DetectionModel],
+        classification_model: ClassificationModel,
+        max_sessions: int = 16,
+        session_timeout: float = 3.,
+        max_detection_wait: float = 0.1,
+        classification_batch_size: int = 16,
+        classification_latency_budget: float = 1.,
+        tracks_max_age: int = 30,
+        tracking_scale: float = 0.5
+    ):
+        assert len(detection_models) > 0
+        assert all(isinstance(detection_model, DetectionModel) for detection_model in detection_models)
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+        self.max_detection_wait = max_detection_wait
+        self.tracks_max_age = tracks_max_age
+        self.tracking_scale = tracking_scale
+
+        self._detection_models_pool = queue.Queue()
+        for detection_model in detection_models:
+            self._detection_models_pool.put(detection_model)
+        self.classification_service = TrackClassificationService(
+            classification_model=classification_model,
+            batch_size=classification_batch_size,
+            latency_budget=classification_latency_budget
+        )
+
+        self.sessions: Dict[str, RealTimeSession] = {}
+        self._sessions_lock = threading.Lock()
+        self.stats = RealTimeServerStats()
+        self._stats_lock = threading.Lock()  # stats are updated by frames of concurrent sessions
+
+    def __enter__(self) -> 'RealTimeServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self.classification_service.start()
+
+    def stop(self):
+        self.classification_service.stop()
+        with self._sessions_lock:
+            self.sessions.clear()
+
+    def start_session(
+        self,
+        session_id: str,
+        fps: float,
+        detection_delay: int
+    ) -> bool:
+        '''
+        Returns False if the session is already started or the server is full.
+        '''
+        self.evict_idle_sessions()
+        with self._sessions_lock:
+            if session_id in self.sessions or len(self.sessions) >= self.max_sessions:
+                with self._stats_lock:
+                    self.stats.n_rejected_sessions += 1
+                return False
+            self.sessions[session_id] = RealTimeSession(
+                session_id=session_id,
+                fps=fps,
+                detection_delay=detection_delay,
+                tracks_max_age=self.tracks_max_age
+            )
+            with self._stats_lock:
+                self.stats.n_started_sessions += 1
+        return True
+
+    def end_session(self, session_id: str) -> bool:
+        '''
+        Returns False if the session is not started.
+        '''
+        with self._sessions_lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def evict_idle_sessions(self) -> List[str]:
+        '''
+        Ends sessions that didn't send frames for session_timeout seconds. Returns their ids.
+        '''
+        now = time.perf_counter()
+        with self._sessions_lock:
+            evicted_sessions_ids = [
+                session_id for session_id, session in self.sessions.items()
+                if now - session.last_time >= self.session_timeout and not session.lock.locked()
+            ]
+            for session_id in evicted_sessions_ids:
+                del self.sessions[session_id]
+        for session_id in evicted_sessions_ids:
+            logger.info(f"RealTimeServer: idle session {session_id} is evicted")
+        with self._stats_lock:
+            self.stats.n_evicted_sessions += len(evicted_sessions_ids)
+        return evicted_sessions_ids
+
+    def predict_on_frame(
+        self,
+        session_id: str,
+        frame: np.ndarray,
+        detection_score_threshold: float
+    ) -> List[BboxData]:
+        '''
+        Returns tracked bboxes with ready labels (track ids are in additional_info['track_id'])
+        or None if the frame is dropped because the previous frame of the session is still processed.
+        '''
+        self.evict_idle_sessions()
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"Session {session_id} is not started")
+        if not session.lock.acquire(blocking=False):
+            with self._stats_lock:
+                self.stats.n_dropped_frames += 1
+            return None
+        try:
+            session.last_time = time.perf_counter()
+            bboxes_data = self._process_frame(
+                session=session,
+                frame=frame,
+                detection_score_threshold=detection_score_threshold
+            )
+            session.last_time = time.perf_counter()
+        finally:
+            session.lock.release()
+        with self._stats_lock:
+            self.stats.n_frames += 1
+        return bboxes_data
+
+    def _detect(
+        self,
+        frame: np.ndarray,
+        detection_score_threshold: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns (None, None) if all detection models are busy for max_detection_wait seconds.
+        '''
+        try:
+            detection_model = self._detection_models_pool.get(timeout=self.max_detection_wait)
+        except queue.Empty:
+            return None, None
+        try:
+            input = detection_model.preprocess_input([frame])
+            n_pred_bboxes, n_pred_scores, _, _ = detection_model.predict(
+                input=input,
+                score_threshold=detection_score_threshold
+            )
+        finally:
+            self._detection_models_pool.put(detection_model)
+        bboxes = np.array(n_pred_bboxes[0], dtype=np.float64).reshape(-1, 4)
+        detection_scores = np.array(n_pred_scores[0], dtype=np.float64)
+        return bboxes, detection_scores
+
+    def _route_classification_results(self):
+        '''
+        Passes ready results of the shared classification service to their sessions.
+        '''
+        results = self.classification_service.get_ready_results()
+        with self._sessions_lock:
+            for result in results:
+                session_id, track_id = result.track_id
+                if session_id in self.sessions:
+                    self.sessions[session_id].classification_results.put(result)
+
+    def _submit_new_tracks(
+        self,
+        session: RealTimeSession,
+        frame: np.ndarray,
+        tracked_bboxes: np.ndarray,
+        tracked_ids: np.ndarray
+    ):
+        for (xmin, ymin, xmax, ymax), track_id in zip(tracked_bboxes, tracked_ids):
+            service_track_id = (session.session_id, int(track_id))
+            if (
+                track_id in session.tracks_store or self.classification_service.is_pending(service_track_id)
+                or not (xmin < xmax and ymin < ymax)
+            ):
+                continue
+            bbox_data = BboxData(image=frame, xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax)
+            self.classification_service.submit(
+                track_id=service_track_id,
+                cropped_image=bbox_data.open_cropped_image(),
+                frame_idx=session.frame_idx
+            )
+
+    def _process_frame(
+        self,
+        session: RealTimeSession,
+        frame: np.ndarray,
+        detection_score_threshold: float
+    ) -> List[BboxData]:
+        frame_idx = session.frame_idx
+        bboxes, detection_scores = None, None
+        if session.optical_flow_tracker is None or session.detection_scheduler.should_detect(frame_idx=frame_idx):
+            bboxes, detection_scores = self._detect(frame=frame, detection_score_threshold=detection_score_threshold)
+            with self._stats_lock:
+                if bboxes is None:
+                    self.stats.n_postponed_detections += 1
+                else:
+                    self.stats.n_detections += 1
+            if bboxes is not None:
+                session.detection_scheduler.on_detection(frame_idx=frame_idx)
+
+        if bboxes is not None:
+            session.optical_flow_tracker = LKTracker(bboxes, frame, scale=self.tracking_scale)
+            tracked_bboxes, tracked_ids = session.update_sort_tracker(bboxes=bboxes, scores=detection_scores)
+            self._submit_new_tracks(
+                session=session, frame=frame, tracked_bboxes=tracked_bboxes, tracked_ids=tracked_ids
+            )
+        elif session.optical_flow_tracker is not None:
+            tracked_bboxes, tracked_ids = session.update_sort_tracker(
+                bboxes=session.optical_flow_tracker.update(frame)
+            )
+        else:
+            tracked_bboxes, tracked_ids = np.zeros((0, 4), dtype=int), np.zeros(0, dtype=int)
+
+        self._route_classification_results()
+        while not session.classification_results.empty():
+            result = session.classification_results.get_nowait()
+            _, track_id = result.track_id
+            session.tracks_store.set_label(track_id=track_id, label=result.label, ready_at_frame=frame_idx)
+        session.tracks_store.update(frame_idx=frame_idx, tracks_ids=tracked_ids)
+        ready_frames_results = {
+            frame_result.track_id: frame_result
+            for frame_result in session.tracks_store.get_ready_frames_results(
+                frame_idx=frame_idx, tracks_ids=tracked_ids
+            )
+        }
+        session.frame_idx += 1
+
+        return [
+            BboxData(
+                xmin=xmin,
+                ymin=ymin,
+                xmax=xmax,
+                ymax=ymax,
+                label=ready_frames_results[track_id].label,
+                additional_info={'track_id': int(track_id)}
+            )
+            for (xmin, ymin, xmax, ymax), track_id in zip(tracked_bboxes, tracked_ids)
+            if track_id in ready_frames_results
+        ]
@@ -0,0 +1,200 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class TrackClassificationPolicy:
+    '''
+    How tracks are (re-)classified:
+        - crops are taken not more often than every min_frames_between_crops frames and not smaller
+          than min_crop_size pixels by any side;
+        - the first classification of the track is done with its first crop, the next ones with the best
+          (by get_crop_quality) of n_crops_per_classification buffered crops;
+        - top_n predictions of every classification are aggregated by the aggregation method:
+            'mean' - mean score of the label over all classifications,
+            'max' - max score of the label,
+            'vote' - weighted votes of top_n labels (top_n for the 1st place, 1 for the last one)
+              divided by the max possible votes (top_n for every classification);
+        - the track is not classified anymore when the confidence of its best label reaches confidence_threshold
+          after min_classifications, or after max_classifications.
+    '''
+    min_frames_between_crops: int = 1
+    min_crop_size: int = 8
+    n_crops_per_classification: int = 3
+    top_n: int = 3
+    aggregation: Literal['mean', 'max', 'vote'] = 'mean'
+    confidence_threshold: float = 0.9
+    min_classifications: int = 1
+    max_classifications: int = 5
+
+    def __post_init__(self):
+        if self.aggregation not in ['mean', 'max', 'vote']:
+            raise ValueError(f"Unknown aggregation: {self.aggregation}")
+        assert self.n_crops_per_classification >= 1
+        assert 1 <= self.min_classifications <= self.max_classifications
+
+
+def get_crop_quality(cropped_image: np.ndarray) -> float:
+    '''
+    Quality of the crop for classification: bigger and sharper (variance of Laplacian) crops are better.
+    '''
+    height, width = cropped_image.shape[:2]
+    if cropped_image.ndim == 3:
+        gray_image = cv2.cvtColor(np.ascontiguousarray(cropped_image, dtype=np.uint8), cv2.COLOR_RGB2GRAY)
+    else:
+        gray_image = np.asarray(cropped_image, dtype=np.uint8)
+    sharpness = cv2.Laplacian(gray_image, cv2.CV_64F).var()
+    return float(np.sqrt(height * width) * np.log1p(sharpness))
+
+
+@dataclass
+class TrackCrop:
+    cropped_image: np.ndarray
+    frame_idx: int
+    quality: float
+
+
+@dataclass
+class TrackClassificationState:
+    crops: List[TrackCrop] = field(default_factory=list)
+    last_crop_frame_idx: int = None
+    n_classifications: int = 0
+    labels_scores: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    label: str = None
+    confidence: float = 0.
+
+
+class TracksClassificationVoting:
+    '''
+    Per-track crops buffers and aggregated predictions according to TrackClassificationPolicy.
+
+    Usage on every frame with the tracks:
+        voting.add_crop(track_id, cropped_image, frame_idx)  # for every track
+        for track_id, track_crop in voting.pop_crops_to_classify():
+            ...  # classify track_crop.cropped_image with policy.top_n
+            label, confidence = voting.add_prediction(track_id, labels_top_n, scores_top_n)
+    If the crop can't be classified (e.g. the queue of the classifier is full), it is put back by voting.return_crop.
+    '''
+    def __init__(self, policy: TrackClassificationPolicy = None):
+        self.policy = policy if policy is not None else TrackClassificationPolicy()
+        self.tracks_states: Dict[int, TrackClassificationState] = {}
+
+    def is_done(self, track_id: int) -> bool:
+        if track_id not in self.tracks_states:
+            return False
+        track_state = self.tracks_states[track_id]
+        return track_state.n_classifications >= self.policy.max_classifications or (
+            track_state.n_classifications >= self.policy.min_classifications
+            and track_state.confidence >= self.policy.confidence_threshold
+        )
+
+    def get_label(self, track_id: int) -> Tuple[str, float]:
+        '''
+        Returns aggregated label of the track and its confidence (None, 0. if the track is not classified yet).
+        '''
+        if track_id not in self.tracks_states:
+            return None, 0.
+        track_state = self.tracks_states[track_id]
+        return track_state.label, track_state.confidence
+
+    def add_crop(
+        self,
+        track_id: int,
+        cropped_image: np.ndarray,
+        frame_idx: int
+    ) -> bool:
+        '''
+        Adds the crop to the buffer of the track. Returns False if the crop is not needed by the policy.
+        '''
+        track_state = self.tracks_states.setdefault(track_id, TrackClassificationState())
+        if self.is_done(track_id):
+            return False
+        if (
+            track_state.last_crop_frame_idx is not None
+            and frame_idx - track_state.last_crop_frame_idx < self.policy.min_frames_between_crops
+        ):
+            return False
+        if min(cropped_image.shape[:2]) < self.policy.min_crop_size:
+            return False
+        track_state.crops.append(TrackCrop(
+            cropped_image=cropped_image,
+            frame_idx=frame_idx,
+            quality=get_crop_quality(cropped_image)
+        ))
+        track_state.last_crop_frame_idx = frame_idx
+        self._keep_best_crops(track_state)
+        return True
+
+    def _keep_best_crops(self, track_state: TrackClassificationState):
+        if len(track_state.crops) > self.policy.n_crops_per_classification:
+            track_state.crops.remove(min(track_state.crops, key=lambda track_crop: track_crop.quality))
+
+    def return_crop(
+        self,
+        track_id: int,
+        track_crop: TrackCrop
+    ):
+        '''
+        Puts the popped crop back to the buffer of the track (if the track is not removed yet).
+        '''
+        if track_id not in self.tracks_states:
+            return
+        track_state = self.tracks_states[track_id]
+        track_state.crops.append(track_crop)
+        self._keep_best_crops(track_state)
+
+    def pop_crops_to_classify(
+        self,
+        exclude_tracks_ids: List[int] = None
+    ) -> List[Tuple[int, TrackCrop]]:
+        '''
+        Returns the best crops of tracks that are ready to be (re-)classified and clears their buffers.
+        '''
+        exclude_tracks_ids = set(exclude_tracks_ids) if exclude_tracks_ids is not None else set()
+        tracks_crops = []
+        for track_id, track_state in self.tracks_states.items():
+            if track_id in exclude_tracks_ids or not track_state.crops or self.is_done(track_id):
+                continue
+            n_crops_needed = 1 if track_state.n_classifications == 0 else self.policy.n_crops_per_classification
+            if len(track_state.crops) >= n_crops_needed:
+                tracks_crops.append((
+                    track_id, max(track_state.crops, key=lambda track_crop: track_crop.quality)
+                ))
+                track_state.crops = []
+        return tracks_crops
+
+    def add_prediction(
+        self,
+        track_id: int,
+        labels_top_n: List[str],
+        scores_top_n: List[float]
+    ) -> Tuple[str, float]:
+        '''
+        Aggregates top_n prediction of the track crop. Returns the new label of the track and its confidence.
+        '''
+        track_state = self.tracks_states.setdefault(track_id, TrackClassificationState())
+        track_state.n_classifications += 1
+        labels_top_n = labels_top_n[:self.policy.top_n]
+        scores_top_n = scores_top_n[:self.policy.top_n]
+        if self.policy.aggregation == 'mean':
+            for label, score in zip(labels_top_n, scores_top_n):
+                track_state.labels_scores[label] += score
+            normalizer = track_state.n_classifications
+        elif self.policy.aggregation == 'max':
+            for label, score in zip(labels_top_n, scores_top_n):
+                track_state.labels_scores[label] = max(track_state.labels_scores[label], score)
+            normalizer = 1.
+        elif self.policy.aggregation == 'vote':
+            for rank, label in enumerate(labels_top_n):
+                track_state.labels_scores[label] += self.policy.top_n - rank
+            normalizer = self.policy.top_n * track_state.n_classifications
+        track_state.label = max(track_state.labels_scores, key=track_state.labels_scores.get)
+        track_state.confidence = track_state.labels_scores[track_state.label] / max(normalizer, 1e-6)
+        return track_state.label, track_state.confidence
+
+    def remove_track(self, track_id: int):
+        self.tracks_states.pop(track_id, None)
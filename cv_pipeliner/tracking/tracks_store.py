@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Iterable
+
+
+@dataclass(frozen=True)
+class FrameResult:
+    label: str
+    track_id: int
+    ready_at_frame: int
+
+
+class TracksStore:
+    '''
+    Frame results (labels) of tracks indexed by track id.
+
+    Tracks that were not seen for more than max_age frames are expired, so the store contains only alive tracks
+    and per-frame cost doesn't grow with the length of the video. FrameResult are immutable: the label is changed
+    by replacing the result, so results taken by get_ready_frames_results() don't change afterwards.
+    '''
+    def __init__(self, max_age: int = 30):
+        self.max_age = max_age
+        self.frames_results: Dict[int, FrameResult] = {}
+        self._last_seen_frame_idxs: 'OrderedDict[int, int]' = OrderedDict()  # ordered by the last seen frame
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self.frames_results
+
+    def __len__(self) -> int:
+        return len(self.frames_results)
+
+    def set_label(
+        self,
+        track_id: int,
+        label: str,
+        ready_at_frame: int
+    ):
+        '''
+        Sets the label of the track. For already known tracks the label is changed, but ready_at_frame is kept.
+        '''
+        if track_id in self.frames_results:
+            ready_at_frame = self.frames_results[track_id].ready_at_frame
+        elif track_id not in self._last_seen_frame_idxs:
+            # late results of not seen tracks are expired as usual
+            self._last_seen_frame_idxs[track_id] = ready_at_frame
+        self.frames_results[track_id] = FrameResult(label=label, track_id=track_id, ready_at_frame=ready_at_frame)
+
+    def get_ready_frames_results(
+        self,
+        frame_idx: int,
+        tracks_ids: Iterable[int] = None
+    ) -> List[FrameResult]:
+        '''
+        Returns results of given tracks (of all tracks by default) that are ready at the frame.
+        '''
+        if tracks_ids is None:
+            frames_results = self.frames_results.values()
+        else:
+            frames_results = [
+                self.frames_results[track_id] for track_id in tracks_ids if track_id in self.frames_results
+            ]
+        return [frame_result for frame_result in frames_results if frame_result.ready_at_frame <= frame_idx]
+
+    def update(
+        self,
+        frame_idx: int,
+        tracks_ids: Iterable[int]
+    ) -> List[int]:
+        '''
+        Marks tracks as seen at the frame and expires tracks that were not seen for more than max_age frames.
+        Returns ids of expired tracks.
+        '''
+        for track_id in tracks_ids:
+            self._last_seen_frame_idxs[track_id] = frame_idx
+            self._last_seen_frame_idxs.move_to_end(track_id)
+        expired_tracks_ids = []
+        while self._last_seen_frame_idxs:
+            track_id, last_seen_frame_idx = next(iter(self._last_seen_frame_idxs.items()))
+            if frame_idx - last_seen_frame_idx <= self.max_age:
+                break
+            self._last_seen_frame_idxs.popitem(last=False)
+            self.frames_results.pop(track_id, None)
+            expired_tracks_ids.append(track_id)
+        return expired_tracks_ids
@@ -0,0 +1,215 @@
+from typing import Tuple
+
+import numpy as np
+
+from cv_pipeliner.tracking.sort_tracker import linear_assignment
+
+# Constant velocity model of KalmanBoxTracker, state is [x, y, s, r, vx, vy, vs]
+F = np.array(
+    [
+        [1, 0, 0, 0, 1, 0, 0],
+        [0, 1, 0, 0, 0, 1, 0],
+        [0, 0, 1, 0, 0, 0, 1],
+        [0, 0, 0, 1, 0, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 0, 0, 1, 0],
+        [0, 0, 0, 0, 0, 0, 1],
+    ],
+    dtype=np.float64
+)
+H = np.eye(4, 7, dtype=np.float64)
+R = np.diag([1., 1., 10., 10.])
+Q = np.diag([1., 1., 1., 1., 0.01, 0.01, 0.0001])
+P0 = np.diag([10., 10., 10., 10., 10000., 10000., 10000.])
+
+
+def iou_matrix(
+    bboxes1: np.ndarray,
+    bboxes2: np.ndarray
+) -> np.ndarray:
+    '''
+    Computes IoU between all pairs of bboxes in the form [x1,y1,x2,y2] (same formula as sort_tracker.iou).
+    Returns matrix with shape (len(bboxes1), len(bboxes2)).
+    '''
+    bboxes1 = np.asarray(bboxes1, dtype=np.float64)[:, None, :4]
+    bboxes2 = np.asarray(bboxes2, dtype=np.float64)[None, :, :4]
+    xx1 = np.maximum(bboxes1[..., 0], bboxes2[..., 0])
+    yy1 = np.maximum(bboxes1[..., 1], bboxes2[..., 1])
+    xx2 = np.minimum(bboxes1[..., 2], bboxes2[..., 2])
+    yy2 = np.minimum(bboxes1[..., 3], bboxes2[..., 3])
+    w = np.maximum(0.0, xx2 - xx1)
+    h = np.maximum(0.0, yy2 - yy1)
+    wh = w * h
+    return wh / (
+        (bboxes1[..., 2] - bboxes1[..., 0]) * (bboxes1[..., 3] - bboxes1[..., 1])
+        + (bboxes2[..., 2] - bboxes2[..., 0]) * (bboxes2[..., 3] - bboxes2[..., 1])
+        - wh
+    )
+
+
+def convert_bboxes_to_z(bboxes: np.ndarray) -> np.ndarray:
+    '''
+    Batched convert_bbox_to_z: [x1,y1,x2,y2] -> [x,y,s,r], shape (N, 4).
+    '''
+    bboxes = np.asarray(bboxes, dtype=np.float64)
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    return np.stack([bboxes[:, 0] + w / 2.0, bboxes[:, 1] + h / 2.0, w * h, w / h], axis=1)
+
+
+def convert_x_to_bboxes(x: np.ndarray) -> np.ndarray:
+    '''
+    Batched convert_x_to_bbox: states (N, 7) -> [x1,y1,x2,y2], shape (N, 4).
+    '''
+    w = np.sqrt(x[:, 2] * x[:, 3])
+    h = x[:, 2] / w
+    return np.stack([x[:, 0] - w / 2.0, x[:, 1] - h / 2.0, x[:, 0] + w / 2.0, x[:, 1] + h / 2.0], axis=1)
+
+
+def associate_detections_to_trackers(
+    detections: np.ndarray,
+    trackers: np.ndarray,
+    iou_threshold: float = 0.3
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Vectorized sort_tracker.associate_detections_to_trackers with the same output (including order).
+    Returns matches, unmatched_detections and unmatched_trackers.
+    '''
+    if len(trackers) == 0:
+        return (
+            np.empty((0, 2), dtype=int),
+            np.arange(len(detections)),
+            np.empty((0, 5), dtype=int),
+        )
+    iou_matrix_ = iou_matrix(detections, trackers).astype(np.float32).reshape(len(detections), len(trackers))
+
+    if min(iou_matrix_.shape) > 0:
+        a = (iou_matrix_ > iou_threshold).astype(np.int32)
+        if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+            matched_indices = np.stack(np.where(a), axis=1)
+        else:
+            matched_indices = linear_assignment(-iou_matrix_)
+    else:
+        matched_indices = np.empty(shape=(0, 2))
+    matched_indices = np.asarray(matched_indices, dtype=int).reshape(-1, 2)
+
+    is_low_iou = iou_matrix_[matched_indices[:, 0], matched_indices[:, 1]] < iou_threshold
+    unmatched_detections = np.concatenate([
+        np.setdiff1d(np.arange(len(detections)), matched_indices[:, 0]),
+        matched_indices[is_low_iou, 0]
+    ])
+    unmatched_trackers = np.concatenate([
+        np.setdiff1d(np.arange(len(trackers)), matched_indices[:, 1]),
+        matched_indices[is_low_iou, 1]
+    ])
+    matches = matched_indices[~is_low_iou]
+
+    return matches, unmatched_detections, unmatched_trackers
+
+
+class VectorizedSort:
+    '''
+    SORT tracker with the same interface and output (including track ids) as sort_tracker.Sort,
+    where the Kalman filters of all tracks are kept as one stacked state:
+    x with shape (N, 7) and covariances P with shape (N, 7, 7), so predict and update are batched matrix ops.
+
+    Unlike the class counter of KalmanBoxTracker, track ids are counted from 0 by every tracker,
+    so trackers of concurrent sessions do not share any state (ids equal to ids of Sort with reset counter).
+    '''
+    def __init__(self, max_age: int = 1, min_hits: int = 3):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.frame_count = 0
+        self.next_id = 0
+
+        self.x = np.zeros((0, 7), dtype=np.float64)
+        self.P = np.zeros((0, 7, 7), dtype=np.float64)
+        self.ids = np.zeros(0, dtype=int)
+        self.time_since_update = np.zeros(0, dtype=int)
+        self.hits = np.zeros(0, dtype=int)
+        self.hit_streak = np.zeros(0, dtype=int)
+        self.age = np.zeros(0, dtype=int)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _keep_tracks(self, mask: np.ndarray):
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.ids = self.ids[mask]
+        self.time_since_update = self.time_since_update[mask]
+        self.hits = self.hits[mask]
+        self.hit_streak = self.hit_streak[mask]
+        self.age = self.age[mask]
+
+    def _predict(self) -> np.ndarray:
+        is_negative_scale = (self.x[:, 6] + self.x[:, 2]) <= 0
+        self.x[is_negative_scale, 6] = 0.
+        self.x = self.x @ F.T
+        self.P = F @ self.P @ F.T + Q
+        self.age += 1
+        self.hit_streak[self.time_since_update > 0] = 0
+        self.time_since_update += 1
+        return convert_x_to_bboxes(self.x)
+
+    def _update(self, idxs: np.ndarray, bboxes: np.ndarray):
+        if len(idxs) == 0:
+            return
+        self.time_since_update[idxs] = 0
+        self.hits[idxs] += 1
+        self.hit_streak[idxs] += 1
+
+        x, P = self.x[idxs], self.P[idxs]
+        y = convert_bboxes_to_z(bboxes) - x[:, :4]
+        PHT = P[:, :, :4]  # P @ H.T
+        S = PHT[:, :4, :] + R  # H @ P @ H.T + R
+        K = PHT @ np.linalg.inv(S)
+        x = x + (K @ y[:, :, None])[:, :, 0]
+        I_KH = np.eye(7) - K @ H
+        P = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ R @ K.transpose(0, 2, 1)
+        self.x[idxs], self.P[idxs] = x, P
+
+    def _create(self, bboxes: np.ndarray):
+        n = len(bboxes)
+        if n == 0:
+            return
+        x = np.zeros((n, 7), dtype=np.float64)
+        x[:, :4] = convert_bboxes_to_z(bboxes)
+        ids = self.next_id + np.arange(n)
+        self.next_id += n
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.repeat(P0[None], n, axis=0)])
+        self.ids = np.concatenate([self.ids, ids])
+        self.time_since_update = np.concatenate([self.time_since_update, np.zeros(n, dtype=int)])
+        self.hits = np.concatenate([self.hits, np.zeros(n, dtype=int)])
+        self.hit_streak = np.concatenate([self.hit_streak, np.zeros(n, dtype=int)])
+        self.age = np.concatenate([self.age, np.zeros(n, dtype=int)])
+
+    def update(self, dets: np.ndarray = np.empty((0, 5))) -> np.ndarray:
+        '''
+        Params:
+          dets - a numpy array of detections in the format [[x1,y1,x2,y2,score],[x1,y1,x2,y2,score],...]
+        Requires: this method must be called once for each frame even with empty detections.
+        Returns the a similar array, where the last column is the object ID.
+        '''
+        dets = np.asarray(dets, dtype=np.float64).reshape(-1, 5)
+        self.frame_count += 1
+        trks = self._predict()
+        is_valid = ~np.any(np.isnan(trks), axis=1)
+        trks = trks[is_valid]
+        self._keep_tracks(is_valid)
+        matched, unmatched_dets, _ = associate_detections_to_trackers(dets, trks)
+
+        self._update(matched[:, 1], dets[matched[:, 0], :4])
+        self._create(dets[unmatched_dets.astype(int), :4])
+
+        # Sort returns tracks in reversed order
+        is_returned = (self.time_since_update < 1) & (
+            (self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits)
+        )
+        ret_idxs = np.flatnonzero(is_returned)[::-1]
+        ret = np.column_stack([convert_x_to_bboxes(self.x[ret_idxs]), self.ids[ret_idxs] + 1])
+        self._keep_tracks(self.time_since_update <= self.max_age)
+        if len(ret) > 0:
+            return ret
+        return np.empty((0, 5))
@@ -1,11 +1,11 @@
 from dataclasses import dataclass
 from pathlib import Path
 from io import BytesIO
-from typing import Union, List, Tuple, Dict, Callable
+from typing import Union, List, Tuple, Dict, Callable, Iterable, Iterator, Literal
 
 import numpy as np
 import tempfile
-import imutils
+import time
 import imageio
 from tqdm import tqdm
 
@@ -16,16 +16,33 @@ from cv_pipeliner.inferencers.detection import DetectionInferencer
 from cv_pipeliner.inferencers.classification import ClassificationInferencer
 from cv_pipeliner.inferencers.pipeline import PipelineInferencer
 from cv_pipeliner.visualizers.core.image_data import visualize_image_data
+from cv_pipeliner.utils.streaming import StageStats, stream_through_stages, get_df_stages_stats
+from cv_pipeliner.logging import logger
 
 from cv_pipeliner.tracking.opencv_tracker import OpenCVTracker
-from cv_pipeliner.tracking.sort_tracker import Sort
+from cv_pipeliner.tracking.lk_tracker import LKTracker
+from cv_pipeliner.tracking.vectorized_sort_tracker import VectorizedSort
+from cv_pipeliner.tracking.classification_service import TrackClassificationService
+from cv_pipeliner.tracking.track_classification_policy import TrackClassificationPolicy, TracksClassificationVoting
+from cv_pipeliner.tracking.tracks_store import FrameResult, TracksStore
+from cv_pipeliner.tracking.detection_scheduler import DetectionScheduler, FixedRateDetectionScheduler
+from cv_pipeliner.tracking.frame_pyramid import FramePyramid, get_fit_scale, scale_bboxes
 
 
 @dataclass
-class FrameResult:
-    label: str
-    track_id: int
-    ready_at_frame: int
+class VideoFrame:
+    '''
+    Frame passed between stages of VideoInferencer.process_video.
+    bboxes and detection_scores are None for frames where detection is not run.
+    All bboxes are in coordinates of the full resolution frame (pyramid.frame).
+    '''
+    frame_idx: int
+    pyramid: FramePyramid
+    bboxes: np.ndarray = None
+    detection_scores: np.ndarray = None
+    tracked_bboxes: np.ndarray = None
+    tracked_ids: np.ndarray = None
+    ready_frames_at_the_moment: List[FrameResult] = None
 
 
 class VideoInferencer:
@@ -36,8 +53,39 @@ class VideoInferencer:
         write_labels: bool = True,
         frame_width: int = 640,
         frame_height: int = 1152,
-        batch_size: int = 16
+        batch_size: int = 16,
+        async_classification: bool = False,
+        classification_latency_budget: float = 1.,
+        classification_policy: TrackClassificationPolicy = None,
+        tracks_max_age: int = 30,
+        detection_scheduler: DetectionScheduler = None,
+        optical_flow_tracker: Literal['lk', 'opencv'] = 'lk',
+        detection_max_size: int = None,
+        tracking_max_size: int = 640
     ):
+        '''
+        With async_classification, new tracks are classified by TrackClassificationService in the background
+        and get their labels when ready, otherwise they are classified right on the detection frame.
+
+        By default every track is classified once by its first crop. With classification_policy, crops of tracks
+        are buffered on detection frames and tracks are re-classified until their aggregated label is confident
+        (see TrackClassificationPolicy).
+
+        Labels of tracks that were not seen for tracks_max_age frames are forgotten.
+
+        Detection is run every detection_delay ms of the video unless detection_scheduler is given
+        (then detection_delay of process_video is ignored, the scheduler is reset with fps of every video)
+        (e.g. AdaptiveDetectionScheduler), optical flow tracking is run on the other frames:
+        by batched LKTracker or by OpenCVTracker (requires cv2.MultiTracker_create from opencv-contrib < 4.5.1).
+
+        Every frame is downscaled once into FramePyramid and every consumer picks its level:
+        the output video fits into frame_width x frame_height, detection runs on the frame fitted into
+        detection_max_size x detection_max_size (the output resolution by default), optical flow tracking
+        on the frame fitted into tracking_max_size x tracking_max_size and classification crops are taken
+        from the full resolution frame. Frames are never upscaled.
+        '''
+        if optical_flow_tracker not in ['lk', 'opencv']:
+            raise ValueError(f"Unknown optical_flow_tracker: {optical_flow_tracker}")
         self.detection_inferencer = DetectionInferencer(pipeline_inferencer.model.detection_model)
         self.classification_inferencer = ClassificationInferencer(pipeline_inferencer.model.classification_model)
         self.draw_base_labels_with_given_label_to_base_label_image = (
@@ -46,12 +94,45 @@ class VideoInferencer:
         self.write_labels = write_labels
 
         self.sort_tracker = None
-        self.opencv_tracker = None
+        self.optical_flow_tracker_type = optical_flow_tracker
+        self.optical_flow_tracker = None
+        self.tracker_confidences = None
+        self.detection_scheduler = detection_scheduler
+        self._fixed_rate_detection_scheduler = None
 
         self.frame_width = frame_width
         self.frame_height = frame_height
-
-        self.current_ready_frames_queue: List[FrameResult] = []
+        self.detection_max_size = detection_max_size
+        self.tracking_max_size = tracking_max_size
+
+        self.tracks_store = TracksStore(max_age=tracks_max_age)
+        self.stages_stats: Dict[str, StageStats] = {}
+
+        if classification_policy is not None:
+            self.tracks_voting = TracksClassificationVoting(classification_policy)
+        else:
+            self.tracks_voting = None
+
+        if async_classification:
+            self.classification_service = TrackClassificationService(
+                classification_model=pipeline_inferencer.model.classification_model,
+                batch_size=batch_size,
+                latency_budget=classification_latency_budget,
+                top_n=classification_policy.top_n if classification_policy is not None else 1
+            )
+        else:
+            self.classification_service = None
+
+    def get_render_scale(self, frame_shape: tuple) -> float:
+        return get_fit_scale(frame_shape, max_width=self.frame_width, max_height=self.frame_height)
+
+    def get_detection_scale(self, frame_shape: tuple) -> float:
+        if self.detection_max_size is None:
+            return self.get_render_scale(frame_shape)
+        return get_fit_scale(frame_shape, max_width=self.detection_max_size, max_height=self.detection_max_size)
+
+    def get_tracking_scale(self, frame_shape: tuple) -> float:
+        return get_fit_scale(frame_shape, max_width=self.tracking_max_size, max_height=self.tracking_max_size)
 
     def update_sort_tracker(
         self,
@@ -72,25 +153,70 @@ class VideoInferencer:
 
     def run_tracking_on_frame(
         self,
-        frame: np.ndarray
+        pyramid: FramePyramid
     ) -> Tuple[List[Tuple[int, int, int, int]], List[int]]:
-        tracked_bboxes_optical = self.opencv_tracker.update(frame)
+        tracking_scale = self.get_tracking_scale(pyramid.shape)
+        tracked_bboxes_optical = scale_bboxes(
+            self.optical_flow_tracker.update(pyramid.get_level(tracking_scale)), 1 / tracking_scale
+        )
+        self.tracker_confidences = self.optical_flow_tracker.confidences
         tracked_bboxes, tracked_ids = self.update_sort_tracker(
             bboxes=tracked_bboxes_optical
         )
         return tracked_bboxes, tracked_ids
 
-    def run_pipeline_on_frame(
+    def get_detection_scheduler(
         self,
-        frame: np.ndarray,
+        detection_delay: int
+    ) -> DetectionScheduler:
+        if self.detection_scheduler is not None:
+            return self.detection_scheduler
+        if (
+            self._fixed_rate_detection_scheduler is None
+            or self._fixed_rate_detection_scheduler.detection_delay != detection_delay
+        ):
+            self._fixed_rate_detection_scheduler = FixedRateDetectionScheduler(detection_delay=detection_delay)
+        return self._fixed_rate_detection_scheduler
+
+    def detect_on_scheduled_frame(
+        self,
+        pyramid: FramePyramid,
         frame_idx: int,
-        fps: float,
         detection_delay: int,
-        classification_delay: int,
         detection_score_threshold: float,
         batch_size: int
-    ) -> Tuple[List[Tuple[int, int, int, int]], List[int]]:
-        frame = frame.copy()
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Runs detection on the detection level of the pyramid if the detection scheduler decides so.
+        Returns bboxes in full resolution coordinates and their scores or (None, None).
+        '''
+        detection_scale = self.get_detection_scale(pyramid.shape)
+        frame = pyramid.get_level(detection_scale)
+        detection_scheduler = self.get_detection_scheduler(detection_delay=detection_delay)
+        if not detection_scheduler.should_detect(
+            frame_idx=frame_idx, frame=frame, tracker_confidences=self.tracker_confidences
+        ):
+            return None, None
+        started_at = time.perf_counter()
+        bboxes, detection_scores = self.detect_on_frame(
+            frame=frame,
+            detection_score_threshold=detection_score_threshold,
+            batch_size=batch_size
+        )
+        detection_scheduler.on_detection(
+            frame_idx=frame_idx, frame=frame, detection_time=time.perf_counter() - started_at
+        )
+        return scale_bboxes(bboxes, 1 / detection_scale), detection_scores
+
+    def detect_on_frame(
+        self,
+        frame: np.ndarray,
+        detection_score_threshold: float,
+        batch_size: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Returns detected bboxes and their scores.
+        '''
         image_data = ImageData(image=frame)
         image_data_gen = BatchGeneratorImageData([image_data], batch_size=batch_size,
                                                  use_not_caught_elements_as_last_batch=True)
@@ -104,19 +230,64 @@ class VideoInferencer:
             for bbox_data in pred_image_data.bboxes_data
         ])
         detection_scores = np.array([bbox_data.detection_score for bbox_data in pred_image_data.bboxes_data])
+        return bboxes, detection_scores
 
-        self.opencv_tracker = OpenCVTracker(bboxes, frame)
+    def track_on_frame(
+        self,
+        pyramid: FramePyramid,
+        bboxes: np.ndarray = None,
+        detection_scores: np.ndarray = None
+    ) -> Tuple[List[Tuple[int, int, int, int]], List[int]]:
+        '''
+        Reinitializes optical flow tracker by detected bboxes if they are given, otherwise tracks bboxes
+        from the previous frame. Optical flow runs on the tracking level of the pyramid,
+        bboxes are in full resolution coordinates.
+        '''
+        if bboxes is None:
+            return self.run_tracking_on_frame(pyramid)
+        tracking_scale = self.get_tracking_scale(pyramid.shape)
+        frame = pyramid.get_level(tracking_scale)
+        level_bboxes = scale_bboxes(bboxes, tracking_scale)
+        if self.optical_flow_tracker_type == 'lk':
+            # the frame is already downscaled
+            self.optical_flow_tracker = LKTracker(level_bboxes, frame, scale=1.)
+        else:
+            self.optical_flow_tracker = OpenCVTracker(level_bboxes.round().astype(int), frame)
+        self.tracker_confidences = np.ones(len(bboxes))
         tracked_bboxes, tracked_ids = self.update_sort_tracker(
             bboxes=bboxes, scores=detection_scores
         )
+        return tracked_bboxes, tracked_ids
 
-        detection_delay_frames = int(round(detection_delay * fps / 1000))
-        classification_delay_frames = int(round(classification_delay * fps / 1000))
-
-        current_tracks_ids = [frame_result.track_id for frame_result in self.current_ready_frames_queue]
+    def classify_new_tracks(
+        self,
+        frame: np.ndarray,
+        frame_idx: int,
+        tracked_bboxes: List[Tuple[int, int, int, int]],
+        tracked_ids: List[int],
+        batch_size: int,
+        classification_delay_frames: int = 0
+    ):
+        '''
+        Classifies tracks that are not classified yet and adds their results to tracks_store,
+        labels are shown after classification_delay_frames.
+        With classification_service, the tracks are only submitted to it (see collect_classified_tracks).
+        '''
+        if self.tracks_voting is not None:
+            self.classify_tracks_by_voting(
+                frame=frame,
+                frame_idx=frame_idx,
+                tracked_bboxes=tracked_bboxes,
+                tracked_ids=tracked_ids,
+                batch_size=batch_size,
+                classification_delay_frames=classification_delay_frames
+            )
+            return
         current_not_tracked_items_idxs = [
             idx for idx, tracked_id in enumerate(tracked_ids)
-            if tracked_id not in current_tracks_ids
+            if tracked_id not in self.tracks_store and not (
+                self.classification_service is not None and self.classification_service.is_pending(tracked_id)
+            )
         ]
         if current_not_tracked_items_idxs:
             current_not_tracked_bboxes = tracked_bboxes[current_not_tracked_items_idxs]
@@ -125,20 +296,125 @@ class VideoInferencer:
                 BboxData(image=frame, xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax)
                 for (xmin, ymin, xmax, ymax) in current_not_tracked_bboxes
             ]
+            if self.classification_service is not None:
+                for bbox_data, tracked_id in zip(bboxes_data, current_not_tracked_ids):
+                    if bbox_data.xmin < bbox_data.xmax and bbox_data.ymin < bbox_data.ymax:
+                        self.classification_service.submit(
+                            track_id=tracked_id,
+                            cropped_image=bbox_data.open_cropped_image(),
+                            frame_idx=frame_idx
+                        )
+                return
+
             bboxes_data_gen = BatchGeneratorBboxData([bboxes_data], batch_size=batch_size,
                                                      use_not_caught_elements_as_last_batch=True)
             pred_bboxes_data = self.classification_inferencer.predict(bboxes_data_gen)[0]
 
             for bbox_data, tracked_id in zip(pred_bboxes_data, current_not_tracked_ids):
-                ready_at_frame = frame_idx
-                frame_result = FrameResult(
-                    label=bbox_data.label,
+                self.tracks_store.set_label(
                     track_id=tracked_id,
-                    ready_at_frame=ready_at_frame
+                    label=bbox_data.label,
+                    ready_at_frame=frame_idx + classification_delay_frames
                 )
-                self.current_ready_frames_queue.append(frame_result)
 
-        return tracked_bboxes, tracked_ids
+    def classify_tracks_by_voting(
+        self,
+        frame: np.ndarray,
+        frame_idx: int,
+        tracked_bboxes: List[Tuple[int, int, int, int]],
+        tracked_ids: List[int],
+        batch_size: int,
+        classification_delay_frames: int = 0
+    ):
+        '''
+        Buffers crops of all tracks that need them by tracks_voting policy and (re-)classifies the ready ones.
+        '''
+        for (xmin, ymin, xmax, ymax), tracked_id in zip(tracked_bboxes, tracked_ids):
+            if self.tracks_voting.is_done(tracked_id) or not (xmin < xmax and ymin < ymax):
+                continue
+            bbox_data = BboxData(image=frame, xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax)
+            self.tracks_voting.add_crop(
+                track_id=tracked_id,
+                cropped_image=bbox_data.open_cropped_image(),
+                frame_idx=frame_idx
+            )
+        if self.classification_service is not None:
+            tracks_crops = self.tracks_voting.pop_crops_to_classify(
+                exclude_tracks_ids=[
+                    track_id for track_id in self.tracks_voting.tracks_states
+                    if self.classification_service.is_pending(track_id)
+                ]
+            )
+            for track_id, track_crop in tracks_crops:
+                is_submitted = self.classification_service.submit(
+                    track_id=track_id,
+                    cropped_image=track_crop.cropped_image,
+                    frame_idx=track_crop.frame_idx
+                )
+                if not is_submitted:
+                    # the queue is full: the crop is submitted again with the next ready crops
+                    self.tracks_voting.return_crop(track_id=track_id, track_crop=track_crop)
+            return
+
+        tracks_crops = self.tracks_voting.pop_crops_to_classify()
+        if not tracks_crops:
+            return
+        bboxes_data = [BboxData(cropped_image=track_crop.cropped_image) for _, track_crop in tracks_crops]
+        bboxes_data_gen = BatchGeneratorBboxData([bboxes_data], batch_size=batch_size,
+                                                 use_not_caught_elements_as_last_batch=True)
+        pred_bboxes_data = self.classification_inferencer.predict(
+            bboxes_data_gen, top_n=self.tracks_voting.policy.top_n, disable_tqdm=True
+        )[0]
+        for (track_id, _), bbox_data in zip(tracks_crops, pred_bboxes_data):
+            label, _ = self.tracks_voting.add_prediction(
+                track_id=track_id,
+                labels_top_n=bbox_data.labels_top_n,
+                scores_top_n=bbox_data.classification_scores_top_n
+            )
+            self.tracks_store.set_label(
+                track_id=track_id,
+                label=label,
+                ready_at_frame=frame_idx + classification_delay_frames
+            )
+
+    def collect_classified_tracks(
+        self,
+        frame_idx: int,
+        classification_delay_frames: int = 0
+    ):
+        '''
+        Adds results that are ready in classification_service to tracks_store without waiting.
+        Labels are shown from the current frame, but not earlier than classification_delay_frames
+        after the frame of the crop.
+        '''
+        if self.classification_service is None:
+            return
+        for result in self.classification_service.get_ready_results():
+            label = result.label
+            if self.tracks_voting is not None:
+                label, _ = self.tracks_voting.add_prediction(
+                    track_id=result.track_id,
+                    labels_top_n=result.labels_top_n,
+                    scores_top_n=result.classification_scores_top_n
+                )
+            self.tracks_store.set_label(
+                track_id=result.track_id,
+                label=label,
+                ready_at_frame=max(frame_idx, result.frame_idx + classification_delay_frames)
+            )
+
+    def update_tracks_store(
+        self,
+        frame_idx: int,
+        tracked_ids: List[int]
+    ) -> List[FrameResult]:
+        '''
+        Marks tracks as seen, forgets expired ones and returns ready results of the tracks at the frame.
+        '''
+        for track_id in self.tracks_store.update(frame_idx=frame_idx, tracks_ids=tracked_ids):
+            if self.tracks_voting is not None:
+                self.tracks_voting.remove_track(track_id)
+        return self.tracks_store.get_ready_frames_results(frame_idx=frame_idx, tracks_ids=tracked_ids)
 
     def draw_overlay(
         self,
@@ -148,19 +424,22 @@ class VideoInferencer:
         ready_frames_at_the_moment: List['FrameResult'],
         filter_by_labels: List[str] = None
     ) -> np.ndarray:
+        '''
+        tracked_bboxes are in coordinates of the given frame.
+        '''
         image = frame.copy()
         tracked_bboxes = tracked_bboxes.astype(int)
-        ready_tracks_ids_at_the_moment = [
-            ready_frame.track_id for ready_frame in ready_frames_at_the_moment
-        ]
+        ready_frames_by_tracks_ids = {
+            ready_frame.track_id: ready_frame for ready_frame in ready_frames_at_the_moment
+        }
 
         current_bboxes_data = []
         for bbox, track_id in zip(tracked_bboxes, tracked_ids):
-            if track_id not in ready_tracks_ids_at_the_moment:
+            if track_id not in ready_frames_by_tracks_ids:
                 continue
 
             xmin, ymin, xmax, ymax = bbox
-            ready_frame = ready_frames_at_the_moment[ready_tracks_ids_at_the_moment.index(track_id)]
+            ready_frame = ready_frames_by_tracks_ids[track_id]
             label = ready_frame.label
             current_bbox_data = BboxData(image=image, xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax, label=label)
             current_bboxes_data.append(current_bbox_data)
@@ -184,52 +463,140 @@ class VideoInferencer:
 
     def process_video(
         self,
-        video_file: Union[str, Path, BytesIO],
+        video_file: Union[str, Path, BytesIO, Iterable[np.ndarray]],
         classification_delay: int,
         detection_delay: int,
         detection_score_threshold: float,
         filter_by_labels: List[str],
         disable_tqdm: bool = False,
-        batch_size: int = 16
-    ) -> tempfile.NamedTemporaryFile:
-        result = []
-
-        self.sort_tracker = Sort()
-        with imageio.get_reader(video_file, ".mp4") as reader:
-            fps = reader.get_meta_data()["fps"]
-
-            for frame_idx, frame in tqdm(list(enumerate(reader)), disable=disable_tqdm):
-                frame = imutils.resize(frame, width=self.frame_height, height=self.frame_height)
-
-                detection_delay_frames = detection_delay * fps / 1000
-                if frame_idx % detection_delay_frames == 0:
-                    tracked_bboxes, tracked_ids = self.run_pipeline_on_frame(
-                        frame=frame,
-                        frame_idx=frame_idx,
-                        fps=fps,
-                        detection_delay=detection_delay,
-                        classification_delay=classification_delay,
-                        detection_score_threshold=detection_score_threshold,
-                        batch_size=batch_size
-                    )
-                else:
-                    tracked_bboxes, tracked_ids = self.run_tracking_on_frame(frame)
-
-                ready_frames_at_the_moment = [
-                    ready_frame
-                    for ready_frame in self.current_ready_frames_queue
-                    if ready_frame.ready_at_frame <= frame_idx
-                ]
+        batch_size: int = 16,
+        fps: float = None,
+        output_file: Union[str, Path] = None,
+        queue_size: int = 8
+    ) -> str:
+        '''
+        Processes the video in streaming mode and writes the result to output_file (to the temporary file by default).
+
+        Decoding, detection, tracking, classification, rendering and encoding run in separate threads
+        connected by bounded queues of queue_size frames, so memory usage doesn't depend on the video length.
+        Per-stage throughput is logged and kept in self.stages_stats (see utils.streaming.get_df_stages_stats).
+        video_file can be any iterable (e.g. generator) of RGB frames, then fps must be given.
+        detection_delay is ignored if detection_scheduler was given to the constructor.
+        '''
+        if output_file is None:
+            output_file = tempfile.NamedTemporaryFile(suffix='.mp4').name
+        fps, frames = open_video_frames(video_file, fps=fps)
+
+        self.sort_tracker = VectorizedSort()
+        self.tracker_confidences = None
+        self.get_detection_scheduler(detection_delay=detection_delay).reset(fps=fps)
+        classification_delay_frames = int(round(classification_delay * fps / 1000))
 
-                result_frame = self.draw_overlay(
-                    frame=frame,
-                    tracked_bboxes=tracked_bboxes,
-                    tracked_ids=tracked_ids,
-                    ready_frames_at_the_moment=ready_frames_at_the_moment,
-                    filter_by_labels=filter_by_labels
+        def detect(frame_idx_and_frame: Tuple[int, np.ndarray]) -> VideoFrame:
+            frame_idx, frame = frame_idx_and_frame
+            video_frame = VideoFrame(frame_idx=frame_idx, pyramid=FramePyramid(frame))
+            # tracker confidences come from the tracking stage and can be a few frames late
+            video_frame.bboxes, video_frame.detection_scores = self.detect_on_scheduled_frame(
+                pyramid=video_frame.pyramid,
+                frame_idx=frame_idx,
+                detection_delay=detection_delay,
+                detection_score_threshold=detection_score_threshold,
+                batch_size=batch_size
+            )
+            return video_frame
+
+        def track(video_frame: VideoFrame) -> VideoFrame:
+            video_frame.tracked_bboxes, video_frame.tracked_ids = self.track_on_frame(
+                pyramid=video_frame.pyramid,
+                bboxes=video_frame.bboxes,
+                detection_scores=video_frame.detection_scores
+            )
+            return video_frame
+
+        def classify(video_frame: VideoFrame) -> VideoFrame:
+            if video_frame.bboxes is not None:
+                self.classify_new_tracks(
+                    frame=video_frame.pyramid.frame,
+                    frame_idx=video_frame.frame_idx,
+                    tracked_bboxes=video_frame.tracked_bboxes,
+                    tracked_ids=video_frame.tracked_ids,
+                    batch_size=batch_size,
+                    classification_delay_frames=classification_delay_frames
                 )
-                result.append(result_frame)
-
-        temp_file = tempfile.NamedTemporaryFile(suffix='.mp4').name
-        imageio.mimwrite(temp_file, result, codec="h264", fps=fps)
-        return temp_file
+            self.collect_classified_tracks(
+                frame_idx=video_frame.frame_idx,
+                classification_delay_frames=classification_delay_frames
+            )
+            video_frame.ready_frames_at_the_moment = self.update_tracks_store(
+                frame_idx=video_frame.frame_idx,
+                tracked_ids=video_frame.tracked_ids
+            )
+            return video_frame
+
+        def render(video_frame: VideoFrame) -> np.ndarray:
+            render_scale = self.get_render_scale(video_frame.pyramid.shape)
+            return self.draw_overlay(
+                frame=video_frame.pyramid.get_level(render_scale),
+                tracked_bboxes=scale_bboxes(video_frame.tracked_bboxes, render_scale).round().astype(int),
+                tracked_ids=video_frame.tracked_ids,
+                ready_frames_at_the_moment=video_frame.ready_frames_at_the_moment,
+                filter_by_labels=filter_by_labels
+            )
+
+        if self.classification_service is not None:
+            self.classification_service.start()
+        with imageio.get_writer(output_file, format='FFMPEG', mode='I', fps=fps, codec='h264') as writer:
+            try:
+                # Every stage runs in its own thread, so detection of the next frames overlaps with
+                # tracking, classification, rendering and encoding of the previous ones.
+                # Tracking and classification keep state, so they can't be parallelized by frames.
+                for _ in tqdm(
+                    stream_through_stages(
+                        items=enumerate(frames),
+                        stages={
+                            'detection': detect,
+                            'tracking': track,
+                            'classification': classify,
+                            'render': render,
+                            'encode': writer.append_data
+                        },
+                        queue_size=queue_size,
+                        stages_stats=self.stages_stats,
+                        source_name='decode'
+                    ),
+                    disable=disable_tqdm
+                ):
+                    pass
+            finally:
+                if hasattr(frames, 'close'):
+                    frames.close()
+                if self.classification_service is not None:
+                    self.classification_service.stop()
+        logger.info(f"Stages stats (frames per second):\n{get_df_stages_stats(self.stages_stats)}")
+
+        return str(output_file)
+
+
+def open_video_frames(
+    video: Union[str, Path, BytesIO, Iterable[np.ndarray]],
+    fps: float = None
+) -> Tuple[float, Iterator[np.ndarray]]:
+    '''
+    Returns fps and lazy iterator of frames. Video files are decoded frame by frame.
+    '''
+    if isinstance(video, (str, Path, BytesIO)):
+        reader = imageio.get_reader(video, '.mp4')
+        if fps is None:
+            fps = reader.get_meta_data()['fps']
+
+        def iterate_reader():
+            try:
+                for frame in reader:
+                    yield frame
+            finally:
+                reader.close()
+
+        return fps, iterate_reader()
+    else:
+        assert fps is not None, "fps must be given for frames iterables"
+        return fps, iter(video)
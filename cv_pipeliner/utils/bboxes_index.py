@@ -0,0 +1,148 @@
+from typing import Dict, List, Literal, Tuple
+
+import numpy as np
+
+
+class BboxesIndex:
+    '''
+    Index over bboxes in (xmin, ymin, xmax, ymax) format:
+        - hash of coords for O(1) lookups of exact bbox,
+        - uniform grid (bboxes are put into every cell they cover) for point and region queries.
+          Bboxes covering more than max_cells_per_bbox cells are not put into the grid, they are kept
+          in the separate list which is checked at every query, so the memory of the grid is bounded.
+
+    The grid is built lazily at the first region query. Returned indexes are positions in the given bboxes.
+    Bboxes with NaN coords (placeholders) are kept in positions, but never found.
+    '''
+    def __init__(
+        self,
+        bboxes: List[Tuple[int, int, int, int]],
+        cell_size: int = None,
+        max_cells_per_bbox: int = 64
+    ):
+        assert max_cells_per_bbox >= 1
+        self.bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.cell_size = cell_size
+        self.max_cells_per_bbox = max_cells_per_bbox
+        self._large_idxs = np.array([], dtype=np.int64)
+        self._idxs_by_coords = None
+        self._grid = None
+
+    def __len__(self) -> int:
+        return len(self.bboxes)
+
+    def _build_idxs_by_coords(self) -> Dict[Tuple[float, float, float, float], int]:
+        idxs_by_coords = {}
+        for idx, coords in enumerate(map(tuple, self.bboxes.tolist())):
+            idxs_by_coords.setdefault(coords, idx)  # the first bbox is returned for repeated coords
+        return idxs_by_coords
+
+    def find_by_coords(
+        self,
+        bbox: Tuple[int, int, int, int]
+    ) -> int:
+        '''
+        Returns index of the (first) bbox with exactly the same coords or None if there is no such bbox.
+        '''
+        if self._idxs_by_coords is None:
+            self._idxs_by_coords = self._build_idxs_by_coords()
+        return self._idxs_by_coords.get(tuple(float(coord) for coord in bbox))
+
+    def _get_cells_ranges(self, bboxes: np.ndarray) -> np.ndarray:
+        return np.floor_divide(bboxes, self.cell_size).astype(np.int64)
+
+    def _build_grid(self) -> Dict[Tuple[int, int], np.ndarray]:
+        valid_idxs = np.flatnonzero(np.all(np.isfinite(self.bboxes), axis=1))
+        bboxes = self.bboxes[valid_idxs]
+        bboxes = np.concatenate([
+            np.minimum(bboxes[:, :2], bboxes[:, 2:]), np.maximum(bboxes[:, :2], bboxes[:, 2:])
+        ], axis=1)
+        if self.cell_size is None:
+            if len(bboxes) > 0:
+                sizes = np.concatenate([bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1]])
+                self.cell_size = max(int(np.median(sizes)), 1)
+            else:
+                self.cell_size = 1
+        cells_ranges = self._get_cells_ranges(bboxes)  # (xmin_cell, ymin_cell, xmax_cell, ymax_cell)
+        n_cells_x = cells_ranges[:, 2] - cells_ranges[:, 0] + 1
+        n_cells_y = cells_ranges[:, 3] - cells_ranges[:, 1] + 1
+        n_cells = n_cells_x * n_cells_y
+
+        # Large bboxes would take too many cells, they are checked at every query instead
+        is_large = n_cells > self.max_cells_per_bbox
+        self._large_idxs = valid_idxs[is_large]
+        valid_idxs, cells_ranges = valid_idxs[~is_large], cells_ranges[~is_large]
+        n_cells_x, n_cells = n_cells_x[~is_large], n_cells[~is_large]
+
+        # Every bbox is repeated for every cell it covers
+        positions = np.repeat(np.arange(len(valid_idxs)), n_cells)
+        offsets = np.arange(len(positions)) - np.repeat(np.cumsum(n_cells) - n_cells, n_cells)
+        cells_x = cells_ranges[positions, 0] + offsets % n_cells_x[positions]
+        cells_y = cells_ranges[positions, 1] + offsets // n_cells_x[positions]
+        idxs = valid_idxs[positions]
+
+        idxs_sorted = np.lexsort((idxs, cells_y, cells_x))
+        idxs, cells_x, cells_y = idxs[idxs_sorted], cells_x[idxs_sorted], cells_y[idxs_sorted]
+        is_cell_start = np.ones(len(idxs), dtype=bool)
+        is_cell_start[1:] = (cells_x[1:] != cells_x[:-1]) | (cells_y[1:] != cells_y[:-1])
+        cells_starts = np.flatnonzero(is_cell_start)
+        return {
+            (cell_x, cell_y): cell_idxs
+            for cell_x, cell_y, cell_idxs in zip(
+                cells_x[cells_starts].tolist(), cells_y[cells_starts].tolist(), np.split(idxs, cells_starts[1:])
+            )
+        }
+
+    def query_region(
+        self,
+        region: Tuple[int, int, int, int],
+        how: Literal['intersects', 'inside'] = 'intersects'
+    ) -> np.ndarray:
+        '''
+        Returns sorted indexes of bboxes that intersect the region or are inside of it (borders are included).
+        '''
+        if len(self.bboxes) == 0:
+            return np.array([], dtype=np.int64)
+        if self._grid is None:
+            self._grid = self._build_grid()
+        xmin, ymin, xmax, ymax = region
+        cell_xmin, cell_ymin, cell_xmax, cell_ymax = self._get_cells_ranges(
+            np.array([xmin, ymin, xmax, ymax], dtype=np.float64)
+        ).tolist()
+        if (cell_xmax - cell_xmin + 1) * (cell_ymax - cell_ymin + 1) >= len(self._grid):
+            # The region is big: checking all bboxes is cheaper than visiting its cells (NaN never pass the mask)
+            candidates = np.arange(len(self.bboxes))
+        else:
+            candidates = [
+                self._grid[(cell_x, cell_y)]
+                for cell_x in range(cell_xmin, cell_xmax + 1)
+                for cell_y in range(cell_ymin, cell_ymax + 1)
+                if (cell_x, cell_y) in self._grid
+            ] + [self._large_idxs]
+            candidates = np.unique(np.concatenate(candidates))
+        bboxes = self.bboxes[candidates]
+        if how == 'intersects':
+            mask = (
+                (bboxes[:, 0] <= xmax) & (bboxes[:, 2] >= xmin)
+                & (bboxes[:, 1] <= ymax) & (bboxes[:, 3] >= ymin)
+            )
+        elif how == 'inside':
+            mask = (
+                (bboxes[:, 0] >= xmin) & (bboxes[:, 2] <= xmax)
+                & (bboxes[:, 1] >= ymin) & (bboxes[:, 3] <= ymax)
+                & (bboxes[:, 0] <= xmax) & (bboxes[:, 2] >= xmin)
+                & (bboxes[:, 1] <= ymax) & (bboxes[:, 3] >= ymin)
+            )
+        else:
+            raise ValueError(f"Unknown how: {how}")
+        return candidates[mask]
+
+    def query_point(
+        self,
+        x: int,
+        y: int
+    ) -> np.ndarray:
+        '''
+        Returns sorted indexes of bboxes containing the point (x, y).
+        '''
+        return self.query_region((x, y, x, y), how='intersects')
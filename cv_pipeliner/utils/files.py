@@ -1,7 +1,11 @@
+import importlib
+import sys
 import tempfile
 from pathlib import Path
+from typing import Callable, List, Union
 
 import fsspec
+import numpy as np
 from pathy import Pathy
 
 from cv_pipeliner.logging import logger
@@ -24,3 +28,25 @@ def copy_files_from_directory_to_temp_directory(directory: str) -> tempfile.Temp
                 out.write(src.read())
 
     return temp_dir
+
+
+def get_preprocess_input_from_script_file(
+    script_file: Union[str, Path]
+) -> Callable[[List[np.ndarray]], np.ndarray]:
+    '''
+    Imports function preprocess_input from the script file (local or remote).
+    '''
+    with fsspec.open(script_file, 'r') as src:
+        script_code = src.read()
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        tmpdirname = Path(tmpdirname)
+        module_folder = tmpdirname / 'module'
+        module_folder.mkdir()
+        script_file = module_folder / f'preprocess_input_{tmpdirname.name}.py'
+        with open(script_file, 'w') as out:
+            out.write(script_code)
+        sys.path.append(str(script_file.parent.absolute()))
+        module = importlib.import_module(script_file.stem)
+        importlib.reload(module)
+        sys.path.pop()
+    return module.preprocess_input
@@ -2,6 +2,8 @@ import copy
 
 from typing import List, Tuple
 
+import numpy as np
+
 from cv_pipeliner.core.data import ImageData, BboxData
 
 
@@ -60,14 +62,13 @@ def cut_images_data_by_bboxes(
     images_data = copy.deepcopy(images_data)
     for image_data, bbox in zip(images_data, bboxes):
         xmin, ymin, xmax, ymax = bbox
-        image_data.bboxes_data = [
-            bbox_data
+        coords = np.array([
+            (bbox_data.xmin, bbox_data.ymin, bbox_data.xmax, bbox_data.ymax)
             for bbox_data in image_data.bboxes_data
-            if (
-                bbox_data.xmin >= xmin and bbox_data.xmin <= xmax
-                and bbox_data.xmax >= xmin and bbox_data.xmax <= xmax
-                and bbox_data.ymin >= ymin and bbox_data.ymin <= ymax
-                and bbox_data.ymax >= ymin and bbox_data.ymax <= ymax
-            )
-        ]
+        ], dtype=np.float64).reshape(-1, 4)
+        inside_mask = (
+            (coords[:, [0, 2]] >= xmin).all(axis=1) & (coords[:, [0, 2]] <= xmax).all(axis=1)
+            & (coords[:, [1, 3]] >= ymin).all(axis=1) & (coords[:, [1, 3]] <= ymax).all(axis=1)
+        )
+        image_data.bboxes_data = [image_data.bboxes_data[idx] for idx in np.flatnonzero(inside_mask)]
     return images_data
@@ -0,0 +1,75 @@
+from pathlib import Path
+from typing import Dict, List, Literal, Union
+
+import fsspec
+import numpy as np
+import onnxruntime as ort
+
+ONNX_TYPE_TO_DTYPE = {
+    'tensor(float)': np.float32,
+    'tensor(float16)': np.float16,
+    'tensor(double)': np.float64,
+    'tensor(uint8)': np.uint8,
+    'tensor(int8)': np.int8,
+    'tensor(int32)': np.int32,
+    'tensor(int64)': np.int64
+}
+
+
+def load_onnxruntime_session(
+    model_path: Union[str, Path],
+    providers: List[str] = None,
+    intra_op_num_threads: int = 0,
+    inter_op_num_threads: int = 0,
+    execution_mode: Literal["sequential", "parallel"] = "sequential"
+) -> ort.InferenceSession:
+    '''
+    Loads ONNX model (local or remote) to InferenceSession with all graph optimizations.
+    intra_op_num_threads is the number of threads of one operator, inter_op_num_threads is the number of
+    operators run in parallel (with execution_mode "parallel"), 0 is the default of ONNX Runtime.
+    providers are ordered by priority, by default only CPUExecutionProvider is used.
+    '''
+    if execution_mode not in ["sequential", "parallel"]:
+        raise ValueError("execution_mode can be sequential or parallel.")
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = intra_op_num_threads
+    sess_options.inter_op_num_threads = inter_op_num_threads
+    sess_options.execution_mode = (
+        ort.ExecutionMode.ORT_SEQUENTIAL if execution_mode == "sequential" else ort.ExecutionMode.ORT_PARALLEL
+    )
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    with fsspec.open(str(model_path), 'rb') as src:
+        model_bytes = src.read()
+    return ort.InferenceSession(
+        model_bytes,
+        sess_options=sess_options,
+        providers=providers if providers is not None else ['CPUExecutionProvider']
+    )
+
+
+def get_input_dtype(session: ort.InferenceSession, input_name: str) -> np.dtype:
+    input_type = {node.name: node.type for node in session.get_inputs()}[input_name]
+    if input_type not in ONNX_TYPE_TO_DTYPE:
+        raise ValueError(f"Input {input_name} has unsupported type {input_type}.")
+    return np.dtype(ONNX_TYPE_TO_DTYPE[input_type])
+
+
+def run_onnxruntime_session(
+    session: ort.InferenceSession,
+    inputs: Dict[str, np.ndarray],
+    output_names: List[str],
+    use_io_binding: bool = True
+) -> List[np.ndarray]:
+    '''
+    Runs the session. With use_io_binding inputs are bound without copying (they must be C-contiguous
+    arrays of the input types) and outputs are allocated by ONNX Runtime.
+    '''
+    if not use_io_binding:
+        return session.run(output_names, inputs)
+    io_binding = session.io_binding()
+    for input_name, value in inputs.items():
+        io_binding.bind_cpu_input(input_name, value)
+    for output_name in output_names:
+        io_binding.bind_output(output_name)
+    session.run_with_iobinding(io_binding)
+    return io_binding.copy_outputs_to_cpu()
@@ -0,0 +1,221 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Union
+
+import pandas as pd
+
+_END_OF_STREAM = object()
+
+
+@dataclass
+class StageStats:
+    '''
+    Live statistics of the stage: busy_time is the time spent in the stage function itself,
+    wall_time is the time since the stage was started (updated after every item).
+    '''
+    name: str
+    n_items: int = 0
+    busy_time: float = 0.
+    wall_time: float = 0.
+
+    @property
+    def throughput(self) -> float:
+        '''
+        Items per second the stage can process if it never waits for its neighbours.
+        '''
+        return self.n_items / max(self.busy_time, 1e-6)
+
+    @property
+    def utilization(self) -> float:
+        return self.busy_time / max(self.wall_time, 1e-6)
+
+
+def get_df_stages_stats(stages_stats: Dict[str, StageStats]) -> pd.DataFrame:
+    '''
+    Returns table of stages stats. The stage with the lowest throughput is the bottleneck of the stream.
+    '''
+    return pd.DataFrame(
+        {
+            'n_items': [stage_stats.n_items for stage_stats in stages_stats.values()],
+            'busy_time': [stage_stats.busy_time for stage_stats in stages_stats.values()],
+            'wall_time': [stage_stats.wall_time for stage_stats in stages_stats.values()],
+            'throughput': [stage_stats.throughput for stage_stats in stages_stats.values()],
+            'utilization': [stage_stats.utilization for stage_stats in stages_stats.values()],
+        },
+        index=list(stages_stats),
+        columns=['n_items', 'busy_time', 'wall_time', 'throughput', 'utilization']
+    )
+
+
+def _put(queue_: queue.Queue, item: Any, stop_event: threading.Event) -> bool:
+    '''
+    Blocking put (backpressure) that gives up when the stream is stopped.
+    '''
+    while not stop_event.is_set():
+        try:
+            queue_.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(queue_: queue.Queue, stop_event: threading.Event, timeout: float = 0.1) -> Any:
+    while not stop_event.is_set():
+        try:
+            return queue_.get(timeout=timeout)
+        except queue.Empty:
+            pass
+    return _END_OF_STREAM
+
+
+STOP_POLL_INTERVAL = 0.05  # seconds between checks of the stop event by the waiting worker
+
+
+def collect_micro_batch(
+    queue_: queue.Queue,
+    stop_event: threading.Event,
+    max_batch_size: int,
+    max_batch_delay: float
+) -> List[Any]:
+    '''
+    Blocks until the first request comes, then collects the micro-batch until it has max_batch_size requests
+    or the first request has waited for max_batch_delay seconds (requests have submitted_at by time.perf_counter).
+    Returns None when stop_event is set. The queue is polled, so the stop does not need a slot in the bounded queue.
+    '''
+    request = _get(queue_, stop_event, timeout=STOP_POLL_INTERVAL)
+    if request is _END_OF_STREAM:
+        return None
+    batch = [request]
+    deadline = request.submitted_at + max_batch_delay
+    while len(batch) < max_batch_size and not stop_event.is_set():
+        timeout = min(deadline - time.perf_counter(), STOP_POLL_INTERVAL)
+        try:
+            if timeout > 0:
+                request = queue_.get(timeout=timeout)
+            else:
+                request = queue_.get_nowait()
+        except queue.Empty:
+            if time.perf_counter() < deadline:
+                continue
+            break
+        batch.append(request)
+    return batch
+
+
+def _run_source(
+    items: Iterable[Any],
+    output_queue: queue.Queue,
+    stop_event: threading.Event,
+    errors: List[BaseException],
+    stage_stats: StageStats
+):
+    try:
+        started_at = time.perf_counter()
+        items = iter(items)
+        while True:
+            item_started_at = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                break
+            finished_at = time.perf_counter()
+            stage_stats.n_items += 1
+            stage_stats.busy_time += finished_at - item_started_at
+            stage_stats.wall_time = finished_at - started_at
+            if not _put(output_queue, item, stop_event):
+                return
+    except BaseException as e:
+        errors.append(e)
+        stop_event.set()
+        return
+    _put(output_queue, _END_OF_STREAM, stop_event)
+
+
+def _run_stage(
+    func: Callable[[Any], Any],
+    input_queue: queue.Queue,
+    output_queue: queue.Queue,
+    stop_event: threading.Event,
+    errors: List[BaseException],
+    stage_stats: StageStats
+):
+    try:
+        started_at = time.perf_counter()
+        while True:
+            item = _get(input_queue, stop_event)
+            if item is _END_OF_STREAM:
+                break
+            item_started_at = time.perf_counter()
+            result = func(item)
+            finished_at = time.perf_counter()
+            stage_stats.n_items += 1
+            stage_stats.busy_time += finished_at - item_started_at
+            stage_stats.wall_time = finished_at - started_at
+            if not _put(output_queue, result, stop_event):
+                return
+    except BaseException as e:
+        errors.append(e)
+        stop_event.set()
+        return
+    _put(output_queue, _END_OF_STREAM, stop_event)
+
+
+def stream_through_stages(
+    items: Iterable[Any],
+    stages: Union[List[Callable[[Any], Any]], Dict[str, Callable[[Any], Any]]],
+    queue_size: int = 8,
+    stages_stats: Dict[str, StageStats] = None,
+    source_name: str = 'source'
+) -> Iterator[Any]:
+    '''
+    Lazily applies stages to items one by one: iteration over items and every stage run in their own threads
+    connected by bounded queues of queue_size items, so at most ~(len(stages) + 1) * queue_size items are in memory
+    and items can be an endless generator. Order of items is kept.
+
+    Stages can be given by names. If stages_stats is given, it's filled with live StageStats of the source
+    (named source_name) and every stage while the stream is running.
+
+    An exception in any stage stops the stream and is raised to the consumer.
+    '''
+    if not isinstance(stages, dict):
+        stages = {f'stage_{idx}': func for idx, func in enumerate(stages)}
+    assert source_name not in stages, f"'{source_name}' is reserved for iteration over items"
+    if stages_stats is None:
+        stages_stats = {}
+    stages_stats.clear()
+    stages_stats[source_name] = StageStats(name=source_name)
+    for name in stages:
+        stages_stats[name] = StageStats(name=name)
+
+    stop_event = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [
+        threading.Thread(
+            target=_run_source, args=(items, queues[0], stop_event, errors, stages_stats[source_name]),
+            name=source_name, daemon=True
+        )
+    ] + [
+        threading.Thread(
+            target=_run_stage, args=(func, queues[i], queues[i+1], stop_event, errors, stages_stats[name]),
+            name=name, daemon=True
+        )
+        for i, (name, func) in enumerate(stages.items())
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = _get(queues[-1], stop_event)
+            if item is _END_OF_STREAM:
+                break
+            yield item
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,240 @@
+import asyncio
+import base64
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from cv_pipeliner.logging import logger
+
+
+def encode_image_jpeg(image: np.ndarray, jpeg_quality: int = 100) -> bytes:
+    '''
+    Encodes RGB image to JPEG.
+    '''
+    is_success, buffer = cv2.imencode(
+        '.jpg', cv2.cvtColor(np.ascontiguousarray(image, dtype=np.uint8), cv2.COLOR_RGB2BGR),
+        [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+    )
+    assert is_success, "Failed to encode the image"
+    return buffer.tobytes()
+
+
+def encode_image_b64(image: np.ndarray, jpeg_quality: int = 100) -> Dict[str, str]:
+    '''
+    Encodes RGB image to JPEG in the binary format of TF Serving REST API: {'b64': ...}.
+    '''
+    return {'b64': base64.b64encode(encode_image_jpeg(image, jpeg_quality=jpeg_quality)).decode('utf-8')}
+
+
+class TFServingRESTClient:
+    '''
+    Client of TF Serving (KFServing) REST predict API, url is like http://host:8501/v1/models/model:predict.
+
+    Connections are kept alive in the pool of max_in_flight connections. Instances are sent in batches
+    of max_batch_size in one request (row format: {"instances": [...]}), batches are sent concurrently with
+    at most max_in_flight requests in flight (shared by all threads using the client).
+    Requests failed by connection errors, timeouts (timeout seconds) or RETRY_STATUS_CODES are retried
+    max_retries times with exponential backoff (backoff, 2 * backoff, ... seconds).
+
+    apredict and apredict_images are asyncio variants that send requests with aiohttp in the running loop
+    (the aiohttp session is closed by aclose).
+    '''
+    RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+    def __init__(
+        self,
+        url: str,
+        max_batch_size: int = 16,
+        max_in_flight: int = 4,
+        timeout: float = 10.,
+        max_retries: int = 3,
+        backoff: float = 0.1
+    ):
+        assert max_batch_size > 0 and max_in_flight > 0
+        self.url = url
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='tf_serving_client')
+        self._aiohttp_session = None
+        self._aiohttp_loop = None
+        self._aiohttp_semaphore = None
+
+    def __enter__(self) -> 'TFServingRESTClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    async def __aenter__(self) -> 'TFServingRESTClient':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+        self.close()
+
+    async def aclose(self):
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+
+    def _get_predictions(self, status_code: int, content: bytes, is_last_attempt: bool) -> Optional[List]:
+        '''
+        Returns predictions of the response or None if the request should be retried.
+        '''
+        if status_code < 400:
+            return json.loads(content)['predictions']
+        if status_code not in self.RETRY_STATUS_CODES or is_last_attempt:
+            try:
+                error = json.loads(content)['error']
+            except (ValueError, KeyError):
+                error = content.decode('utf-8', errors='replace')
+            raise ValueError(f"TF Serving returned {status_code}: {error}")
+        logger.warning(f"TFServingRESTClient: got {status_code}, retrying...")
+        return None
+
+    def _post(self, instances: List) -> List:
+        data = json.dumps({'instances': instances})
+        for attempt in range(self.max_retries + 1):
+            is_last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(
+                    url=self.url, data=data, headers={'Content-Type': 'application/json'}, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if is_last_attempt:
+                    raise
+                logger.warning(f"TFServingRESTClient: request failed ({e}), retrying...")
+            else:
+                predictions = self._get_predictions(response.status_code, response.content, is_last_attempt)
+                if predictions is not None:
+                    return predictions
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def _get_aiohttp_session(self):
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        if self._aiohttp_session is None or self._aiohttp_loop is not loop:
+            # the session and the semaphore are bound to the loop they are created in
+            self._aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._aiohttp_loop = loop
+            self._aiohttp_semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._aiohttp_session
+
+    async def _apost(self, instances: List) -> List:
+        import aiohttp
+        session = self._get_aiohttp_session()
+        data = json.dumps({'instances': instances})
+        # the timeout starts when the connection is free
+        async with self._aiohttp_semaphore:
+            for attempt in range(self.max_retries + 1):
+                is_last_attempt = attempt == self.max_retries
+                try:
+                    async with session.post(
+                        url=self.url, data=data, headers={'Content-Type': 'application/json'}
+                    ) as response:
+                        status_code, content = response.status, await response.read()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if is_last_attempt:
+                        raise
+                    logger.warning(f"TFServingRESTClient: request failed ({e!r}), retrying...")
+                else:
+                    predictions = self._get_predictions(status_code, content, is_last_attempt)
+                    if predictions is not None:
+                        return predictions
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def predict(self, instances: List) -> List:
+        '''
+        Returns predictions of instances (in the same order).
+        '''
+        batches = [
+            instances[idx:idx+self.max_batch_size] for idx in range(0, len(instances), self.max_batch_size)
+        ]
+        return [
+            prediction
+            for predictions in self._executor.map(self._post, batches)
+            for prediction in predictions
+        ]
+
+    async def apredict(self, instances: List) -> List:
+        '''
+        Async variant of predict.
+        '''
+        batches = [
+            instances[idx:idx+self.max_batch_size] for idx in range(0, len(instances), self.max_batch_size)
+        ]
+        return [
+            prediction
+            for predictions in await asyncio.gather(*[self._apost(batch) for batch in batches])
+            for prediction in predictions
+        ]
+
+    def predict_images(
+        self,
+        images: List[np.ndarray],
+        input_name: str,
+        jpeg_quality: int = 100
+    ) -> List:
+        '''
+        Sends RGB images as JPEG, every batch is encoded in the thread that sends it.
+        '''
+        def post_images(images_batch: List[np.ndarray]) -> List:
+            return self._post([
+                {input_name: encode_image_b64(image, jpeg_quality=jpeg_quality)} for image in images_batch
+            ])
+
+        batches = [
+            images[idx:idx+self.max_batch_size] for idx in range(0, len(images), self.max_batch_size)
+        ]
+        return [
+            prediction
+            for predictions in self._executor.map(post_images, batches)
+            for prediction in predictions
+        ]
+
+    async def apredict_images(
+        self,
+        images: List[np.ndarray],
+        input_name: str,
+        jpeg_quality: int = 100
+    ) -> List:
+        '''
+        Async variant of predict_images, images are encoded in the threads of the client.
+        '''
+        loop = asyncio.get_running_loop()
+
+        async def apost_images(images_batch: List[np.ndarray]) -> List:
+            instances = await loop.run_in_executor(self._executor, lambda: [
+                {input_name: encode_image_b64(image, jpeg_quality=jpeg_quality)} for image in images_batch
+            ])
+            return await self._apost(instances)
+
+        batches = [
+            images[idx:idx+self.max_batch_size] for idx in range(0, len(images), self.max_batch_size)
+        ]
+        return [
+            prediction
+            for predictions in await asyncio.gather(*[apost_images(batch) for batch in batches])
+            for prediction in predictions
+        ]
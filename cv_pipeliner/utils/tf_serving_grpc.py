@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import threading
+from typing import Dict, List
+
+import grpc
+import numpy as np
+import tensorflow as tf
+from tensorflow_serving.apis import predict_pb2, prediction_service_pb2_grpc
+
+
+def wrap_grpc_future(grpc_future: grpc.Future) -> asyncio.Future:
+    '''
+    Returns asyncio future (of the running loop) that is done when grpc_future is done,
+    cancelling it cancels the RPC.
+    '''
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def set_result(grpc_future: grpc.Future):
+        if future.cancelled():
+            return
+        if grpc_future.cancelled():
+            future.cancel()
+        elif grpc_future.exception() is not None:
+            future.set_exception(grpc_future.exception())
+        else:
+            future.set_result(grpc_future.result())
+
+    def on_grpc_future_done(grpc_future: grpc.Future):
+        # called in the thread of grpc
+        loop.call_soon_threadsafe(set_result, grpc_future)
+
+    def on_future_done(future: asyncio.Future):
+        if future.cancelled():
+            grpc_future.cancel()
+
+    future.add_done_callback(on_future_done)
+    grpc_future.add_done_callback(on_grpc_future_done)
+    return future
+
+
+class TFServingGRPCClient:
+    '''
+    Client of TF Serving gRPC PredictionService (requires tensorflow-serving-api), address is like host:8500.
+
+    Tensors are sent as raw TensorProto (without JSON and base64). Requests are distributed round-robin
+    over the pool of n_channels channels (every channel has its own HTTP/2 connection), predict_async
+    returns grpc.Future, so many requests can be in flight at once. apredict and apredict_many are
+    asyncio variants that wait for the responses without blocking the running loop.
+    '''
+    def __init__(
+        self,
+        address: str,
+        model_name: str,
+        signature_name: str = 'serving_default',
+        n_channels: int = 2,
+        timeout: float = 10.,
+        max_message_length: int = 64 * 1024 * 1024
+    ):
+        assert n_channels > 0
+        self.address = address
+        self.model_name = model_name
+        self.signature_name = signature_name
+        self.timeout = timeout
+        options = [
+            ('grpc.max_send_message_length', max_message_length),
+            ('grpc.max_receive_message_length', max_message_length),
+            # otherwise channels with the same arguments share one connection
+            ('grpc.use_local_subchannel_pool', 1)
+        ]
+        self.channels = [grpc.insecure_channel(address, options=options) for _ in range(n_channels)]
+        self.stubs = [prediction_service_pb2_grpc.PredictionServiceStub(channel) for channel in self.channels]
+        self._stubs_cycle = itertools.cycle(self.stubs)
+        self._stubs_lock = threading.Lock()
+
+    def __enter__(self) -> 'TFServingGRPCClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
+
+    def _get_stub(self) -> prediction_service_pb2_grpc.PredictionServiceStub:
+        with self._stubs_lock:
+            return next(self._stubs_cycle)
+
+    def make_request(self, inputs: Dict[str, np.ndarray]) -> predict_pb2.PredictRequest:
+        request = predict_pb2.PredictRequest()
+        request.model_spec.name = self.model_name
+        request.model_spec.signature_name = self.signature_name
+        for input_name, value in inputs.items():
+            request.inputs[input_name].CopyFrom(tf.make_tensor_proto(value))
+        return request
+
+    @staticmethod
+    def parse_response(response: predict_pb2.PredictResponse) -> Dict[str, np.ndarray]:
+        return {output_name: tf.make_ndarray(output) for output_name, output in response.outputs.items()}
+
+    def predict_async(self, inputs: Dict[str, np.ndarray]) -> grpc.Future:
+        '''
+        Sends the request without waiting, the response is parsed by parse_response(future.result()).
+        '''
+        return self._get_stub().Predict.future(self.make_request(inputs), timeout=self.timeout)
+
+    def predict(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return self.parse_response(self.predict_async(inputs).result())
+
+    def predict_many(self, inputs_list: List[Dict[str, np.ndarray]]) -> List[Dict[str, np.ndarray]]:
+        '''
+        Sends all requests at once and waits for all responses.
+        '''
+        futures = [self.predict_async(inputs) for inputs in inputs_list]
+        return [self.parse_response(future.result()) for future in futures]
+
+    async def apredict(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return self.parse_response(await wrap_grpc_future(self.predict_async(inputs)))
+
+    async def apredict_many(self, inputs_list: List[Dict[str, np.ndarray]]) -> List[Dict[str, np.ndarray]]:
+        '''
+        Async variant of predict_many.
+        '''
+        return await asyncio.gather(*[self.apredict(inputs) for inputs in inputs_list])
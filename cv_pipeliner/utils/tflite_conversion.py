@@ -0,0 +1,243 @@
+import dataclasses
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Literal, Union
+
+import fsspec
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from cv_pipeliner.core.data import BboxData
+from cv_pipeliner.batch_generators.bbox_data import BatchGeneratorBboxData
+from cv_pipeliner.inference_models.classification.core import ClassificationModel
+from cv_pipeliner.inference_models.classification.tensorflow import (
+    TensorFlow_ClassificationModelSpec, Tensorflow_ClassificationModel
+)
+from cv_pipeliner.reporters.classification import ClassificationReportData, ClassificationReporter
+from cv_pipeliner.logging import logger
+
+QUANTIZATIONS = ["float16", "int8"]
+
+
+def get_representative_dataset(
+    model: ClassificationModel,
+    bboxes_data_gen: BatchGeneratorBboxData,
+    num_samples: int = 100
+) -> Callable[[], Iterator[List[np.ndarray]]]:
+    '''
+    Representative dataset for the calibration of TFLite int8 quantization: cropped images of bboxes_data_gen
+    preprocessed by the model, one image per sample.
+    '''
+    def representative_dataset():
+        n_samples = 0
+        for bboxes_data in bboxes_data_gen:
+            input = model.preprocess_input([bbox_data.cropped_image for bbox_data in bboxes_data])
+            for image in np.asarray(input, dtype=np.float32):
+                if n_samples >= num_samples:
+                    return
+                yield [image[None, ...]]
+                n_samples += 1
+
+    return representative_dataset
+
+
+def _get_tflite_converter(model: Tensorflow_ClassificationModel) -> tf.lite.TFLiteConverter:
+    saved_model_type = model.model_spec.saved_model_type
+    if saved_model_type in ["tf.keras", "tf.keras.Model"]:
+        return tf.lite.TFLiteConverter.from_keras_model(model.model)
+    elif saved_model_type == "tf.saved_model":
+        return tf.lite.TFLiteConverter.from_concrete_functions([model.model], model.loaded_model)
+    raise ValueError(f"Model with saved_model_type {saved_model_type} can't be converted to TFLite.")
+
+
+def convert_classification_model_to_tflite(
+    model_spec: TensorFlow_ClassificationModelSpec,
+    output_path: Union[str, Path],
+    quantization: Literal["float16", "int8"],
+    bboxes_data_gen: BatchGeneratorBboxData = None,
+    num_representative_samples: int = 100
+) -> TensorFlow_ClassificationModelSpec:
+    '''
+    Converts tf.keras or tf.saved_model classification model to TFLite file output_path (local or remote)
+    and returns the spec of the converted model.
+
+    With "float16" weights are stored as float16. With "int8" weights and activations are quantized,
+    the calibration is made on num_representative_samples images of bboxes_data_gen. Input and output
+    of the converted model stay float32, so preprocess_input of the spec is kept.
+    '''
+    assert isinstance(model_spec, TensorFlow_ClassificationModelSpec)
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"quantization can be one of {QUANTIZATIONS}.")
+    model = model_spec.load()
+    converter = _get_tflite_converter(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        assert bboxes_data_gen is not None, "int8 quantization requires bboxes_data_gen for the calibration."
+        converter.representative_dataset = get_representative_dataset(
+            model=model,
+            bboxes_data_gen=bboxes_data_gen,
+            num_samples=num_representative_samples
+        )
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    tflite_model = converter.convert()
+    with fsspec.open(str(output_path), 'wb') as out:
+        out.write(tflite_model)
+    logger.info(f"Model converted to TFLite ({quantization}): '{output_path}'.")
+
+    return dataclasses.replace(model_spec, model_path=output_path, saved_model_type="tflite")
+
+
+@dataclass
+class ClassificationLatency:
+    batch_size: int
+    latencies: np.ndarray  # seconds per batch
+
+    @property
+    def mean(self) -> float:
+        return float(np.mean(self.latencies))
+
+    @property
+    def p50(self) -> float:
+        return float(np.percentile(self.latencies, 50))
+
+    @property
+    def p99(self) -> float:
+        return float(np.percentile(self.latencies, 99))
+
+    @property
+    def images_per_second(self) -> float:
+        return self.batch_size / self.mean
+
+
+def benchmark_classification_model_latency(
+    model: ClassificationModel,
+    images: List[np.ndarray],
+    n_warmup_runs: int = 3,
+    n_runs: int = 50
+) -> ClassificationLatency:
+    '''
+    Latency of model.predict on the batch of images (preprocessing is not counted).
+    '''
+    input = model.preprocess_input(images)
+    for _ in range(n_warmup_runs):
+        model.predict(input)
+    latencies = []
+    for _ in range(n_runs):
+        started_at = time.perf_counter()
+        model.predict(input)
+        latencies.append(time.perf_counter() - started_at)
+    return ClassificationLatency(batch_size=len(images), latencies=np.array(latencies))
+
+
+def _get_model_size(model_spec: TensorFlow_ClassificationModelSpec) -> int:
+    if model_spec.saved_model_type == "tf.keras.Model":
+        return None
+    model_openfile = fsspec.open(str(model_spec.model_path))
+    return model_openfile.fs.du(model_openfile.path)
+
+
+@dataclass
+class TFLiteConversionResult:
+    tag: str
+    model_spec: TensorFlow_ClassificationModelSpec
+    model_size: int  # bytes
+    latency: ClassificationLatency
+    classification_report_data: ClassificationReportData
+
+
+def get_df_tflite_conversion_results(results: List[TFLiteConversionResult]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            'model_size_mb': [
+                result.model_size / 2 ** 20 if result.model_size is not None else None for result in results
+            ],
+            'latency_mean_ms': [result.latency.mean * 1000 for result in results],
+            'latency_p99_ms': [result.latency.p99 * 1000 for result in results],
+            'images_per_second': [result.latency.images_per_second for result in results]
+        },
+        index=[result.tag for result in results]
+    )
+
+
+def quantize_classification_model(
+    model_spec: TensorFlow_ClassificationModelSpec,
+    output_directory: Union[str, Path],
+    n_true_bboxes_data: List[List[BboxData]],
+    pseudo_class_names: List[str] = [],
+    n_representative_bboxes_data: List[List[BboxData]] = None,
+    quantizations: List[Literal["float16", "int8"]] = QUANTIZATIONS,
+    num_representative_samples: int = 100,
+    tops_n: List[int] = [1],
+    batch_size: int = 16,
+    latency_batch_size: int = 1,
+    latency_n_runs: int = 50
+) -> List[TFLiteConversionResult]:
+    '''
+    Converts the model to TFLite with every quantization (to output_directory/model_{quantization}.tflite),
+    then compares the original and converted models: ClassificationReporter report on n_true_bboxes_data
+    is saved to output_directory/report and the latency of latency_batch_size images is benchmarked.
+    The calibration is made on n_representative_bboxes_data (n_true_bboxes_data by default).
+    The table of results is saved to output_directory/tflite_conversion.csv.
+    output_directory must be local, as ClassificationReporter writes the report to the local filesystem
+    (use convert_classification_model_to_tflite for remote paths).
+    '''
+    output_directory = Path(output_directory)
+    output_directory.mkdir(exist_ok=True, parents=True)
+    if n_representative_bboxes_data is None:
+        n_representative_bboxes_data = n_true_bboxes_data
+
+    models_specs = [model_spec]
+    for quantization in quantizations:
+        models_specs.append(convert_classification_model_to_tflite(
+            model_spec=model_spec,
+            output_path=output_directory / f"model_{quantization}.tflite",
+            quantization=quantization,
+            bboxes_data_gen=BatchGeneratorBboxData(
+                n_representative_bboxes_data,
+                batch_size=batch_size,
+                use_not_caught_elements_as_last_batch=True
+            ),
+            num_representative_samples=num_representative_samples
+        ))
+    tags = ["original"] + list(quantizations)
+
+    classifications_reports_datas = ClassificationReporter().report(
+        models_specs=models_specs,
+        tags=tags,
+        compare_tag="original",
+        output_directory=output_directory / 'report',
+        n_true_bboxes_data=n_true_bboxes_data,
+        pseudo_class_names=pseudo_class_names,
+        tops_n=tops_n,
+        batch_size=batch_size
+    )
+
+    latency_bboxes_data = BatchGeneratorBboxData(
+        n_true_bboxes_data,
+        batch_size=latency_batch_size,
+        use_not_caught_elements_as_last_batch=True
+    )[0]
+    latency_images = [bbox_data.cropped_image for bbox_data in latency_bboxes_data]
+    results = []
+    for tag_model_spec, tag, classification_report_data in zip(models_specs, tags, classifications_reports_datas):
+        logger.info(f"Benchmarking latency of '{tag}'...")
+        results.append(TFLiteConversionResult(
+            tag=tag,
+            model_spec=tag_model_spec,
+            model_size=_get_model_size(tag_model_spec),
+            latency=benchmark_classification_model_latency(
+                model=tag_model_spec.load(),
+                images=latency_images,
+                n_runs=latency_n_runs
+            ),
+            classification_report_data=classification_report_data
+        ))
+    df_results = get_df_tflite_conversion_results(results)
+    df_results.to_csv(output_directory / 'tflite_conversion.csv')
+    logger.info(f"TFLite conversion results:\n{df_results.to_string()}")
+
+    return results
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import numpy as np
+
+from cv_pipeliner.inference_models.pipeline import PipelineModel
+from cv_pipeliner.inferencers.batching_server import PipelineBatchingServer
+from cv_pipeliner.tests.tracking.test_realtime_server import (
+    BrightBlobsDetectionModelSpec, RedChannelClassificationModelSpec
+)
+
+n_clients = 16
+n_requests_per_client = 20
+detection_time = 0.02  # seconds per predict call (any batch size), simulates vectorized detector
+
+pipeline_model = PipelineModel()
+pipeline_model.load_from_loaded_models(
+    BrightBlobsDetectionModelSpec(predict_time=detection_time).load(), RedChannelClassificationModelSpec().load()
+)
+image = np.zeros((360, 640, 3), dtype=np.uint8)
+for idx in range(5):
+    image[50:110, 20 + 120 * idx:80 + 120 * idx] = (200, 255, 255)
+
+
+def run_clients(predict) -> list:
+    latencies = []
+
+    def run_client():
+        for _ in range(n_requests_per_client):
+            started_at = time.perf_counter()
+            predict()
+            latencies.append(time.perf_counter() - started_at)
+
+    threads = [threading.Thread(target=run_client) for _ in range(n_clients)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - started_at
+    return latencies, total_time
+
+
+def report(name: str, latencies: list, total_time: float):
+    print(
+        f'{name}: {len(latencies) / total_time:.1f} images per second, latency '
+        f'p50: {np.percentile(latencies, 50) * 1000:.1f} ms, p99: {np.percentile(latencies, 99) * 1000:.1f} ms'
+    )
+
+
+print(
+    f'{n_clients} concurrent clients x {n_requests_per_client} images 640x360, '
+    f'detection {detection_time * 1000:.0f} ms per call'
+)
+
+# one predict with batch_size=1 per request, the model is shared by the clients
+model_lock = threading.Lock()
+
+
+def predict_one():
+    with model_lock:
+        pipeline_model.predict([image], detection_score_threshold=0.5)
+
+
+report('batch_size=1', *run_clients(predict_one))
+
+for max_batch_size in [4, 16]:
+    with PipelineBatchingServer(pipeline_model, max_batch_size=max_batch_size, max_batch_delay=0.01) as server:
+        latencies, total_time = run_clients(lambda: server.predict(image, detection_score_threshold=0.5))
+    report(f'PipelineBatchingServer(max_batch_size={max_batch_size})', latencies, total_time)
+    print(f'  mean batch size: {server.stats.mean_batch_size:.1f}')
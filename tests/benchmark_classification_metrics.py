@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from cv_pipeliner.metrics.classification import (
+    get_labels_ids, get_precision_and_recall_top_n, get_precisions_and_recalls_top_n,
+    get_mean_expected_steps, get_mean_expected_steps_by_classes
+)
+
+n_classes = 2000
+n_images = 1000
+n_bboxes_per_image = 100
+top_n = 20
+n_classes_for_loop = 20  # the loop versions are counted on a few classes and extrapolated to all classes
+
+random_state = np.random.RandomState(42)
+class_names = [f'class_{i}' for i in range(n_classes)]
+n = n_images * n_bboxes_per_image
+true_labels_ids = random_state.randint(0, n_classes, size=n)
+pred_labels_ids_top_n = (random_state.randint(0, n_classes, size=(n, 1)) + np.arange(top_n)) % n_classes
+pred_scores_top_n = -np.sort(-random_state.rand(n, top_n), axis=1)
+images_ids = np.repeat(np.arange(n_images), n_bboxes_per_image)
+true_labels = np.array(class_names)[true_labels_ids]
+pred_labels_top_n = np.array(class_names)[pred_labels_ids_top_n]
+print(f'{n} bboxes, {n_classes} classes, top_n={top_n}')
+
+start_time = time.time()
+for class_name in class_names[:n_classes_for_loop]:
+    get_precision_and_recall_top_n(true_labels, pred_labels_top_n, class_name, top_n)
+loop_time = (time.time() - start_time) / n_classes_for_loop * n_classes
+start_time = time.time()
+get_precisions_and_recalls_top_n(
+    true_labels_ids=get_labels_ids(true_labels, class_names),
+    pred_labels_ids_top_n=get_labels_ids(pred_labels_top_n, class_names),
+    n_classes=n_classes,
+    top_n=top_n
+)
+vectorized_time = time.time() - start_time
+print(f'precision@{top_n}, recall@{top_n}: loop ~{loop_time:.1f}s, vectorized {vectorized_time:.2f}s')
+
+n_true_labels = np.split(true_labels, n_images)
+n_pred_labels_top_n = np.split(pred_labels_top_n, n_images)
+n_pred_scores_top_n = np.split(pred_scores_top_n, n_images)
+start_time = time.time()
+for class_name in class_names[:n_classes_for_loop]:
+    get_mean_expected_steps(n_true_labels, n_pred_labels_top_n, n_pred_scores_top_n, class_name, step_penalty=20)
+loop_time = (time.time() - start_time) / n_classes_for_loop * n_classes
+start_time = time.time()
+get_mean_expected_steps_by_classes(
+    images_ids=images_ids,
+    true_labels_ids=get_labels_ids(true_labels, class_names),
+    pred_labels_ids_top_n=get_labels_ids(pred_labels_top_n, class_names),
+    pred_scores_top_n=pred_scores_top_n,
+    n_classes=n_classes,
+    step_penalty=20
+)
+vectorized_time = time.time() - start_time
+print(f'mean_expected_steps: loop ~{loop_time:.1f}s, vectorized {vectorized_time:.2f}s')
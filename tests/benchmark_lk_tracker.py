@@ -0,0 +1,34 @@
+import time
+
+import cv2
+import numpy as np
+
+from cv_pipeliner.tracking.lk_tracker import LKTracker
+
+n_objects = 200
+n_frames = 100
+size = 40
+
+random_state = np.random.RandomState(42)
+background = cv2.resize(random_state.randint(0, 256, size=(270, 480, 3)).astype(np.uint8), (1920, 1080))
+xymins = np.stack(np.meshgrid(np.arange(20) * 90 + 20, np.arange(10) * 100 + 20), axis=-1).reshape(-1, 2)[:n_objects]
+velocities = random_state.uniform(-2, 2, size=(n_objects, 2))
+frames = []
+for frame_idx in range(n_frames):
+    frame = background.copy()
+    for xmin, ymin in (xymins + velocities * frame_idx).round().astype(int):
+        frame[ymin:ymin+size, xmin:xmin+size] = 255 - frame[ymin:ymin+size, xmin:xmin+size]
+    frames.append(frame)
+bboxes = np.column_stack([xymins, xymins + size])
+print(f'{n_objects} boxes, {n_frames} frames 1920x1080')
+
+for scale in [1., 0.5, 0.25]:
+    lk_tracker = LKTracker(bboxes, frames[0], scale=scale)
+    start_time = time.time()
+    for frame in frames[1:]:
+        lk_tracker.update(frame)
+    frame_time = (time.time() - start_time) / (n_frames - 1)
+    print(
+        f'LKTracker(scale={scale}): {frame_time * 1000:.2f} ms per frame, '
+        f'{frame_time * 1e6 / n_objects:.1f} us per box'
+    )
@@ -0,0 +1,27 @@
+import time
+
+import numpy as np
+
+from cv_pipeliner.tracking.sort_tracker import Sort
+from cv_pipeliner.tracking.vectorized_sort_tracker import VectorizedSort
+
+n_objects = 500
+n_frames = 100
+
+random_state = np.random.RandomState(42)
+xymins = np.stack(np.meshgrid(np.arange(25) * 80, np.arange(20) * 80), axis=-1).reshape(-1, 2)[:n_objects]
+xymins = xymins.astype(float)
+velocities = random_state.uniform(-2, 2, size=(n_objects, 2))
+frames_dets = []
+for frame_idx in range(n_frames):
+    frame_xymins = xymins + velocities * frame_idx + random_state.normal(0, 1., size=(n_objects, 2))
+    frames_dets.append(np.column_stack([frame_xymins, frame_xymins + 50, np.ones(n_objects)]))
+print(f'{n_objects} tracks, {n_frames} frames')
+
+for sort_cls in [Sort, VectorizedSort]:
+    sort_tracker = sort_cls()
+    start_time = time.time()
+    for dets in frames_dets:
+        sort_tracker.update(dets)
+    fps = n_frames / (time.time() - start_time)
+    print(f'{sort_cls.__name__}: {fps:.1f} frames per second')
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import numpy as np
+
+from cv_pipeliner.tests.tracking.test_realtime_server import (
+    BrightBlobsDetectionModelSpec, RedChannelClassificationModelSpec
+)
+from cv_pipeliner.tracking.realtime_server import RealTimeServer
+
+n_sessions = 8
+n_detection_models = 2
+detection_time = 0.03  # seconds per frame, simulates the detector
+fps = 25
+detection_delay = 200
+n_frames = 100
+n_objects = 10
+
+
+def get_frames(random_state: np.random.RandomState):
+    xymins = random_state.uniform(0, 280, size=(n_objects, 2))
+    velocities = random_state.uniform(-3, 3, size=(n_objects, 2))
+    for frame_idx in range(n_frames):
+        frame = np.zeros((360, 640, 3), dtype=np.uint8)
+        for xmin, ymin in (xymins + velocities * frame_idx).clip(0, 280).round().astype(int):
+            frame[ymin:ymin+60, xmin:xmin+60] = (255, 255, 255)
+        yield frame
+
+
+def run_client(server: RealTimeServer, idx: int, latencies: list):
+    session_id = f'session_{idx}'
+    assert server.start_session(session_id, fps=fps, detection_delay=detection_delay)
+    started_at = time.perf_counter()
+    for frame_idx, frame in enumerate(get_frames(np.random.RandomState(idx))):
+        # clients send frames in real time
+        time.sleep(max(started_at + frame_idx / fps - time.perf_counter(), 0))
+        frame_started_at = time.perf_counter()
+        bboxes_data = server.predict_on_frame(session_id, frame, detection_score_threshold=0.5)
+        if bboxes_data is not None:
+            latencies.append(time.perf_counter() - frame_started_at)
+    server.end_session(session_id)
+
+
+server = RealTimeServer(
+    detection_models=[
+        BrightBlobsDetectionModelSpec(predict_time=detection_time).load() for _ in range(n_detection_models)
+    ],
+    classification_model=RedChannelClassificationModelSpec().load(),
+    max_sessions=n_sessions
+)
+print(
+    f'{n_sessions} sessions x {n_frames} frames 640x360 at {fps} fps, detection every {detection_delay} ms, '
+    f'{n_detection_models} detection models ({detection_time * 1000:.0f} ms per frame)'
+)
+latencies = []
+with server:
+    threads = [
+        threading.Thread(target=run_client, args=(server, idx, latencies))
+        for idx in range(n_sessions)
+    ]
+    started_at = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.time() - started_at
+
+print(
+    f'{len(latencies) / total_time:.1f} frames per second, latency '
+    f'p50: {np.percentile(latencies, 50) * 1000:.1f} ms, p99: {np.percentile(latencies, 99) * 1000:.1f} ms'
+)
+print(server.stats)